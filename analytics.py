@@ -0,0 +1,120 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+def clean_inputs_decisions(df_in: pd.DataFrame, df_dec: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    df_in, df_dec = df_in.copy(), df_dec.copy()
+    for df in [df_in, df_dec]:
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df_dec["irr_mm"] = pd.to_numeric(df_dec.get("irr_mm", 0), errors="coerce").fillna(0)
+    df_dec["irr_L"] = pd.to_numeric(df_dec.get("irr_L", 0), errors="coerce").fillna(0)
+    df_in["theta_vwc"] = pd.to_numeric(df_in.get("theta_vwc", 0), errors="coerce").fillna(0)
+    df_in["ndvi"] = pd.to_numeric(df_in.get("ndvi", 0), errors="coerce").fillna(0)
+    return df_in, df_dec
+
+def merge_inputs_decisions(df_in: pd.DataFrame, df_dec: pd.DataFrame, plots: List[str]) -> pd.DataFrame:
+    df_dec_filt = df_dec[df_dec["plot"].isin(plots)]
+    df_in_filt = df_in[df_in["plot"].isin(plots)]
+    return pd.merge(df_in_filt, df_dec_filt[["date","plot","decision","irr_mm"]], on=["date","plot"], how="left")
+
+# Points per line and bars per chart sent to the browser, whatever the range.
+MAX_POINTS = 600
+MAX_BARS = 120
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: indices of n_out points that keep the
+    # visual shape (peaks and troughs) of the series. x must be increasing.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    edges = (np.floor(np.arange(n_out - 1) * every) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # the bucket after the last one averages just the final point
+    avg_x, avg_y = np.append(avg_x, x[-1]), np.append(avg_y, y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample(df: pd.DataFrame, col: str, n_out: int = MAX_POINTS) -> pd.DataFrame:
+    df = df[["date", col]].dropna()
+    if len(df) <= n_out:
+        return df
+    x = df["date"].to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    return df.iloc[lttb(x, df[col].to_numpy(dtype=float), n_out)]
+
+def irrigation_bins(df: pd.DataFrame, max_bars: int = MAX_BARS) -> pd.DataFrame:
+    # Sums per bin; bins widen (1, 2, 3 … days) as the range grows.
+    df = df[["date", "irr_mm"]].dropna(subset=["date"])
+    if df.empty:
+        return df
+    span_days = (df["date"].max() - df["date"].min()).days + 1
+    width = max(1, -(-span_days // max_bars))
+    return df.set_index("date")["irr_mm"].resample(f"{width}D").sum().reset_index()
+
+def plot_series(df_p: pd.DataFrame, start=None, end=None,
+                max_points: int = MAX_POINTS) -> Dict[str, pd.DataFrame]:
+    if start is not None:
+        df_p = df_p[df_p["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df_p = df_p[df_p["date"] < pd.Timestamp(end) + pd.Timedelta(days=1)]
+    return dict(ndvi=downsample(df_p, "ndvi", max_points), theta_vwc=downsample(df_p, "theta_vwc", max_points),
+                irr_mm=irrigation_bins(df_p, max(1, max_points * MAX_BARS // MAX_POINTS)))
+
+def frame_token(df: pd.DataFrame) -> int:
+    # Cheap content hash used as the cache key of a plot's rows.
+    if df.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(df, index=False).to_numpy().sum(dtype=np.uint64))
+
+# LRU of downsampled chart series keyed by (plot, rows digest, range, points).
+class ChartDataCache:
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple, Dict[str, pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def series(self, plot: str, df_p: pd.DataFrame, start=None, end=None,
+               max_points: int = MAX_POINTS) -> Dict[str, pd.DataFrame]:
+        key = (plot, frame_token(df_p), str(start), str(end), max_points)
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None:
+                self._items.move_to_end(key)
+                return hit
+        out = plot_series(df_p, start, end, max_points)
+        with self._lock:
+            self._items[key] = out
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return out
+
+def plot_chart(series: Dict[str, pd.DataFrame]):
+    import altair as alt
+    ndvi_line = alt.Chart(series["ndvi"]).mark_line(color="green").encode(
+        x="date:T", y=alt.Y("ndvi:Q", title="NDVI"))
+    soil_line = alt.Chart(series["theta_vwc"]).mark_line(color="steelblue").encode(
+        x="date:T", y=alt.Y("theta_vwc:Q", title="Soil moisture (m³/m³)"))
+    irr_bars = alt.Chart(series["irr_mm"]).mark_bar(color="orange", opacity=0.4).encode(
+        x="date:T", y=alt.Y("irr_mm:Q", title="Irrigation (mm)"))
+    return alt.layer(ndvi_line, soil_line, irr_bars).resolve_scale(y="independent").properties(height=300)
+
+def wue_table(totals: pd.DataFrame) -> pd.DataFrame:
+    # totals: SummaryStore.plot_totals() over the season
+    wue = totals[totals["n_heights"] > 0][["plot", "height_min", "height_max", "irr_L"]] \
+            .rename(columns={"height_min": "min", "height_max": "max"}).reset_index(drop=True)
+    wue["WUE (cm/L)"] = (wue["max"] - wue["min"]) / wue["irr_L"].replace(0, pd.NA)
+    return wue
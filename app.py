@@ -1,139 +1,341 @@
 from __future__ import annotations
+import time
+_t_script = time.perf_counter()
 import streamlit as st
 import pandas as pd
-import altair as alt
+import perf
+_trace = perf.begin_trace("rerun")
 import io
 from datetime import date, timedelta
-from logic import (
-    Config, StageParams, SoilParams, NDVI2Kc,
-    decide_T2, decide_T3, decide_T4_strict, PLOTS
-)
-from data_io import append_rows, read_sheet, ensure_headers
-from emailer import send_email_with_pdf
+from logic import Config, StageParams, SoilParams, NDVI2Kc
+from data_io import (append_rows, upsert_rows, read_sheet, read_sheets, ensure_headers, sheet_generation,
+                     pending_message, write_queue_stats)
+from dr_store import DrLedger, DR_HEADERS
+from config_store import ConfigHistory, DEFAULT_TRANSPLANT, METADATA_HEADERS, apply_settings, settings_of
+from plot_registry import PlotRegistry, PLOT_HEADERS
+from eto import EToCache, site_from_settings
+from replay import (DAILY_INPUT_HEADERS, DECISION_HEADERS, ROW_KEY, decision_rows, inputs_by_date,
+                    replay_later_days, replayed_rows)
+from summaries import SummaryStore
 
 st.set_page_config(page_title="Smart Irrigation – Flat", layout="wide")
-ensure_headers(st.secrets["gsheets"]["daily_inputs_ws"],
-               ["date","plot","theta_vwc","rain_obs","rain_fcst_24h","ndvi","eto","notes"])
-ensure_headers(st.secrets["gsheets"]["decisions_ws"],
-               ["date","plot","treatment","decision","reason","Dr","RAW","theta","theta_trigger","ndvi","Kc","rain_fcst","irr_mm","irr_L"])
+_profiler = perf.start_profile() if st.session_state.pop("_profile_next", False) else None
+ensure_headers(st.secrets["gsheets"]["daily_inputs_ws"], DAILY_INPUT_HEADERS)
+ensure_headers(st.secrets["gsheets"]["decisions_ws"], DECISION_HEADERS)
 ensure_headers(st.secrets["gsheets"]["plant_ws"],
                ["date","plot","plant_id","height_cm"])
-ensure_headers(st.secrets["gsheets"]["metadata_ws"],
-               ["key","value","timestamp"])
+PLANT_KEY = ("date", "plot", "plant_id")
+ensure_headers(st.secrets["gsheets"]["metadata_ws"], METADATA_HEADERS)
+DR_WS = st.secrets["gsheets"].get("dr_ws", "dr_ledger")
+ensure_headers(DR_WS, DR_HEADERS)
+PLOTS_WS = st.secrets["gsheets"].get("plots_ws", "plots")
+ensure_headers(PLOTS_WS, PLOT_HEADERS)
+
+@st.cache_resource(show_spinner=False)
+def dr_ledger() -> DrLedger:
+    return DrLedger.load(DR_WS)
+
+@st.cache_resource(show_spinner=False)
+def report_cache():
+    from report import ReportCache
+    return ReportCache()
+
+@st.cache_resource(show_spinner=False)
+def gmail():
+    from emailer import gmail_service
+    return gmail_service()
+
+# Script start → headers verified. The first run in a process includes the
+# module imports and the header round trips; later reruns should be near zero.
+@st.cache_resource(show_spinner=False)
+def startup_timings() -> dict:
+    return {}
+
+_timings = startup_timings()
+_setup_s = time.perf_counter() - _t_script
+if "cold_start_s" not in _timings:
+    _timings["cold_start_s"] = _setup_s
+    import logging
+    logging.getLogger(__name__).info("cold start: %.3fs to headers verified", _setup_s)
+_timings["last_setup_s"] = _setup_s
 
 st.title("🌿 Smart Irrigation — Spinach (Utsunomiya) – Flat App")
-tab_dashboard, tab_admin, tab_analytics, tab_reports = st.tabs(
-    ["🏠 Dashboard", "⚙️ Admin", "📊 Analytics", "🧾 Reports"]
+
+TRANSPLANT = DEFAULT_TRANSPLANT
+
+@st.cache_resource(show_spinner=False)
+def _config_history() -> ConfigHistory:
+    return ConfigHistory(Config(transplant_date=TRANSPLANT))
+
+def config_history() -> ConfigHistory:
+    # Indexed once per process; each rerun only folds in newly appended rows.
+    try:
+        return _config_history().sync(read_sheet(st.secrets["gsheets"]["metadata_ws"]))
+    except Exception:
+        return _config_history()
+
+history = config_history()
+
+@st.cache_resource(show_spinner=False)
+def _plot_registry() -> PlotRegistry:
+    return PlotRegistry()
+
+def plot_registry() -> PlotRegistry:
+    try:
+        return _plot_registry().sync(read_sheet(PLOTS_WS))
+    except Exception:
+        return _plot_registry()
+
+registry = plot_registry()
+
+SITE = site_from_settings(st.secrets.get("site", {}))
+WEATHER_WS = st.secrets["gsheets"].get("weather_ws", "weather")
+
+@st.cache_resource(show_spinner=False)
+def _eto_cache() -> EToCache:
+    return EToCache(SITE)
+
+def eto_cache() -> EToCache:
+    # Penman-Monteith ETo per date from the station records in WEATHER_WS;
+    # only days whose records changed are recomputed.
+    try:
+        return _eto_cache().update(read_sheet(WEATHER_WS))
+    except Exception:
+        return _eto_cache()
+
+@st.cache_resource(show_spinner=False)
+def _summary_store() -> SummaryStore:
+    return SummaryStore()
+
+def summaries(decisions: pd.DataFrame = None, inputs: pd.DataFrame = None,
+              heights: pd.DataFrame = None) -> SummaryStore:
+    # Per-plot daily/weekly totals; only rows appended since the last rerun are
+    # folded in. Sheets not passed in are read here.
+    g = st.secrets["gsheets"]
+    try:
+        if decisions is None or inputs is None or heights is None:
+            frames = read_sheets([g["decisions_ws"], g["daily_inputs_ws"], g["plant_ws"]])
+            decisions = frames[g["decisions_ws"]] if decisions is None else decisions
+            inputs = frames[g["daily_inputs_ws"]] if inputs is None else inputs
+            heights = frames[g["plant_ws"]] if heights is None else heights
+        return _summary_store().update(decisions=decisions, inputs=inputs, heights=heights, generations=dict(
+            decisions=sheet_generation(g["decisions_ws"]), inputs=sheet_generation(g["daily_inputs_ws"]),
+            heights=sheet_generation(g["plant_ws"])))
+    except Exception:
+        return _summary_store()
+
+@st.cache_resource(show_spinner=False)
+def chart_cache():
+    from analytics import ChartDataCache
+    return ChartDataCache()
+
+base_cfg = history.as_of(date.today())
+
+st.sidebar.header("Runtime configuration")
+cfg = apply_settings(base_cfg, dict(
+    eta=st.sidebar.slider("Application efficiency η", 0.5, 0.98, base_cfg.efficiency, 0.01),
+    theta_fc=st.sidebar.number_input("θ_fc (m³/m³)", 0.10, 0.60, base_cfg.soil.theta_fc, 0.01),
+    theta_wp=st.sidebar.number_input("θ_wp (m³/m³)", 0.02, 0.40, base_cfg.soil.theta_wp, 0.01),
+    alpha=st.sidebar.slider("α for θ_trigger", 0.2, 0.8, base_cfg.soil.alpha, 0.05),
+    a=st.sidebar.number_input("NDVI→Kc a", 0.0, 3.0, base_cfg.ndvi2kc.a, 0.05),
+    b=st.sidebar.number_input("NDVI→Kc b", -0.5, 1.0, base_cfg.ndvi2kc.b, 0.05),
+    active_gate=st.sidebar.slider("Active canopy gate (Kc)", 0.5, 1.2, base_cfg.ndvi2kc.active_gate, 0.01),
+    rain_skip=st.sidebar.slider("Rain forecast skip ≥ (mm)", 0.0, 10.0, base_cfg.rain_skip_mm, 0.5),
+))
+
+wq = write_queue_stats()
+st.sidebar.caption(
+    f"Sheet writes pending: {wq['depth_rows']} rows"
+    + ("" if wq["last_flush_s"] is None else f" · last flush {wq['last_flush_s']:.2f}s")
+    + ("" if not wq["retries"] else f" · retries {wq['retries']}")
 )
+st.sidebar.caption(f"Cold start {_timings['cold_start_s']:.2f}s · this rerun setup {_timings['last_setup_s']:.3f}s")
+
+def saved(written: bool, message: str):
+    # written=False: a wait=True write timed out; the rows stay spooled locally
+    if written:
+        st.success(message)
+    else:
+        st.warning(f"{message} Google Sheets has not confirmed yet; still pending: {pending_message()}. "
+                   "They will be written when it recovers.")
 
-with tab_dashboard:
+def _reading(v):
+    # blank or 0 means "no reading", as with the old number inputs
+    return None if v is None or pd.isna(v) or v == 0 else float(v)
+
+# Each view is a page callable: only the active one runs on a rerun, so the
+# Analytics reads, the Reports chart/PDF pipeline and the Admin metadata read
+# stay idle until their view is opened.
+def view_dashboard():
     st.subheader("📝 Daily Inputs & Decisions")
-    TRANSPLANT = date(2025, 11, 6)
-    cfg = Config(transplant_date=TRANSPLANT)
-
-    st.sidebar.header("Runtime configuration")
-    cfg.efficiency = st.sidebar.slider("Application efficiency η", 0.5, 0.98, cfg.efficiency, 0.01)
-    cfg.soil.theta_fc = st.sidebar.number_input("θ_fc (m³/m³)", 0.10, 0.60, cfg.soil.theta_fc, 0.01)
-    cfg.soil.theta_wp = st.sidebar.number_input("θ_wp (m³/m³)", 0.02, 0.40, cfg.soil.theta_wp, 0.01)
-    cfg.soil.alpha   = st.sidebar.slider("α for θ_trigger", 0.2, 0.8, cfg.soil.alpha, 0.05)
-    cfg.ndvi2kc.a    = st.sidebar.number_input("NDVI→Kc a", 0.0, 3.0, cfg.ndvi2kc.a, 0.05)
-    cfg.ndvi2kc.b    = st.sidebar.number_input("NDVI→Kc b", -0.5, 1.0, cfg.ndvi2kc.b, 0.05)
-    cfg.ndvi2kc.active_gate = st.sidebar.slider("Active canopy gate (Kc)", 0.5, 1.2, cfg.ndvi2kc.active_gate, 0.01)
-    cfg.rain_skip_mm = st.sidebar.slider("Rain forecast skip ≥ (mm)", 0.0, 10.0, cfg.rain_skip_mm, 0.5)
 
     c1, c2, c3, c4, c5 = st.columns(5)
     d = c1.date_input("Date", value=date.today())
-    eto = c2.number_input("ETo (mm/day)", 0.0, 10.0, 3.0, 0.1)
+    computed_eto = eto_cache().get(d)
+    eto = c2.number_input("ETo (mm/day)", 0.0, 10.0, 3.0 if computed_eto is None else min(computed_eto, 10.0), 0.1,
+                          key=f"eto_{d}", help=None if computed_eto is None else "Computed from station data (FAO-56)")
     rain_obs = c3.number_input("Rain observed (mm)", 0.0, 100.0, 0.0, 0.1)
     rain_fc  = c4.number_input("Rain forecast next 24h (mm)", 0.0, 100.0, 0.0, 0.1)
     note = c5.text_input("Notes", "")
 
     st.markdown("#### Per-plot measurements")
-    rows = []
-    plot_inputs = {}
-    for p in PLOTS:
-        with st.expander(f"{p} measurements"):
-            theta = st.number_input(f"{p} θ VWC (m³/m³)", 0.00, 0.60, 0.0, 0.001, key=f"theta_{p}")
-            ndvi  = st.number_input(f"{p} NDVI (optional)", 0.0, 1.0, 0.0, 0.01, key=f"ndvi_{p}")
-            plot_inputs[p] = dict(theta=None if theta==0 else float(theta),
-                                  ndvi=None if ndvi==0 else float(ndvi))
-            rows.append([d.isoformat(), p, plot_inputs[p]["theta"], rain_obs, rain_fc, plot_inputs[p]["ndvi"], eto, note])
+    # One grid per page of plots instead of a widget per value, so the page
+    # costs the same with 4 plots or 4000. Entries persist across pages.
+    plots = registry.plots()
+    g1, g2, g3 = st.columns([1, 1, 2])
+    page_size = g1.selectbox("Plots per page", [10, 25, 50, 100], index=1, key="page_size")
+    n_pages = max(1, -(-len(plots) // page_size))
+    page = int(g2.number_input(f"Page (of {n_pages})", 1, n_pages, 1, key="plot_page"))
+    page_plots = registry.page(page, page_size)
+    g3.caption(f"{len(plots)} plots · showing {len(page_plots)}")
+
+    entries = st.session_state.setdefault("plot_inputs", {})
+    grid = pd.DataFrame({
+        "plot": page_plots,
+        "treatment": [registry.treatment_of(p) for p in page_plots],
+        "theta_vwc": [entries.get(p, {}).get("theta") for p in page_plots],
+        "ndvi": [entries.get(p, {}).get("ndvi") for p in page_plots],
+    }, dtype=object).astype({"theta_vwc": float, "ndvi": float})
+    edited = st.data_editor(grid, key=f"inputs_grid_{page}_{page_size}", hide_index=True,
+                            disabled=["plot", "treatment"], use_container_width=True, column_config={
+        "theta_vwc": st.column_config.NumberColumn("θ VWC (m³/m³)", min_value=0.0, max_value=0.6, step=0.001, format="%.3f"),
+        "ndvi": st.column_config.NumberColumn("NDVI (optional)", min_value=0.0, max_value=1.0, step=0.01, format="%.2f"),
+    })
+    for p, theta, ndvi in zip(edited["plot"], edited["theta_vwc"], edited["ndvi"]):
+        entries[p] = dict(theta=_reading(theta), ndvi=_reading(ndvi))
+
+    def plot_input(p, k):
+        return entries.get(p, {}).get(k)
+
+    def replay_later(ledger, p, since, fresh=None):
+        # replay_later_days over this plot's stored inputs (`fresh`: rows
+        # just saved, not read back yet)
+        inputs = inputs_by_date(read_sheet(st.secrets["gsheets"]["daily_inputs_ws"], plots=[p]))
+        inputs.update(fresh or {})
+        plot_cfg = registry.config_for(p, cfg)
+        # one span per replay: the scalar decide functions are not timed per call
+        with perf.span("app.replay_later_days", plot=p):
+            outs = replay_later_days(ledger, p, since, inputs, registry.treatment_of(p),
+                                     lambda _: plot_cfg, eto_cache().get)
+        perf.count("logic.decide_scalar", len(outs))
+        return outs
+
+    rows = [[d.isoformat(), p, plot_input(p, "theta"), rain_obs, rain_fc, plot_input(p, "ndvi"), eto, note]
+            for p in plots]
 
     if st.button("Save inputs to Google Sheet"):
-        append_rows(st.secrets["gsheets"]["daily_inputs_ws"], rows)
-        st.success("Daily inputs saved.")
+        written = upsert_rows(st.secrets["gsheets"]["daily_inputs_ws"], rows, ROW_KEY, wait=True)
+        # decisions already made for this day (and the days after it) are
+        # re-run with the edited inputs
+        ledger = dr_ledger()
+        redone = []
+        for row in rows:
+            if ledger.get(row[1], d) is not None:
+                redone += replay_later(ledger, row[1], d, {d: dict(zip(DAILY_INPUT_HEADERS, row))})
+        if redone:
+            written &= upsert_rows(st.secrets["gsheets"]["decisions_ws"], replayed_rows(redone), ROW_KEY, wait=True)
+            ledger.flush(DR_WS)
+        saved(written, "Daily inputs saved." + (f" {len(redone)} decision(s) recomputed." if redone else ""))
 
     st.markdown("---")
     st.subheader("📏 Weekly Plant Heights (6 plants/plot)")
-    ph_rows = []
     ph_date = st.date_input("Height date", value=date.today(), key="height_date")
-    for p in PLOTS:
-        with st.expander(f"{p} heights"):
-            for pid in range(1, 7):
-                h = st.number_input(f"{p} Plant {pid} height (cm)", 0.0, 100.0, 0.0, 0.1, key=f"h_{p}_{pid}")
-                if h > 0:
-                    ph_rows.append([ph_date.isoformat(), p, pid, h])
+    heights = st.session_state.setdefault("plant_heights", {})
+    hcols = [f"plant_{pid}" for pid in range(1, 7)]
+    hgrid = pd.DataFrame([[p] + list(heights.get(p, [None] * 6)) for p in page_plots],
+                         columns=["plot"] + hcols).astype({c: float for c in hcols})
+    hedit = st.data_editor(hgrid, key=f"heights_grid_{page}_{page_size}", hide_index=True, disabled=["plot"],
+                           use_container_width=True, column_config={
+        c: st.column_config.NumberColumn(f"Plant {i} (cm)", min_value=0.0, max_value=100.0, step=0.1)
+        for i, c in enumerate(hcols, 1)
+    })
+    for r in hedit.itertuples(index=False):
+        heights[r.plot] = [_reading(v) for v in r[1:]]
+    ph_rows = [[ph_date.isoformat(), p, pid, h]
+               for p in plots for pid, h in enumerate(heights.get(p, []), 1) if h]
     if st.button("Save plant heights"):
-        append_rows(st.secrets["gsheets"]["plant_ws"], ph_rows)
-        st.success("Plant heights saved.")
+        saved(upsert_rows(st.secrets["gsheets"]["plant_ws"], ph_rows, PLANT_KEY, wait=True), "Plant heights saved.")
 
     st.markdown("---")
     st.subheader("🧮 Compute decisions (T2, T3, T4)")
-    if "Dr" not in st.session_state:
-        st.session_state.Dr = {p: 0.0 for p in PLOTS}
+    def day_batch(ledger):
+        return pd.DataFrame({
+            "date": pd.Timestamp(d), "plot": plots, "treatment": [registry.treatment_of(p) for p in plots],
+            "ETo": eto, "rain_obs": rain_obs, "rain_fcst": rain_fc,
+            "theta": [plot_input(p, "theta") for p in plots], "ndvi": [plot_input(p, "ndvi") for p in plots],
+            "Dr_start": [ledger.dr_start(p, d) for p in plots],
+        })
 
     def compute_and_log_decisions():
-        decision_rows = []
-        for p in PLOTS:
-            if p == "T1":
-                decision_rows.append([d.isoformat(), p, "T1", "Manual", "Farmer", "", "", "", "", "", rain_fc, "", ""])
-                continue
-
-            Dr_start = st.session_state.Dr.get(p, 0.0)
-            theta = plot_inputs[p]["theta"]
-            ndvi = plot_inputs[p]["ndvi"]
-
-            if p == "T2":
-                out = decide_T2(d, eto, rain_obs, rain_fc, theta, Dr_start, cfg)
-            elif p == "T3":
-                out = decide_T3(d, eto, rain_obs, rain_fc, ndvi, Dr_start, cfg)
-            else:
-                out = decide_T4_strict(d, eto, rain_obs, rain_fc, ndvi, theta, Dr_start, cfg)
-
-            st.session_state.Dr[p] = 0.0 if out["decision"] == "Irrigate" else out["Dr_end"]
-
-            decision_rows.append([
-                d.isoformat(), p, out["plot"], out["decision"], out["reason"],
-                round(out["Dr_start"],1), round(out["RAW"],1),
-                ("" if "theta_vwc" not in out or out["theta_vwc"] is None else round(out["theta_vwc"],3)),
-                ("" if "theta_trigger" not in out else round(out["theta_trigger"],3)),
-                ("" if "ndvi" not in out or out["ndvi"] is None else round(out["ndvi"],2)),
-                round(out["kc"],2) if "kc" in out else "",
-                rain_fc,
-                round(out["irr_gross_mm"],1) if out["decision"]=="Irrigate" else "",
-                round(out["irr_liters"],1) if out["decision"]=="Irrigate" else "",
-            ])
-        append_rows(st.secrets["gsheets"]["decisions_ws"], decision_rows)
-        return decision_rows
+        # All plots in one vectorized pass (grouped by per-plot overrides).
+        ledger = dr_ledger()
+        batch = day_batch(ledger)
+        out = registry.decide_batch(batch, cfg)
+        out["plot"] = batch["plot"].to_numpy()
+        out["treatment"] = batch["treatment"].to_numpy()
+        auto = out[out["decision"] != "Manual"]
+        later = []
+        for p, start, end in zip(auto["plot"], auto["Dr_start"], auto["Dr_end"]):
+            if ledger.set(p, d, float(start), float(end)) and ledger.has_later(p, d):
+                later += replay_later(ledger, p, d + timedelta(days=1))
+        rows = decision_rows(out)
+        written = upsert_rows(st.secrets["gsheets"]["decisions_ws"], rows + replayed_rows(later), ROW_KEY, wait=True)
+        ledger.flush(DR_WS)
+        return rows, written
 
     if st.button("Compute & save today’s decisions"):
-        rows2 = compute_and_log_decisions()
-        st.success("Decisions computed & saved.")
-        st.dataframe(pd.DataFrame(rows2, columns=[
-            "date","plot","treatment","decision","reason","Dr","RAW","theta","theta_trigger","ndvi","Kc","rain_fcst","irr_mm","irr_L"
-        ]), use_container_width=True)
-
-with tab_admin:
+        rows2, written = compute_and_log_decisions()
+        saved(written, "Decisions computed & saved.")
+        st.dataframe(pd.DataFrame(rows2, columns=DECISION_HEADERS), use_container_width=True)
+
+    with st.expander("🎲 Rain forecast ensemble (what-if for the skip threshold)"):
+        st.caption("Next-24 h rain is drawn from an ensemble and each plot's water balance is run one day "
+                   "ahead: P(Dr > RAW) tomorrow and the water used today plus the expected catch-up, "
+                   "per skip threshold. Nothing is saved.")
+        from ensemble import THRESHOLDS, evaluate, rain_scenarios, summary
+        e1, e2, e3 = st.columns(3)
+        members = e1.text_input("Ensemble members (mm, comma-separated)", "",
+                                help="Blank: spread around the point forecast")
+        cv = e2.slider("Wet-day amount CV", 0.3, 2.0, 1.0, 0.1, disabled=bool(members.strip()))
+        n_scen = e3.select_slider("Scenarios", [500, 1000, 2000, 5000], value=2000)
+        thresholds = sorted(set(THRESHOLDS) | {cfg.rain_skip_mm})
+        try:
+            values = [float(v) for v in members.replace(";", ",").split(",") if v.strip()]
+        except ValueError:
+            st.error("Members must be numbers in mm.")
+            values = None
+        run = st.toggle("Run the ensemble", key="ensemble_on",
+                        help="Off by default so other Dashboard interactions stay cheap")
+        if run and values is not None:
+            # recomputed only when the inputs, settings or ensemble change
+            batch = day_batch(dr_ledger())
+            key = (int(pd.util.hash_pandas_object(batch, index=False).sum()), cfg, tuple(values),
+                   float(cv), int(n_scen), float(rain_fc), tuple(registry.specs(include_inactive=True)))
+            cached = st.session_state.get("ensemble_result")
+            if cached is not None and cached[0] == key:
+                res = cached[1]
+            else:
+                rain = rain_scenarios(rain_fc, int(n_scen), members=values, cv=cv, seed=0)
+                res = evaluate(batch, cfg, rain, thresholds, decide=registry.decide_batch,
+                               config_for=lambda p: registry.config_for(p, cfg))
+                st.session_state["ensemble_result"] = (key, res)
+            if res.empty:
+                st.info("No automatic plots.")
+            else:
+                st.dataframe(summary(res).rename(columns={
+                    "skip_mm": "skip ≥ (mm)", "p_rain_ge": "P(rain ≥ skip)", "p_cross": "mean P(Dr>RAW)",
+                    "irrigate": "plots irrigated", "irr_L": "today (L)", "expected_L": "expected (L)"}),
+                    hide_index=True, use_container_width=True)
+                page_res = res[res["plot"].isin(page_plots)]
+                st.dataframe(page_res.pivot(index="plot", columns="skip_mm", values="p_cross")
+                             .reindex([p for p in page_plots if p in set(page_res["plot"])])
+                             .rename(columns=lambda t: f"P(Dr>RAW) @ {t:g} mm"), use_container_width=True)
+
+def view_admin():
     st.subheader("⚙️ Admin – Configuration & Calibration")
-    from data_io import read_sheet, _open_ws
     from datetime import date as _d
 
-    try:
-        df_meta = read_sheet(st.secrets["gsheets"]["metadata_ws"])
-        current = {r["key"]: r["value"] for _, r in df_meta.iterrows()} if not df_meta.empty else {}
-    except Exception:
-        df_meta = pd.DataFrame()
-        current = {}
+    current = settings_of(history.latest())
 
     c1, c2, c3 = st.columns(3)
     theta_fc = c1.number_input("θ_fc (m³/m³)", 0.1, 0.6, float(current.get("theta_fc", 0.30)), 0.01)
@@ -150,11 +352,9 @@ with tab_admin:
     c1, c2, c3 = st.columns(3)
     eta = c1.number_input("Application efficiency η", 0.5, 0.98, float(current.get("eta", 0.85)), 0.01)
     rain_skip = c2.number_input("Rain forecast skip ≥ (mm)", 0.0, 10.0, float(current.get("rain_skip", 2.0)), 0.5)
-    transplant_str = current.get("transplant_date", str(_d(2025, 11, 6)))
-    transplant_date = c3.date_input("Transplant date", value=_d.fromisoformat(transplant_str))
+    transplant_date = c3.date_input("Transplant date", value=current["transplant_date"])
 
     if st.button("💾 Save settings (append history)"):
-        ws = _open_ws(st.secrets["gsheets"]["metadata_ws"])
         now = _d.today().isoformat()
         rows = [
             ["theta_fc", theta_fc, now],
@@ -169,18 +369,146 @@ with tab_admin:
             ["rain_skip", rain_skip, now],
             ["transplant_date", transplant_date.isoformat(), now],
         ]
-        vals = ws.get_all_values()
-        if not vals:
-            ws.append_row(["key","value","timestamp"], value_input_option="USER_ENTERED")
-        ws.append_rows(rows, value_input_option="USER_ENTERED")
-        st.success("Settings saved to metadata history.")
+        saved(append_rows(st.secrets["gsheets"]["metadata_ws"], rows, wait=True),
+              "Settings saved to metadata history.")
+
+    if len(history):
+        with st.expander(f"Settings history ({len(history)} versions)"):
+            st.dataframe(pd.DataFrame([dict(effective_from=d, **s) for d, s in history.versions()]),
+                         use_container_width=True)
+
+    st.markdown("---")
+    st.subheader("🌱 Plot registry")
+    st.caption("Blank overrides use the global settings. Untick active to retire a plot.")
+    reg_edit = st.data_editor(registry.to_frame(), key="plot_registry", hide_index=True, num_rows="dynamic",
+                              use_container_width=True, column_config={
+        "treatment": st.column_config.TextColumn("treatment", help="T1 = manual; T2, T3, T4 = automatic rules"),
+        "active": st.column_config.CheckboxColumn("active", default=True),
+    })
+    if st.button("💾 Save plot registry"):
+        changed = registry.changed_rows(reg_edit)
+        written = append_rows(PLOTS_WS, changed, wait=True)
+        plot_registry()
+        saved(written, f"Saved {len(changed)} plot row(s).")
+
+    st.markdown("---")
+    st.subheader("📥 Bulk sensor ingestion")
+    st.caption("Logger CSV/Parquet files with timestamp, plot and theta_vwc and/or ndvi columns. "
+               "Daily means per plot are appended; days already in the sheet are skipped.")
+    files = st.file_uploader("Sensor files", type=["csv", "parquet"], accept_multiple_files=True)
+    i1, i2 = st.columns(2)
+    tz = i1.text_input("Site time zone", "Asia/Tokyo")
+    include_today = i2.checkbox("Include today (incomplete day)", value=False)
+    if files and st.button("Ingest sensor files"):
+        from ingest import ingest
+        with st.spinner("Aggregating readings…"):
+            res = ingest(files, st.secrets["gsheets"]["daily_inputs_ws"], tz=tz or None,
+                         plots=registry.plots(), include_today=include_today)
+        st.success(f"{res['written']} plot-days written from {res['readings']} readings "
+                   f"({res['skipped_existing']} already present, {res['rejected']} out-of-range readings dropped).")
+        if res["pending"]:
+            st.warning(f"Google Sheets has not confirmed yet; still pending: {pending_message()}.")
+        if res["unknown_plots"]:
+            st.warning("Readings for plots not in the registry were ignored: " + ", ".join(res["unknown_plots"]))
+        if res["rows"]:
+            st.dataframe(pd.DataFrame(res["rows"], columns=DAILY_INPUT_HEADERS), use_container_width=True)
+
+    station = st.file_uploader("Weather station records (daily, hourly or sub-hourly)", type=["csv", "parquet"], key="station_file")
+    if station is not None and st.button("Save station records"):
+        from eto import WEATHER_HEADERS, station_frame
+        df_st = pd.read_parquet(station) if station.name.lower().endswith(".parquet") else pd.read_csv(station)
+        df_st = station_frame(df_st).reindex(columns=WEATHER_HEADERS)
+        df_st["timestamp"] = df_st["timestamp"].dt.strftime("%Y-%m-%d %H:%M")
+        ensure_headers(WEATHER_WS, WEATHER_HEADERS)
+        # keyed on the timestamp: re-uploading an overlapping export rewrites those records
+        written = upsert_rows(WEATHER_WS, df_st.astype(object).where(df_st.notna(), "").values.tolist(),
+                              ("timestamp",), wait=True)
+        saved(written, f"{len(df_st)} station records saved; ETo available for {len(eto_cache())} days.")
 
-with tab_analytics:
+    st.markdown("---")
+    st.subheader("⏪ Season replay / backfill")
+    r1, r2 = st.columns(2)
+    replay_start = r1.date_input("Replay from", value=cfg.transplant_date, key="replay_start")
+    replay_end = r2.date_input("Replay to", value=date.today(), key="replay_end")
+    per_day_cfg = st.checkbox("Use the saved settings in effect on each day (ignore sidebar)", value=True)
+    dry_run = st.button("Dry run replay")
+    write_replay = st.button("Replay & write decisions")
+    if dry_run or write_replay:
+        from replay import replay_season
+        df_hist = read_sheet(st.secrets["gsheets"]["daily_inputs_ws"])
+        Dr0 = {p: dr_ledger().dr_start(p, replay_start) for p in registry.plots()}
+        ledger = dr_ledger() if write_replay else None
+        df_replay = replay_season(df_hist, cfg, Dr0=Dr0, start=replay_start, end=replay_end, ledger=ledger,
+                                  cfg_for=history.as_of if per_day_cfg else None, registry=registry,
+                                  eto=eto_cache().series(),
+                                  ws_name=st.secrets["gsheets"]["decisions_ws"] if write_replay else None)
+        if ledger is not None:
+            ledger.flush(DR_WS)
+            st.success(f"Replayed {len(df_replay)} plot-days and saved decisions.")
+        st.dataframe(df_replay, use_container_width=True)
+
+    st.markdown("---")
+    st.subheader("🎯 Calibration sweep")
+    k1, k2 = st.columns(2)
+    n_samples = k1.number_input("Random candidates", 10, 20000, 500, 10)
+    seed = k2.number_input("Seed", 0, 10**6, 0, 1)
+    from calibrate import RANK_WEIGHTS
+    st.caption("Ranking weights (metrics are normalized across the candidates; lower score is better)")
+    w1, w2, w3 = st.columns(3)
+    weights = dict(
+        theta_rmse=w1.slider("Agreement with θ sensor", 0.0, 3.0, RANK_WEIGHTS["theta_rmse"], 0.1),
+        water_L=w2.slider("Season water", 0.0, 3.0, RANK_WEIGHTS["water_L"], 0.1),
+        triggers=w3.slider("Irrigation triggers", 0.0, 3.0, RANK_WEIGHTS["triggers"], 0.1))
+    if st.button("Run calibration sweep"):
+        from calibrate import random_samples, sweep
+        df_hist = read_sheet(st.secrets["gsheets"]["daily_inputs_ws"])
+        with st.spinner("Replaying season for every candidate…"):
+            df_cal = sweep(df_hist, cfg, random_samples(cfg, int(n_samples), seed=int(seed)),
+                           plots=registry.plots(), treatments=registry.treatments(), eto=eto_cache().series(),
+                           weights=weights)
+        st.dataframe(df_cal.head(50).round(4), use_container_width=True)
+
+    st.markdown("---")
+    st.subheader("⏱ Performance")
+    if st.toggle("Show performance panel", key="perf_panel"):
+        perf_panel()
+
+def perf_panel():
+    # Traces are per process (all sessions); the current rerun is still open.
+    reruns = perf.traces("rerun")
+    dur = perf.trace_durations(reruns)
+    if dur:
+        st.caption(f"Last {dur['n']} reruns · p50 {dur['p50_ms']:.0f} ms · p95 {dur['p95_ms']:.0f} ms")
+    scope = st.radio("Spans from", ["Previous rerun", "All kept reruns", "Background threads"], horizontal=True)
+    if scope == "Previous rerun":
+        sel = reruns[-1:]
+    elif scope == "All kept reruns":
+        sel = reruns
+    else:
+        sel = perf.traces(include_background=True)[-1:]
+    st.dataframe(perf.summarize(sel).round(2), use_container_width=True)
+    counters = {}
+    for t in sel:
+        for k, v in t.counters.items():
+            counters[k] = counters.get(k, 0) + v
+    if counters:
+        st.json(counters)
+    st.download_button("Export traces (JSON lines)", perf.export_jsonl(perf.traces(include_background=True)),
+                       file_name="perf_traces.jsonl", mime="application/json")
+    if st.button("Profile next rerun (cProfile)"):
+        st.session_state["_profile_next"] = True
+        st.rerun()
+    if "_profile_report" in st.session_state:
+        with st.expander("cProfile – last profiled rerun"):
+            st.code(st.session_state["_profile_report"])
+
+def view_analytics():
+    from analytics import MAX_POINTS, clean_inputs_decisions, merge_inputs_decisions, plot_chart, wue_table
     st.subheader("📊 Analytics & Visualization")
     try:
-        df_in = read_sheet(st.secrets["gsheets"]["daily_inputs_ws"])
-        df_dec = read_sheet(st.secrets["gsheets"]["decisions_ws"])
-        df_h = read_sheet(st.secrets["gsheets"]["plant_ws"])
+        g = st.secrets["gsheets"]
+        frames = read_sheets([g["daily_inputs_ws"], g["decisions_ws"], g["plant_ws"]])
+        df_in, df_dec, df_h = frames[g["daily_inputs_ws"]], frames[g["decisions_ws"]], frames[g["plant_ws"]]
     except Exception as e:
         st.error(f"Error reading data: {e}")
         df_in=df_dec=df_h=pd.DataFrame()
@@ -188,165 +516,106 @@ with tab_analytics:
     if df_in.empty or df_dec.empty:
         st.info("Add some data first to see analytics.")
     else:
-        for df in [df_in, df_dec]:
-            if "date" in df.columns:
-                df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        df_dec["irr_mm"] = pd.to_numeric(df_dec.get("irr_mm", 0), errors="coerce").fillna(0)
-        df_dec["irr_L"] = pd.to_numeric(df_dec.get("irr_L", 0), errors="coerce").fillna(0)
-        df_in["theta_vwc"] = pd.to_numeric(df_in.get("theta_vwc", 0), errors="coerce").fillna(0)
-        df_in["ndvi"] = pd.to_numeric(df_in.get("ndvi", 0), errors="coerce").fillna(0)
+        store = summaries(df_dec, df_in, df_h)
+        df_in, df_dec = clean_inputs_decisions(df_in, df_dec)
 
         plots = sorted(df_dec["plot"].dropna().unique())
         selected_plots = st.multiselect("Select plot(s)", plots, default=plots)
-        df_dec_filt = df_dec[df_dec["plot"].isin(selected_plots)]
-        df_in_filt = df_in[df_in["plot"].isin(selected_plots)]
 
         st.markdown("### 🌿 NDVI & Soil Moisture vs Irrigation")
-        df_merge = pd.merge(df_in_filt, df_dec_filt[["date","plot","decision","irr_mm"]], on=["date","plot"], how="left")
+        df_merge = merge_inputs_decisions(df_in, df_dec, selected_plots)
+        # Zooming in (a narrower range) shows finer detail: each chart gets at
+        # most `points` line points however long the range is.
+        dates = df_merge["date"].dropna()
+        start = end = None
+        if not dates.empty and dates.min() < dates.max():
+            lo, hi = dates.min().date(), dates.max().date()
+            start, end = st.slider("Date range", min_value=lo, max_value=hi, value=(lo, hi), key="analytics_range")
+        points = st.select_slider("Chart detail (points per line)", [150, 300, MAX_POINTS, 1200, 2400],
+                                  value=MAX_POINTS, key="analytics_points")
+        cache = chart_cache()
         for p in selected_plots:
             st.markdown(f"#### Plot {p}")
             df_p = df_merge[df_merge["plot"] == p].sort_values("date")
             if df_p.empty:
                 st.info(f"No data for {p}")
                 continue
-            base = alt.Chart(df_p).encode(x="date:T")
-            ndvi_line = base.mark_line(color="green").encode(y=alt.Y("ndvi:Q", title="NDVI"))
-            soil_line = base.mark_line(color="steelblue").encode(y=alt.Y("theta_vwc:Q", title="Soil moisture (m³/m³)"))
-            irr_bars = base.mark_bar(color="orange", opacity=0.4).encode(y=alt.Y("irr_mm:Q", title="Irrigation (mm)"))
-            chart = alt.layer(ndvi_line, soil_line, irr_bars).resolve_scale(y="independent").properties(height=300)
-            st.altair_chart(chart, use_container_width=True)
+            with perf.span("analytics.chart", plot=p):
+                series = cache.series(p, df_p, start, end, points)
+            st.altair_chart(plot_chart(series), use_container_width=True)
 
         st.markdown("### 💧 Water-Use Efficiency (WUE)")
         if not df_h.empty and not df_dec.empty:
-            df_h["date"] = pd.to_datetime(df_h["date"], errors="coerce")
-            df_h["height_cm"] = pd.to_numeric(df_h["height_cm"], errors="coerce")
-            h_agg = df_h.groupby("plot")["height_cm"].agg(["min","max"]).reset_index()
-            irr_agg = df_dec.groupby("plot")["irr_L"].sum().reset_index()
-            wue = pd.merge(h_agg, irr_agg, on="plot", how="left")
-            wue["WUE (cm/L)"] = (wue["max"] - wue["min"]) / wue["irr_L"].replace(0, pd.NA)
-            st.dataframe(wue.round(3), use_container_width=True)
-
-with tab_reports:
+            st.dataframe(wue_table(store.plot_totals()).round(3), use_container_width=True)
+
+        st.markdown("### 📅 Weekly totals per plot")
+        weekly = store.weekly(plots=selected_plots)
+        st.dataframe(weekly[["week", "plot", "irr_L", "irr_mm", "ndvi_mean", "theta_mean", "height_mean"]]
+                     .assign(week=weekly["week"].dt.date).round(3), use_container_width=True, hide_index=True)
+
+def view_reports():
+    from emailer import send_email_with_pdf
+    from report import weekly_charts
     st.subheader("🧾 Weekly PDF Report & Email")
     today = date.today()
     week_start = today - timedelta(days=7)
 
+    store = summaries()  # refreshes the three sheets in one batched read
     try:
-        df_in = read_sheet(st.secrets["gsheets"]["daily_inputs_ws"])
-        df_dec = read_sheet(st.secrets["gsheets"]["decisions_ws"])
-        df_ph = read_sheet(st.secrets["gsheets"]["plant_ws"])
+        df_in_w = read_sheet(st.secrets["gsheets"]["daily_inputs_ws"], start=week_start, end=today)
     except Exception as e:
         st.error(f"Error reading data: {e}")
-        df_in=df_dec=df_ph=pd.DataFrame()
-
-    for df in (df_in, df_dec, df_ph):
-        if not df.empty and "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-    df_in_w  = df_in[df_in["date"].between(week_start, today)].copy() if not df_in.empty else pd.DataFrame()
-    df_dec_w = df_dec[df_dec["date"].between(week_start, today)].copy() if not df_dec.empty else pd.DataFrame()
-    df_ph_w  = df_ph[df_ph["date"].between(week_start, today)].copy() if not df_ph.empty else pd.DataFrame()
-
-    irr_chart = alt.Chart(df_dec_w).mark_bar().encode(
-        x="plot:N", y="sum(irr_L):Q", color="plot:N", tooltip=["plot", "sum(irr_L)"]
-    ).properties(title="Total Irrigation (L) – This Week", height=300)
-
-    ndvi_chart = alt.Chart(df_in_w).mark_circle(size=60).encode(
-        x=alt.X("theta_vwc:Q", title="Soil Moisture (m³/m³)"),
-        y=alt.Y("ndvi:Q", title="NDVI"),
-        color="plot:N",
-        tooltip=["plot","date","theta_vwc","ndvi"]
-    ).properties(title="NDVI vs Soil Moisture", height=300)
-
-    st.altair_chart(irr_chart, use_container_width=True)
-    st.altair_chart(ndvi_chart, use_container_width=True)
-
-    if not df_ph_w.empty:
-        df_hm = df_ph_w.groupby(["date","plot"], as_index=False)["height_cm"].mean()
-        height_chart = alt.Chart(df_hm).mark_line(point=True).encode(
-            x="date:T", y=alt.Y("height_cm:Q", title="Mean height (cm)"), color="plot:N",
-            tooltip=["plot","date","height_cm"]
-        ).properties(title="Plant Height Trend (mean of 6 plants)", height=300)
-        st.altair_chart(height_chart, use_container_width=True)
-    else:
-        height_chart = None
-        st.info("No plant height data this week.")
-
-    if not df_ph_w.empty and not df_dec_w.empty:
-        h_mean = df_ph_w.groupby("plot", as_index=False)["height_cm"].mean().rename(columns={"height_cm":"height_mean"})
-        irr_sum = df_dec_w.groupby("plot", as_index=False)["irr_L"].sum().rename(columns={"irr_L":"irr_L_week"})
-        wue = h_mean.merge(irr_sum, on="plot", how="left")
-        wue["WUE_cm_per_L"] = wue["height_mean"] / wue["irr_L_week"].replace(0, pd.NA)
-        wue_chart = alt.Chart(wue.fillna(0)).mark_bar().encode(
-            x="plot:N", y=alt.Y("WUE_cm_per_L:Q", title="WUE (cm/L)"),
-            color="plot:N", tooltip=["plot","height_mean","irr_L_week","WUE_cm_per_L"]
-        ).properties(title="Water-Use Efficiency (this week)", height=300)
-        st.altair_chart(wue_chart, use_container_width=True)
-    else:
-        wue_chart = None
-
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib import colors
-    from reportlab.lib.units import cm
-
-    def chart_to_image(chart):
-        import altair_saver
-        return io.BytesIO(chart.save(None, format='png'))
-
-    def make_pdf(buffer, df_dec, df_in, charts_images):
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1.5*cm, bottomMargin=1.5*cm)
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='CenterTitle', alignment=1, fontSize=18, spaceAfter=20))
-        styles.add(ParagraphStyle(name='SectionHeader', fontSize=14, textColor=colors.HexColor('#006400'), spaceAfter=10))
-        story = []
-        story.append(Paragraph("<b>Smart Irrigation System – Weekly Report</b>", styles['CenterTitle']))
-        story.append(Paragraph("<b>Crop:</b> Spinach  &nbsp;&nbsp;  <b>Site:</b> Utsunomiya, Japan", styles['Normal']))
-        story.append(Paragraph(f"<b>Period:</b> {week_start} – {today}", styles['Normal']))
-        story.append(Paragraph("<b>Prepared by:</b> Patrick Habyarimana<br/><b>Verified by:</b> Supervisor / Advisor", styles['Normal']))
-        story.append(Spacer(1, 20))
-        story.append(Paragraph("Executive Summary", styles['SectionHeader']))
+        df_in_w=pd.DataFrame(columns=["date","plot","theta_vwc","ndvi"])
+
+    totals = store.plot_totals(week_start, today)
+    wc = weekly_charts(totals, df_in_w, store.daily(week_start, today))
+    with perf.span("reports.show_charts"):
+        st.altair_chart(wc["irr"], use_container_width=True)
+        st.altair_chart(wc["ndvi"], use_container_width=True)
+        if wc["height"] is not None:
+            st.altair_chart(wc["height"], use_container_width=True)
+        else:
+            st.info("No plant height data this week.")
+        if wc["wue"] is not None:
+            st.altair_chart(wc["wue"], use_container_width=True)
+
+    charts = [c for c in wc.values() if c is not None]
+    pdf_job = report_cache().pdf(totals, charts, week_start, today)
+
+    def report_actions():
         try:
-            total_irr = df_dec.groupby("plot")["irr_L"].sum().to_dict()
-            mean_ndvi = df_in.groupby("plot")["ndvi"].mean().to_dict()
-            best_eff = min(total_irr, key=total_irr.get) if total_irr else None
-            highest_ndvi = max(mean_ndvi, key=mean_ndvi.get) if mean_ndvi else None
-            diff_ratio = (1 - (total_irr.get("T3", 0) / (total_irr.get("T2", 1) + 1e-6))) * 100
-            summary_text = f"""During {week_start}–{today}, plot <b>{best_eff}</b> used the least water ({total_irr.get(best_eff,0):.1f} L),
-            while plot <b>{highest_ndvi}</b> achieved the highest mean NDVI ({mean_ndvi.get(highest_ndvi,0):.2f}).
-            T3 used {diff_ratio:.1f}% less water than T2 with comparable canopy vigor."""
-            story.append(Paragraph(summary_text, styles['Normal']))
+            pdf_bytes = pdf_job.result()
         except Exception as e:
-            story.append(Paragraph(f"<i>Summary unavailable (data incomplete): {e}</i>", styles['Normal']))
-        story.append(Spacer(1, 12))
-        story.append(Paragraph("Irrigation & NDVI Analysis", styles['SectionHeader']))
-        for img in charts_images:
-            story.append(RLImage(img, width=15*cm, height=8*cm))
-            story.append(Spacer(1, 10))
-        irr_tbl = df_dec.groupby("plot")["irr_L"].sum().reset_index()
-        ndvi_tbl = df_in.groupby("plot")["ndvi"].mean().reset_index()
-        merged = pd.merge(irr_tbl, ndvi_tbl, on="plot", how="left").round(2)
-        data = [["Plot", "Irrigation (L)", "Mean NDVI"]] + merged.values.tolist()
-        table = Table(data)
-        story.append(table)
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
-
-    charts = [irr_chart, ndvi_chart]
-    if height_chart is not None:
-        charts.append(height_chart)
-    if wue_chart is not None:
-        charts.append(wue_chart)
-    imgs = [chart_to_image(c) for c in charts]
-    buffer = io.BytesIO()
-    pdf = make_pdf(buffer, df_dec_w, df_in_w, imgs)
-    st.download_button("Download Weekly_Report.pdf", pdf, file_name=f"Weekly_Report_{today}.pdf")
-
-    if st.button("Send Report Now"):
-        try:
-            msg_id = send_email_with_pdf(pdf, filename=f"Weekly_Report_{today}.pdf")
-            st.success(f"Email sent! Gmail Message ID: {msg_id}")
-        except Exception as e:
-            st.error(f"Failed to send email: {e}")
+            st.error(f"Failed to build report: {e}")
+            return
+        st.download_button("Download Weekly_Report.pdf", pdf_bytes, file_name=f"Weekly_Report_{today}.pdf")
+
+        if st.button("Send Report Now"):
+            try:
+                msg_id = send_email_with_pdf(io.BytesIO(pdf_bytes), filename=f"Weekly_Report_{today}.pdf",
+                                             service=gmail())
+                st.success(f"Email sent! Gmail Message ID: {msg_id}")
+            except Exception as e:
+                st.error(f"Failed to send email: {e}")
+
+    if pdf_job.done():
+        report_actions()
+    else:
+        @st.fragment(run_every=1.0)
+        def wait_for_report():
+            if pdf_job.done():
+                st.rerun()
+            st.info("Rendering the weekly report in the background…")
+        wait_for_report()
+
+try:
+    st.navigation([
+        st.Page(view_dashboard, title="Dashboard", icon="🏠", default=True),
+        st.Page(view_admin, title="Admin", icon="⚙️"),
+        st.Page(view_analytics, title="Analytics", icon="📊"),
+        st.Page(view_reports, title="Reports", icon="🧾"),
+    ]).run()
+finally:
+    if _profiler is not None:
+        st.session_state["_profile_report"] = perf.profile_report(_profiler)
+    perf.end_trace(_trace)
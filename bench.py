@@ -0,0 +1,270 @@
+from __future__ import annotations
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from logic import Config, PLOTS, decide, decide_batch
+
+# Reproducible timings for the hot paths on a synthetic season:
+#   python bench.py --plots 40 --days 120 --compare
+# Each run appends one JSON line to the results file; --compare flags cases
+# whose median got slower than the previous run with the same parameters.
+
+RESULTS_PATH = "bench_results.jsonl"
+TRANSPLANT = date(2025, 1, 1)
+
+def plot_names(n_plots: int) -> List[str]:
+    # T1..T4 first, then replicates T1.1, T2.1, ... of the same treatments
+    return [PLOTS[i % 4] + ("" if i < 4 else f".{i // 4}") for i in range(n_plots)]
+
+def treatment_of(plot: str) -> str:
+    return plot.split(".")[0]
+
+def synthetic_registry(n_plots: int):
+    from plot_registry import PlotRegistry, PlotSpec
+    return PlotRegistry([PlotSpec(p, treatment_of(p)) for p in plot_names(n_plots)])
+
+def synthetic_season(n_plots: int, n_days: int, seed: int = 0,
+                     start: date = TRANSPLANT) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    # Frames shaped like read_sheet() of the daily inputs, decisions and plant sheets.
+    rng = np.random.default_rng(seed)
+    plots = plot_names(n_plots)
+    days = pd.date_range(start, periods=n_days, freq="D")
+    n = n_days * n_plots
+    date_col = np.repeat(days, n_plots)
+    plot_col = np.tile(plots, n_days)
+    season = np.repeat(np.sin(np.linspace(0, np.pi, n_days)), n_plots)
+    rain = np.where(rng.random(n) < 0.2, rng.gamma(1.5, 4.0, n), 0.0).round(1)
+    theta = rng.normal(0.22, 0.04, n).clip(0.08, 0.35).round(3)
+    theta[rng.random(n) < 0.1] = np.nan  # missing sensor readings
+    df_in = pd.DataFrame(dict(
+        date=date_col, plot=plot_col, theta_vwc=theta, rain_obs=rain,
+        rain_fcst_24h=np.roll(rain, -n_plots), ndvi=(0.3 + 0.5 * season + rng.normal(0, 0.03, n)).round(2),
+        eto=(2.0 + 2.5 * season + rng.normal(0, 0.3, n)).clip(0.5).round(2), notes=""))
+    irrigate = rng.random(n) < 0.25
+    irr_mm = np.where(irrigate, rng.uniform(5, 25, n), 0.0).round(1)
+    df_dec = pd.DataFrame(dict(
+        date=date_col, plot=plot_col, treatment=[treatment_of(p) for p in plot_col],
+        decision=np.where(irrigate, "Irrigate", "Skip"), reason="", Dr=rng.uniform(0, 30, n).round(1),
+        RAW=20.0, theta=theta, theta_trigger=0.19, ndvi=df_in["ndvi"], Kc=1.0, rain_fcst=df_in["rain_fcst_24h"],
+        irr_mm=irr_mm, irr_L=irr_mm))
+    # six plants per plot measured weekly
+    weeks = days[::7]
+    m = len(weeks) * n_plots * 6
+    df_ph = pd.DataFrame(dict(
+        date=np.repeat(weeks, n_plots * 6), plot=np.tile(np.repeat(plots, 6), len(weeks)),
+        plant_id=np.tile(np.arange(1, 7), len(weeks) * n_plots),
+        height_cm=(5 + 2.5 * np.repeat(np.arange(len(weeks)), n_plots * 6) + rng.normal(0, 1, m)).round(1)))
+    return df_in, df_dec, df_ph
+
+def sheet_rows(df: pd.DataFrame) -> List[List[Any]]:
+    df = df.copy()
+    df["date"] = df["date"].dt.date.astype(str)
+    return df.astype(object).where(df.notna(), "").values.tolist()
+
+def timeit(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return dict(min_s=min(times), median_s=statistics.median(times), repeat=repeat)
+
+def timeit_setup(setup: Callable[[], Callable[[], Any]], repeat: int) -> Dict[str, float]:
+    # setup() runs untimed before each repetition and returns the timed callable
+    times = []
+    for _ in range(repeat):
+        fn = setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return dict(min_s=min(times), median_s=statistics.median(times), repeat=repeat)
+
+# -- cases -------------------------------------------------------------------
+def bench_logic(df_in: pd.DataFrame, cfg: Config, repeat: int) -> Dict[str, Dict]:
+    from replay import normalize_inputs, replay_season
+    from calibrate import season_arrays, simulate
+    df = normalize_inputs(df_in, list(df_in["plot"].unique()))
+    df = df.assign(treatment=[treatment_of(p) for p in df["plot"]], Dr_start=10.0)
+    records = df.to_dict("records")
+
+    def scalar():
+        for r in records:
+            theta = None if pd.isna(r["theta"]) else r["theta"]
+            ndvi = None if pd.isna(r["ndvi"]) else r["ndvi"]
+            decide(r["treatment"], r["date"].date(), r["ETo"], r["rain_obs"], r["rain_fcst"],
+                   theta, ndvi, r["Dr_start"], cfg)
+
+    registry = synthetic_registry(df_in["plot"].nunique())
+    arrs = season_arrays(df_in, cfg, registry.plots(), registry.treatments())
+    return {
+        "logic.decide_scalar": timeit(scalar, repeat),
+        "logic.decide_batch": timeit(lambda: decide_batch(df, cfg), repeat),
+        "replay.replay_season": timeit(lambda: replay_season(df_in, cfg, registry=registry), repeat),
+        "calibrate.simulate": timeit(lambda: simulate(arrs, cfg), repeat),
+    }
+
+def bench_data_io(df_in: pd.DataFrame, repeat: int) -> Dict[str, Dict]:
+    # Local SQLite stand-in for the Sheets backend; data_io reads the setting at first use.
+    tmp = tempfile.mkdtemp(prefix="irrigation-bench-")
+    os.environ["IRRIGATION_STORAGE"] = "sqlite:" + os.path.join(tmp, "bench.db")
+    os.environ.setdefault("IRRIGATION_WRITE_SPOOL", os.path.join(tmp, "appends.jsonl"))
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import data_io
+    headers = list(df_in.columns)
+    rows = sheet_rows(df_in)
+    n = iter(range(repeat * 2))
+
+    def append():
+        ws = f"inputs_{next(n)}"
+        data_io.ensure_headers(ws, headers)
+        data_io.append_rows(ws, rows, wait=True)
+
+    data_io.ensure_headers("inputs", headers)
+    data_io.append_rows("inputs", rows, wait=True)
+    last = pd.Timestamp(df_in["date"].max()).date()
+    first_plot = df_in["plot"].iloc[0]
+    return {
+        "data_io.append_rows": timeit(append, repeat),
+        "data_io.read_sheet": timeit(lambda: data_io.read_sheet("inputs"), repeat),
+        "data_io.read_sheet_week_plot": timeit(
+            lambda: data_io.read_sheet("inputs", start=last - timedelta(days=7), end=last, plots=[first_plot]), repeat),
+    }
+
+def bench_analytics(df_in: pd.DataFrame, df_dec: pd.DataFrame, df_ph: pd.DataFrame, repeat: int) -> Dict[str, Dict]:
+    from analytics import clean_inputs_decisions, merge_inputs_decisions, wue_table
+    from summaries import SummaryStore
+    plots = list(df_in["plot"].unique())
+    store = SummaryStore().update(df_dec, df_in, df_ph)
+    # one more day of decisions appended to the season already summarized
+    last = df_dec["date"].max()
+    day = df_dec[df_dec["date"] == last].assign(date=last + pd.Timedelta(days=1))
+    df_dec_next = pd.concat([df_dec, day], ignore_index=True)
+
+    def run():
+        i, d = clean_inputs_decisions(df_in, df_dec)
+        merge_inputs_decisions(i, d, plots)
+        wue_table(store.plot_totals())
+
+    def incremental():
+        s = SummaryStore().update(df_dec, df_in, df_ph)
+        return lambda: s.update(decisions=df_dec_next)
+
+    def rebuild():
+        SummaryStore().update(df_dec, df_in, df_ph)
+
+    return {
+        "analytics.merge_wue": timeit(run, repeat),
+        "summaries.rebuild": timeit(rebuild, repeat),
+        "summaries.append_day": timeit_setup(incremental, repeat),
+    }
+
+def bench_report(df_in: pd.DataFrame, df_dec: pd.DataFrame, df_ph: pd.DataFrame, repeat: int) -> Dict[str, Dict]:
+    missing = [m for m in ("vl_convert", "reportlab") if importlib.util.find_spec(m) is None]
+    if missing:
+        print(f"skipping report benchmarks: {', '.join(missing)} not installed", file=sys.stderr)
+        return {}
+    from report import weekly_charts, chart_to_png, make_pdf
+    from summaries import SummaryStore
+    last = df_in["date"].max()
+    first = last - pd.Timedelta(days=6)
+    store = SummaryStore().update(df_dec, df_in, df_ph)
+    totals = store.plot_totals(first, last)
+    charts = [c for c in weekly_charts(totals, df_in[df_in["date"] >= first], store.daily(first, last)).values()
+              if c is not None]
+    pngs = [chart_to_png(c) for c in charts]
+    return {
+        "report.chart_to_png": timeit(lambda: [chart_to_png(c) for c in charts], repeat),
+        "report.make_pdf": timeit(lambda: make_pdf(io.BytesIO(), totals, [io.BytesIO(p) for p in pngs],
+                                                   first.date(), last.date()), repeat),
+    }
+
+SUITES = ("logic", "data_io", "analytics", "report")
+
+# -- results -----------------------------------------------------------------
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(run: Dict[str, Any], previous: Dict[str, Any], tolerance: float) -> List[str]:
+    # A case regresses when its median is more than `tolerance` slower.
+    regressions = []
+    for name, cur in run["results"].items():
+        prev = previous["results"].get(name)
+        if prev and cur["median_s"] > prev["median_s"] * (1 + tolerance):
+            regressions.append(f"{name}: {prev['median_s'] * 1e3:.1f} ms -> {cur['median_s'] * 1e3:.1f} ms "
+                               f"(+{(cur['median_s'] / prev['median_s'] - 1) * 100:.0f}%)")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the decision logic, data layer and report pipeline.")
+    ap.add_argument("--plots", type=int, default=20)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    ap.add_argument("--results", default=RESULTS_PATH)
+    ap.add_argument("--compare", action="store_true", help="flag regressions against the previous run")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args(argv)
+
+    df_in, df_dec, df_ph = synthetic_season(args.plots, args.days, args.seed)
+    cfg = Config(transplant_date=TRANSPLANT)
+    results: Dict[str, Dict] = {}
+    if "logic" in args.only:
+        results.update(bench_logic(df_in, cfg, args.repeat))
+    if "data_io" in args.only:
+        results.update(bench_data_io(df_in, args.repeat))
+    if "analytics" in args.only:
+        results.update(bench_analytics(df_in, df_dec, df_ph, args.repeat))
+    if "report" in args.only:
+        results.update(bench_report(df_in, df_dec, df_ph, args.repeat))
+
+    params = dict(plots=args.plots, days=args.days, repeat=args.repeat, seed=args.seed)
+    run = dict(timestamp=datetime.now().isoformat(timespec="seconds"), revision=git_revision(),
+               python=platform.python_version(), machine=platform.machine(), params=params, results=results)
+    for name, r in results.items():
+        print(f"{name:32s} min {r['min_s'] * 1e3:9.2f} ms   median {r['median_s'] * 1e3:9.2f} ms")
+
+    status = 0
+    if args.compare:
+        same = [r for r in load_results(args.results) if r.get("params") == params]
+        if not same:
+            print("no previous run with the same parameters to compare against")
+        else:
+            regressions = compare(run, same[-1], args.tolerance)
+            print(f"compared with {same[-1].get('revision')} ({same[-1]['timestamp']}):")
+            for line in regressions:
+                print("  REGRESSION " + line)
+            if not regressions:
+                print("  no regressions")
+            status = 1 if regressions else 0
+
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
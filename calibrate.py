@@ -0,0 +1,165 @@
+from __future__ import annotations
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from logic import Config, PLOTS, stage_arrays, decide_arrays
+from replay import normalize_inputs
+from config_store import apply_settings
+
+DEFAULT_BOUNDS: Dict[str, Tuple[float, float]] = {
+    "theta_fc": (0.20, 0.45),
+    "theta_wp": (0.05, 0.20),
+    "alpha": (0.2, 0.8),
+    "a": (0.8, 1.6),
+    "b": (0.0, 0.4),
+    "active_gate": (0.5, 1.1),
+    "rain_skip": (0.0, 6.0),
+}
+
+# Candidates are ranked by a weighted sum of min-max normalized metrics, all
+# lower-is-better: agreement with the soil sensor (theta_rmse), season water
+# and irrigation triggers. A candidate without theta observations scores as the
+# worst on agreement.
+RANK_WEIGHTS: Dict[str, float] = {"theta_rmse": 1.0, "water_L": 1.0, "triggers": 1.0}
+
+# sweep keys are metadata_ws setting names (see config_store.SETTING_FIELDS)
+apply_params = apply_settings
+
+def _valid(params: Dict[str, float], cfg: Config) -> bool:
+    fc = params.get("theta_fc", cfg.soil.theta_fc)
+    wp = params.get("theta_wp", cfg.soil.theta_wp)
+    return wp < fc
+
+def grid(cfg: Config, **axes: Sequence[float]) -> List[Dict[str, float]]:
+    keys = list(axes)
+    combos = (dict(zip(keys, values)) for values in itertools.product(*axes.values()))
+    return [c for c in combos if _valid(c, cfg)]
+
+def random_samples(cfg: Config, n: int, bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+                   seed: Optional[int] = None) -> List[Dict[str, float]]:
+    bounds = bounds or DEFAULT_BOUNDS
+    rng = np.random.default_rng(seed)
+    draws = {k: rng.uniform(lo, hi, n) for k, (lo, hi) in bounds.items()}
+    combos = ({k: float(v[i]) for k, v in draws.items()} for i in range(n))
+    return [c for c in combos if _valid(c, cfg)]
+
+@dataclass
+class SeasonArrays:
+    plots: List[str]
+    dat: np.ndarray                  # (days,)
+    stage: Dict[str, np.ndarray]     # stage table per day, shared by every candidate
+    ETo: np.ndarray                  # (days, plots) below
+    rain_obs: np.ndarray
+    rain_fcst: np.ndarray
+    theta: np.ndarray
+    ndvi: np.ndarray
+    present: np.ndarray
+    is_t2: np.ndarray                # (plots,)
+    is_t3: np.ndarray
+    is_t4: np.ndarray
+
+def season_arrays(df_in: pd.DataFrame, cfg: Config, plots: Optional[List[str]] = None,
+                  treatments: Optional[Dict[str, str]] = None, eto: Optional[pd.Series] = None) -> SeasonArrays:
+    # treatments maps plot -> treatment (default: the plot name). Per-plot
+    # overrides from the registry are not applied: the sweep fits shared params.
+    plots = list(plots or (treatments or PLOTS))
+    df = normalize_inputs(df_in, plots, eto)
+    days = pd.DatetimeIndex(sorted(df["date"].unique()))
+
+    def grid_of(col: str) -> np.ndarray:
+        return df.pivot(index="date", columns="plot", values=col).reindex(index=days, columns=plots).to_numpy(dtype=float)
+
+    present = df.assign(x=1.0).pivot(index="date", columns="plot", values="x") \
+                .reindex(index=days, columns=plots).notna().to_numpy()
+    dat = (days - pd.Timestamp(cfg.transplant_date)).days.to_numpy()
+    treatment = np.asarray([(treatments or {}).get(p, p) for p in plots])
+    return SeasonArrays(
+        plots=plots, dat=dat, stage=stage_arrays(dat, cfg),
+        ETo=np.nan_to_num(grid_of("ETo")), rain_obs=np.nan_to_num(grid_of("rain_obs")),
+        rain_fcst=np.nan_to_num(grid_of("rain_fcst")), theta=grid_of("theta"), ndvi=grid_of("ndvi"),
+        present=present, is_t2=treatment == "T2", is_t3=treatment == "T3", is_t4=treatment == "T4",
+    )
+
+def simulate(arrs: SeasonArrays, cfg: Config) -> Dict[str, float]:
+    # Full-season replay for one candidate, vectorized across plots. A plot
+    # with no input row on a day keeps its Dr and makes no decision.
+    Dr = np.zeros(len(arrs.plots))
+    water_L = 0.0
+    triggers = 0
+    sq_err = 0.0
+    n_obs = 0
+    fc = cfg.soil.theta_fc
+    for i in range(len(arrs.dat)):
+        stg = {k: v[i] for k, v in arrs.stage.items()}
+        m = arrs.present[i]
+        t2, t3, t4 = arrs.is_t2 & m, arrs.is_t3 & m, arrs.is_t4 & m
+        auto = t2 | t3 | t4
+        res = decide_arrays(stg, arrs.ETo[i], arrs.rain_obs[i], arrs.rain_fcst[i],
+                            arrs.theta[i], arrs.ndvi[i], Dr, t2, t3, t4, cfg)
+        # Dr at the start of the day expressed as volumetric water content
+        theta_model = fc - Dr / (1000.0 * stg["zr_m"])
+        obs = auto & ~np.isnan(arrs.theta[i])
+        sq_err += float(((theta_model - arrs.theta[i])[obs] ** 2).sum())
+        n_obs += int(obs.sum())
+        water_L += float(res["irr_liters"][auto].sum())
+        triggers += int(res["irrigate"][auto].sum())
+        Dr = np.where(auto, res["Dr_end"], Dr)
+    return dict(water_L=water_L, triggers=triggers,
+                theta_rmse=float(np.sqrt(sq_err / n_obs)) if n_obs else np.nan, n_theta_obs=n_obs)
+
+_WORKER: Dict[str, object] = {}
+
+def _init_worker(arrs: SeasonArrays, base: Config):
+    _WORKER["arrs"] = arrs
+    _WORKER["base"] = base
+
+def _score(params: Dict[str, float]) -> Dict[str, float]:
+    cfg = apply_params(_WORKER["base"], params)
+    return {**params, **simulate(_WORKER["arrs"], cfg)}
+
+def score(results: pd.DataFrame, weights: Optional[Dict[str, float]] = None) -> pd.Series:
+    weights = RANK_WEIGHTS if weights is None else weights
+    total = pd.Series(0.0, index=results.index)
+    for col, w in weights.items():
+        if not w:
+            continue
+        x = pd.to_numeric(results[col], errors="coerce")
+        spread = x.max() - x.min()
+        norm = (x - x.min()) / spread if spread > 0 else x * 0.0
+        total += w * norm.fillna(1.0)
+    return total / (sum(w for w in weights.values() if w) or 1.0)
+
+def rank(results: pd.DataFrame, weights: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    # score in [0, 1], 0 = best on every weighted metric
+    if results.empty:
+        return results
+    out = results.assign(score=score(results, weights))
+    out = out.sort_values(["score", "theta_rmse"], na_position="last", kind="stable").reset_index(drop=True)
+    out.insert(0, "rank", np.arange(1, len(out) + 1))
+    return out
+
+def sweep(df_in: pd.DataFrame, base: Config, candidates: Iterable[Dict[str, float]],
+          plots: Optional[List[str]] = None, max_workers: Optional[int] = None,
+          weights: Optional[Dict[str, float]] = None, treatments: Optional[Dict[str, str]] = None,
+          eto: Optional[pd.Series] = None) -> pd.DataFrame:
+    # The season inputs and stage table are built once and shipped to each
+    # worker process when it starts, not with every candidate.
+    candidates = list(candidates)
+    arrs = season_arrays(df_in, base, plots, treatments, eto)
+    workers = min(max_workers or os.cpu_count() or 1, max(1, len(candidates)))
+    if workers == 1:
+        _init_worker(arrs, base)
+        results = [_score(c) for c in candidates]
+    else:
+        chunksize = max(1, len(candidates) // (workers * 4))
+        # spawn, not fork: the Streamlit server forking mid-request would copy
+        # locks held by its other threads (write-behind queue, sheet readers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(arrs, base)) as ex:
+            results = list(ex.map(_score, candidates, chunksize=chunksize))
+    return rank(pd.DataFrame(results), weights)
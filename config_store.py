@@ -0,0 +1,138 @@
+from __future__ import annotations
+import threading
+from bisect import bisect_right
+from dataclasses import replace
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from logic import Config
+
+METADATA_HEADERS = ["key","value","timestamp"]
+DEFAULT_TRANSPLANT = date(2025, 11, 6)
+
+# metadata_ws key (also a per-plot override column, see plot_registry)
+# -> (nested Config field or None, attribute)
+SETTING_FIELDS: Dict[str, Tuple[Optional[str], str]] = {
+    "theta_fc": ("soil", "theta_fc"),
+    "theta_wp": ("soil", "theta_wp"),
+    "alpha": ("soil", "alpha"),
+    "a": ("ndvi2kc", "a"),
+    "b": ("ndvi2kc", "b"),
+    "kc_min": ("ndvi2kc", "kc_min"),
+    "kc_max": ("ndvi2kc", "kc_max"),
+    "active_gate": ("ndvi2kc", "active_gate"),
+    "eta": (None, "efficiency"),
+    "rain_skip": (None, "rain_skip_mm"),
+    "transplant_date": (None, "transplant_date"),
+    "area_m2": (None, "area_m2"),
+}
+
+def _setting_value(key: str, value: Any) -> Any:
+    if key == "transplant_date":
+        return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+    return float(value)
+
+def apply_settings(cfg: Config, settings: Dict[str, Any]) -> Config:
+    # Returns a new Config; cfg and its nested params are left untouched.
+    top, nested = {}, {}
+    for key, value in settings.items():
+        if key not in SETTING_FIELDS:
+            continue
+        group, attr = SETTING_FIELDS[key]
+        if group is None:
+            top[attr] = _setting_value(key, value)
+        else:
+            nested.setdefault(group, {})[attr] = _setting_value(key, value)
+    for group, attrs in nested.items():
+        top[group] = replace(getattr(cfg, group), **attrs)
+    return replace(cfg, **top)
+
+def settings_of(cfg: Config) -> Dict[str, Any]:
+    out = {}
+    for key, (group, attr) in SETTING_FIELDS.items():
+        out[key] = getattr(cfg if group is None else getattr(cfg, group), attr)
+    return out
+
+# Versioned view of the append-only metadata history. Each distinct timestamp
+# is a version holding the full merged settings in effect from that date;
+# a later save on the same day replaces the earlier one and versions that
+# change nothing are dropped. That compaction is of this in-memory view
+# only: the sheet keeps every row. Lookups are a bisect over the version dates
+# and each version's Config is built once.
+class ConfigHistory:
+    def __init__(self, base: Config):
+        self.base = base
+        self.n_rows = 0
+        self._dates: List[date] = []
+        self._settings: List[Dict[str, Any]] = []
+        self._configs: List[Config] = []
+        # every save as (date, keys it set), in date order, to rebuild from
+        self._changes: List[Tuple[date, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, base: Config) -> "ConfigHistory":
+        hist = cls(base)
+        hist.extend(df)
+        return hist
+
+    def extend(self, df: pd.DataFrame):
+        # Rows must be the metadata rows after the first n_rows already seen.
+        if df is None or df.empty:
+            return
+        self.n_rows += len(df)
+        ts = pd.to_datetime(df["timestamp"], errors="coerce").dt.date
+        rows = df.assign(_ts=ts).dropna(subset=["_ts"])
+        rows = rows[rows["key"].isin(list(SETTING_FIELDS))]
+        for d, grp in rows.groupby("_ts", sort=True):
+            self._add_version(d, dict(zip(grp["key"], grp["value"])))
+
+    def sync(self, df: pd.DataFrame) -> "ConfigHistory":
+        # df is the whole metadata sheet; only rows not seen yet are indexed.
+        with self._lock:
+            if df is not None and len(df) > self.n_rows:
+                self.extend(df.iloc[self.n_rows:])
+        return self
+
+    def _add_version(self, d: date, changes: Dict[str, Any]):
+        changes = {k: _setting_value(k, v) for k, v in changes.items()}
+        if self._changes and d < self._changes[-1][0]:
+            # out-of-order history (backdated row): rebuild from the saves,
+            # as merged versions no longer tell which keys a later save set
+            i = bisect_right([c[0] for c in self._changes], d)
+            self._changes.insert(i, (d, changes))
+            self._dates, self._settings, self._configs = [], [], []
+            for cd, ch in self._changes:
+                self._fold(cd, ch)
+            return
+        self._changes.append((d, changes))
+        self._fold(d, changes)
+
+    def _fold(self, d: date, changes: Dict[str, Any]):
+        prev = self._settings[-1] if self._settings else {}
+        merged = {**prev, **changes}
+        if self._dates and self._dates[-1] == d:
+            self._settings[-1] = merged
+            self._configs[-1] = apply_settings(self.base, merged)
+        elif merged != prev:
+            self._dates.append(d)
+            self._settings.append(merged)
+            self._configs.append(apply_settings(self.base, merged))
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def versions(self) -> List[Tuple[date, Dict[str, Any]]]:
+        return list(zip(self._dates, self._settings))
+
+    def settings_as_of(self, d: date) -> Dict[str, Any]:
+        i = bisect_right(self._dates, d)
+        return dict(self._settings[i - 1]) if i else {}
+
+    def as_of(self, d: date) -> Config:
+        # Shared instance: callers must not mutate it (use apply_settings).
+        i = bisect_right(self._dates, d)
+        return self._configs[i - 1] if i else self.base
+
+    def latest(self) -> Config:
+        return self._configs[-1] if self._configs else self.base
@@ -1,53 +1,134 @@
 from __future__ import annotations
+import os
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
-from typing import List, Any
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
+from typing import List, Any, Optional, Dict, Iterable, Sequence, Tuple
+from storage import StorageBackend, SQLiteBackend, DateLike, ON_CONFLICT
+from sheets import GSheetsBackend, authorize
+from write_queue import WriteBehindQueue
+from perf import span
 
 @st.cache_resource(show_spinner=False)
 def _client():
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=SCOPES
-    )
-    return gspread.authorize(creds)
+    return authorize(st.secrets["gcp_service_account"])
 
 @st.cache_resource(show_spinner=False)
 def _open_workbook():
-    client = _client()
-    wb_name = st.secrets["gsheets"]["workbook_name"]
-    return client.open(wb_name)
+    return _client().open(st.secrets["gsheets"]["workbook_name"])
 
-def _open_ws(name: str):
-    wb = _open_workbook()
+def _storage_setting() -> str:
+    # IRRIGATION_STORAGE=sqlite:/path/to.db runs without any Google service
+    env = os.environ.get("IRRIGATION_STORAGE")
+    if env:
+        return env
     try:
-        return wb.worksheet(name)
+        return st.secrets.get("storage", {}).get("backend", "gsheets")
     except Exception:
-        wb.add_worksheet(title=name, rows=1000, cols=50)
-        return wb.worksheet(name)
+        return "gsheets"
+
+@st.cache_resource(show_spinner=False)
+def _backend() -> StorageBackend:
+    setting = _storage_setting()
+    if setting.startswith("sqlite"):
+        _, _, path = setting.partition(":")
+        return SQLiteBackend(path or os.path.join(".local_store", "irrigation.db"))
+    return GSheetsBackend(_open_workbook)
+
+WRITE_SPOOL = os.environ.get("IRRIGATION_WRITE_SPOOL", os.path.join(".write_spool", "appends.jsonl"))
+
+# Bumped whenever rows of a worksheet are rewritten in place, so caches
+# built on "append-only" (e.g. SummaryStore) know to rebuild. Combined with the
+# backend's own generation, which covers rewrites made outside this process.
+_generations: Dict[str, int] = {}
+
+def sheet_generation(ws_name: str) -> Tuple[int, Any]:
+    return _generations.get(ws_name, 0), _backend().generation(ws_name)
+
+def _write_rows(ws_name: str, rows: List[List[Any]], upsert=None):
+    if upsert is None:
+        _backend().append_rows(ws_name, rows)
+        return
+    updated, _ = _backend().upsert_rows(ws_name, rows, *upsert)
+    if updated:
+        _generations[ws_name] = _generations.get(ws_name, 0) + 1
+
+@st.cache_resource(show_spinner=False)
+def _write_queue() -> WriteBehindQueue:
+    return WriteBehindQueue(_write_rows, WRITE_SPOOL)
+
+# Appends to a remote backend are spooled locally and written by a background
+# thread; pass wait=True (or call flush_writes) when the caller must read them
+# back. A wait gives up after WAIT_TIMEOUT_S and returns False: the rows stay
+# spooled and are written once the backend recovers (see pending_writes).
+WAIT_TIMEOUT_S = 30.0
+
+def _wait_for(bid: int) -> bool:
+    return _write_queue().flush(WAIT_TIMEOUT_S, batch=bid)
+
+def append_row(ws_name: str, row: List[Any], wait: bool = False) -> bool:
+    return append_rows(ws_name, [row], wait=wait)
+
+def append_rows(ws_name: str, rows: List[List[Any]], wait: bool = False) -> bool:
+    # True when the rows are written, False while they are still queued
+    if not rows:
+        return True
+    with span("data_io.append_rows", ws=ws_name, rows=len(rows)):
+        if not _backend().deferred_writes:
+            _write_rows(ws_name, rows)
+            return True
+        bid = _write_queue().enqueue(ws_name, rows)
+        return _wait_for(bid) if wait else False
+
+def upsert_rows(ws_name: str, rows: List[List[Any]], key_cols: Sequence[str],
+                on_conflict: str = "update", wait: bool = False) -> bool:
+    # Like append_rows, but a row whose key (e.g. date, plot) is already in the
+    # sheet is rewritten in place ("update") or dropped ("skip").
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {ON_CONFLICT}, not {on_conflict!r}")
+    if not rows:
+        return True
+    upsert = (tuple(key_cols), on_conflict)
+    with span("data_io.upsert_rows", ws=ws_name, rows=len(rows)):
+        if not _backend().deferred_writes:
+            _write_rows(ws_name, rows, upsert)
+            return True
+        bid = _write_queue().enqueue(ws_name, rows, upsert)
+        return _wait_for(bid) if wait else False
+
+def flush_writes(timeout: Optional[float] = None) -> bool:
+    return _write_queue().flush(timeout)
+
+def pending_writes() -> Dict[str, int]:
+    # worksheet -> rows queued but not written yet
+    if not _backend().deferred_writes:
+        return {}
+    return _write_queue().pending()
+
+def pending_message() -> str:
+    pending = pending_writes()
+    return ", ".join(f"{ws}: {n} row(s)" for ws, n in pending.items()) or "none"
+
+def write_queue_stats() -> Dict[str, Any]:
+    return _write_queue().stats()
 
-def append_row(ws_name: str, row: List[Any]):
-    ws = _open_ws(ws_name)
-    ws.append_row(row, value_input_option="USER_ENTERED")
+def read_sheet(ws_name: str, refresh: bool = False, start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None, plots: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    with span("data_io.read_sheet", ws=ws_name):
+        return _backend().read(ws_name, start=start, end=end, plots=plots, refresh=refresh)
 
-def append_rows(ws_name: str, rows: List[List[Any]]):
-    ws = _open_ws(ws_name)
-    if rows:
-        ws.append_rows(rows, value_input_option="USER_ENTERED")
+def read_sheets(ws_names: Iterable[str], refresh: bool = False, start: Optional[DateLike] = None,
+                end: Optional[DateLike] = None, plots: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    # Several worksheets in one round trip on the Sheets backend; keyed by name.
+    ws_names = list(ws_names)
+    with span("data_io.read_sheets", sheets=len(ws_names)):
+        return _backend().read_many(ws_names, start=start, end=end, plots=plots, refresh=refresh)
 
-def read_sheet(ws_name: str) -> pd.DataFrame:
-    ws = _open_ws(ws_name)
-    data = ws.get_all_records()
-    return pd.DataFrame(data)
+_verified_headers: Dict[str, Tuple[str, ...]] = {}
 
 def ensure_headers(ws_name: str, headers: List[str]):
-    ws = _open_ws(ws_name)
-    vals = ws.get_all_values()
-    if not vals:
-        ws.append_row(headers, value_input_option="USER_ENTERED")
+    # Verified once per process; app.py calls this on every rerun.
+    key = tuple(headers)
+    if _verified_headers.get(ws_name) == key:
+        return
+    _backend().ensure_headers(ws_name, headers)
+    _verified_headers[ws_name] = key
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+import pandas as pd
+
+DR_HEADERS = ["plot","date","Dr_start","Dr_end","updated"]
+
+# step(day, Dr_start) -> Dr carried into the next day (0.0 after irrigating),
+# or None when the day has no inputs to re-run it with
+DrStep = Callable[[date, float], Optional[float]]
+
+def carried_dr(out: Mapping[str, Any]) -> float:
+    return 0.0 if out["decision"] == "Irrigate" else float(out["Dr_end"])
+
+# Per-plot root-zone depletion keyed by (plot, date). The backing worksheet is
+# append-only: a re-computed day appends a new row and the last row for a
+# (plot, date) wins when the ledger is loaded.
+class DrLedger:
+    def __init__(self):
+        self._dates: Dict[str, List[date]] = {}
+        self._vals: Dict[Tuple[str, date], Tuple[float, float]] = {}
+        self._pending: List[List[Any]] = []
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DrLedger":
+        ledger = cls()
+        if df is None or df.empty:
+            return ledger
+        df = df.drop_duplicates(["plot","date"], keep="last")
+        for plot, d, start, end in zip(df["plot"].astype(str), pd.to_datetime(df["date"]).dt.date,
+                                       pd.to_numeric(df["Dr_start"], errors="coerce").fillna(0.0),
+                                       pd.to_numeric(df["Dr_end"], errors="coerce").fillna(0.0)):
+            ledger._put(plot, d, float(start), float(end))
+        return ledger
+
+    @classmethod
+    def load(cls, ws_name: str) -> "DrLedger":
+        from data_io import read_sheet
+        return cls.from_frame(read_sheet(ws_name))
+
+    def _put(self, plot: str, d: date, start: float, end: float):
+        if (plot, d) not in self._vals:
+            insort(self._dates.setdefault(plot, []), d)
+        self._vals[(plot, d)] = (start, end)
+
+    def dates(self, plot: str) -> List[date]:
+        return list(self._dates.get(plot, []))
+
+    def get(self, plot: str, d: date) -> Optional[Tuple[float, float]]:
+        return self._vals.get((plot, d))
+
+    def dr_start(self, plot: str, d: date) -> float:
+        dates = self._dates.get(plot, [])
+        i = bisect_left(dates, d)
+        if i == 0:
+            return 0.0
+        return self._vals[(plot, dates[i - 1])][1]
+
+    def has_later(self, plot: str, d: date) -> bool:
+        dates = self._dates.get(plot, [])
+        return bisect_right(dates, d) < len(dates)
+
+    def set(self, plot: str, d: date, start: float, end: float) -> bool:
+        if self._vals.get((plot, d)) == (start, end):
+            return False
+        self._put(plot, d, start, end)
+        self._pending.append([plot, d.isoformat(), start, end, date.today().isoformat()])
+        return True
+
+    def record(self, plot: str, d: date, step: DrStep) -> float:
+        start = self.dr_start(plot, d)
+        end = step(d, start)
+        self.set(plot, d, start, end)
+        return end
+
+    # Re-run `step` over the stored days from `start` onwards, stopping at the
+    # first unchanged day past `until` (the latest edited date): every later
+    # day only depends on that day's Dr. A day step cannot re-run keeps its
+    # stored change in Dr (end - start), applied to the new start.
+    def recompute(self, plot: str, start: date, step: DrStep, until: Optional[date] = None) -> int:
+        until = until or start
+        dates = self._dates.get(plot, [])
+        Dr = self.dr_start(plot, start)
+        n = 0
+        for d in dates[bisect_left(dates, start):]:
+            end = step(d, Dr)
+            if end is None:
+                old_start, old_end = self._vals[(plot, d)]
+                end = max(0.0, Dr + old_end - old_start)
+            n += 1
+            if not self.set(plot, d, Dr, end) and d >= until:
+                break
+            Dr = end
+        return n
+
+    def pending_rows(self) -> List[List[Any]]:
+        return list(self._pending)
+
+    def flush(self, ws_name: str, append: Optional[Callable[[str, List[List[Any]]], None]] = None) -> int:
+        # append defaults to data_io.append_rows; runner.py passes a site backend's
+        if append is None:
+            from data_io import append_rows as append
+        rows = self.pending_rows()
+        if rows:
+            append(ws_name, rows)
+        self._pending = []
+        return len(rows)
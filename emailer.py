@@ -2,34 +2,41 @@ import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-import streamlit as st
+from perf import span
 
-def gmail_service():
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=["https://www.googleapis.com/auth/gmail.send"]
-    )
-    return build("gmail", "v1", credentials=creds)
+GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+BODY = "Dear researcher,\n\nPlease find attached the weekly Smart Irrigation report.\n\nBest regards,\nSmart Irrigation Dashboard"
 
-def send_email_with_pdf(pdf_buffer, filename="Weekly_Report.pdf"):
-    sender = st.secrets["gmail"]["sender"]
-    to = st.secrets["gmail"]["to"]
-    subject = st.secrets["gmail"]["subject"]
-    body = "Dear researcher,\n\nPlease find attached the weekly Smart Irrigation report.\n\nBest regards,\nSmart Irrigation Dashboard"
+def gmail_service(service_account_info=None):
+    # Build once and reuse: discovery and auth cost more than a send.
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+    if service_account_info is None:
+        import streamlit as st
+        service_account_info = st.secrets["gcp_service_account"]
+    creds = Credentials.from_service_account_info(service_account_info, scopes=GMAIL_SCOPES)
+    with span("gmail.service"):
+        return build("gmail", "v1", credentials=creds)
 
+def pdf_message(pdf_bytes: bytes, filename: str, sender: str, to: str, subject: str, body: str = BODY) -> str:
     message = MIMEMultipart()
     message["to"] = to
     message["from"] = sender
     message["subject"] = subject
     message.attach(MIMEText(body, "plain"))
 
-    part = MIMEApplication(pdf_buffer.getvalue(), _subtype="pdf")
+    part = MIMEApplication(pdf_bytes, _subtype="pdf")
     part.add_header("Content-Disposition", "attachment", filename=filename)
     message.attach(part)
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
 
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    service = gmail_service()
-    sent = service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
+def send_pdf(service, pdf_buffer, filename: str, sender: str, to: str, subject: str) -> str:
+    raw_message = pdf_message(pdf_buffer.getvalue(), filename, sender, to, subject)
+    with span("gmail.send", bytes=len(raw_message)):
+        sent = service.users().messages().send(userId="me", body={"raw": raw_message}).execute()
     return sent.get("id")
+
+def send_email_with_pdf(pdf_buffer, filename="Weekly_Report.pdf", service=None):
+    import streamlit as st
+    g = st.secrets["gmail"]
+    return send_pdf(service or gmail_service(), pdf_buffer, filename, g["sender"], g["to"], g["subject"])
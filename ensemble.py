@@ -0,0 +1,91 @@
+from __future__ import annotations
+from dataclasses import replace
+from typing import Callable, Optional, Sequence
+import numpy as np
+import pandas as pd
+from logic import Config, decide_batch
+from perf import span
+
+# Monte Carlo view of the rain-forecast gate. For one day and every plot, each
+# skip threshold gives a decision (the point forecast against the threshold,
+# as in decide_batch); the next 24 h of rain is then drawn from an ensemble and
+# the water balance is run one day ahead for every scenario:
+#   Dr_next = max(0, Dr_carry + ETc - 0.8·rain)
+# p_cross is P(Dr_next > RAW) and expected_L the water used today plus the
+# expected catch-up irrigation tomorrow when RAW is crossed.
+
+N_SCENARIOS = 2000
+THRESHOLDS = (0.0, 1.0, 2.0, 3.0, 5.0)
+# scenarios per plot block, bounds the (plots, scenarios) working arrays
+BLOCK_CELLS = 1_000_000
+
+def rain_scenarios(fcst_mm: float, n: int = N_SCENARIOS, members: Optional[Sequence[float]] = None,
+                   cv: float = 1.0, wet_scale_mm: float = 2.0, seed: Optional[int] = None) -> np.ndarray:
+    # -> (n,) rain amounts in mm. Ensemble members are resampled as given;
+    # otherwise a single forecast becomes a dry/wet mixture with the same mean:
+    # P(wet) = 1 - exp(-fcst / wet_scale_mm), wet amounts Gamma with CV cv.
+    rng = np.random.default_rng(seed)
+    if members is not None and len(members):
+        return rng.choice(np.clip(np.asarray(members, dtype=float), 0.0, None), size=n, replace=True)
+    if fcst_mm <= 0:
+        return np.zeros(n)
+    pop = 1.0 - np.exp(-fcst_mm / wet_scale_mm)
+    shape = 1.0 / cv ** 2
+    wet = rng.random(n) < pop
+    return np.where(wet, rng.gamma(shape, fcst_mm / pop / shape, n), 0.0)
+
+def _crossing(Dr_carry: np.ndarray, ETc: np.ndarray, RAW: np.ndarray, l_per_mm: np.ndarray,
+              rain: np.ndarray) -> tuple:
+    # -> (P(Dr_next > RAW), E[catch-up liters]) per plot, over the scenarios in rain
+    p_cross = np.empty(len(Dr_carry))
+    catch_up = np.empty(len(Dr_carry))
+    per_plot = rain.ndim == 2
+    step = max(1, BLOCK_CELLS // rain.shape[-1])
+    for i in range(0, len(Dr_carry), step):
+        sl = slice(i, i + step)
+        r = rain[sl] if per_plot else rain[None, :]
+        Dr_next = np.maximum(0.0, (Dr_carry[sl] + ETc[sl])[:, None] - 0.8 * r)
+        crossed = Dr_next > RAW[sl, None]
+        p_cross[sl] = crossed.mean(axis=1)
+        catch_up[sl] = np.where(crossed, Dr_next, 0.0).mean(axis=1) * l_per_mm[sl]
+    return p_cross, catch_up
+
+def evaluate(batch: pd.DataFrame, cfg: Config, rain: np.ndarray, thresholds: Sequence[float] = THRESHOLDS,
+             decide: Callable[[pd.DataFrame, Config], pd.DataFrame] = decide_batch,
+             config_for: Optional[Callable[[str], Config]] = None) -> pd.DataFrame:
+    # batch: one day's decide_batch input plus a plot column; rain: (scenarios,)
+    # shared by all plots or (plots, scenarios). decide / config_for default to
+    # the global cfg (pass registry.decide_batch and registry.config_for for
+    # per-plot overrides). Manual plots are left out.
+    rain = np.asarray(rain, dtype=float)
+    plots = batch["plot"].to_numpy()
+    cfgs = [config_for(p) if config_for else cfg for p in plots]
+    l_per_mm = np.array([c.area_m2 / c.efficiency for c in cfgs])
+    parts = []
+    with span("ensemble.evaluate", plots=len(batch), scenarios=rain.shape[-1], thresholds=len(thresholds)):
+        for t in thresholds:
+            out = decide(batch, replace(cfg, rain_skip_mm=float(t)))
+            auto = (out["decision"] != "Manual").to_numpy()
+            irrigate = (out["decision"] == "Irrigate").to_numpy()
+            Dr_carry = np.where(irrigate, 0.0, out["Dr_end"].to_numpy(dtype=float))
+            p_cross, catch_up = _crossing(Dr_carry[auto], out["ETc"].to_numpy(dtype=float)[auto],
+                                          out["RAW"].to_numpy(dtype=float)[auto], l_per_mm[auto],
+                                          rain[auto] if rain.ndim == 2 else rain)
+            r = rain[auto] if rain.ndim == 2 else rain[None, :]
+            irr_L = np.nan_to_num(out["irr_liters"].to_numpy(dtype=float)[auto])
+            parts.append(pd.DataFrame({
+                "plot": plots[auto], "skip_mm": float(t), "decision": out["decision"].to_numpy()[auto],
+                "p_rain_ge": np.broadcast_to((r >= t).mean(axis=1), (int(auto.sum()),)),
+                "p_cross": p_cross, "irr_L": irr_L, "expected_L": irr_L + catch_up,
+            }))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def summary(results: pd.DataFrame) -> pd.DataFrame:
+    # One row per skip threshold over all plots: mean crossing probability,
+    # plots irrigated today and the expected total water.
+    if results.empty:
+        return results
+    return results.groupby("skip_mm", as_index=False).agg(
+        p_rain_ge=("p_rain_ge", "mean"), p_cross=("p_cross", "mean"),
+        irrigate=("decision", lambda s: int((s == "Irrigate").sum())),
+        irr_L=("irr_L", "sum"), expected_L=("expected_L", "sum"))
@@ -0,0 +1,265 @@
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Mapping, Optional
+import numpy as np
+import pandas as pd
+from perf import timed
+
+# FAO-56 Penman-Monteith reference evapotranspiration, vectorized over a whole
+# season of weather-station records. Daily records use eq. 6 (Allen et al.
+# 1998); hourly records use eq. 53 and are summed per day, sub-hourly records
+# (10-, 30-min loggers) are averaged to hours first. Equation numbers below
+# refer to FAO Irrigation and Drainage Paper 56.
+
+@dataclass(frozen=True)
+class Site:
+    lat_deg: float
+    elev_m: float
+    lon_deg: Optional[float] = None      # east positive; needed for hourly records
+    utc_offset_h: Optional[float] = None # standard time of the station clock
+    wind_height_m: float = 2.0
+    albedo: float = 0.23
+
+def site_from_settings(s: Mapping[str, Any]) -> Site:
+    # [site] table of secrets.toml / runner.py; defaults are the Utsunomiya field
+    def opt(key: str, default: float) -> float:
+        return float(s.get(key, default))
+    return Site(lat_deg=opt("lat_deg", 36.55), elev_m=opt("elev_m", 119.0), lon_deg=opt("lon_deg", 139.87),
+                utc_offset_h=opt("utc_offset_h", 9.0), wind_height_m=opt("wind_height_m", 2.0))
+
+GSC = 0.0820          # solar constant, MJ m-2 min-1
+SIGMA_DAY = 4.903e-9  # Stefan-Boltzmann, MJ K-4 m-2 day-1
+SIGMA_HOUR = 2.043e-10
+
+# canonical column -> accepted (lower-case) names in station exports
+STATION_COLUMNS: Dict[str, tuple] = {
+    "timestamp": ("timestamp", "datetime", "time", "date"),
+    "t_air": ("t_air", "temp", "temperature", "t"),
+    "t_max": ("t_max", "tmax"),
+    "t_min": ("t_min", "tmin"),
+    "rh": ("rh", "rh_mean", "humidity"),
+    "rh_max": ("rh_max", "rhmax"),
+    "rh_min": ("rh_min", "rhmin"),
+    "t_dew": ("t_dew", "tdew", "dewpoint"),
+    "wind_ms": ("wind_ms", "wind", "wind_speed", "u"),
+    "rs_mj": ("rs_mj", "rs", "solar_mj"),
+    "rs_wm2": ("rs_wm2", "solar_wm2", "radiation_wm2"),
+    "sunshine_h": ("sunshine_h", "sunshine", "n_hours"),
+}
+
+WEATHER_HEADERS = list(STATION_COLUMNS)
+
+def station_frame(df: pd.DataFrame) -> pd.DataFrame:
+    lower = {str(c).strip().lower(): c for c in df.columns}
+    out = {}
+    for name, aliases in STATION_COLUMNS.items():
+        src = next((lower[a] for a in aliases if a in lower), None)
+        if src is not None:
+            out[name] = df[src] if name == "timestamp" else pd.to_numeric(df[src], errors="coerce")
+    if "timestamp" not in out:
+        raise ValueError("station records need a timestamp/date column")
+    out = pd.DataFrame(out)
+    ts = pd.to_datetime(out["timestamp"], errors="coerce")
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)  # station clock time
+    out = out.assign(timestamp=ts).dropna(subset=["timestamp"]).sort_values("timestamp", kind="stable")
+    # an overlapping re-upload repeats timestamps: the last copy wins, so a
+    # day's records are never summed twice
+    return out.drop_duplicates("timestamp", keep="last")
+
+def _col(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy(dtype=float) if name in df else np.full(len(df), np.nan)
+
+# -- shared terms ------------------------------------------------------------
+def sat_vp(t: np.ndarray) -> np.ndarray:
+    return 0.6108 * np.exp(17.27 * t / (t + 237.3))                  # eq. 11
+
+def slope_vp(t: np.ndarray) -> np.ndarray:
+    return 4098.0 * sat_vp(t) / (t + 237.3) ** 2                     # eq. 13
+
+def psychrometric(elev_m: float) -> float:
+    p = 101.3 * ((293.0 - 0.0065 * elev_m) / 293.0) ** 5.26           # eq. 7
+    return 0.665e-3 * p                                               # eq. 8
+
+def wind_2m(u: np.ndarray, height_m: float) -> np.ndarray:
+    if height_m == 2.0:
+        return u
+    return u * 4.87 / np.log(67.8 * height_m - 5.42)                  # eq. 47
+
+def _solar_geometry(doy: np.ndarray, lat_deg: float):
+    phi = np.deg2rad(lat_deg)
+    dr = 1.0 + 0.033 * np.cos(2 * np.pi * doy / 365.0)               # eq. 23
+    delta = 0.409 * np.sin(2 * np.pi * doy / 365.0 - 1.39)           # eq. 24
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0)) # eq. 25
+    return phi, dr, delta, ws
+
+# -- daily -------------------------------------------------------------------
+@timed("eto.fao56_daily")
+def fao56_daily(df: pd.DataFrame, site: Site) -> pd.Series:
+    # One row per day: t_max, t_min; humidity from rh_max/rh_min, rh, t_dew
+    # (else t_min); wind_ms at site.wind_height_m; rs_mj (MJ m-2 day-1),
+    # rs_wm2 (24 h mean) or sunshine_h (else Hargreaves radiation, eq. 50).
+    tmax, tmin = _col(df, "t_max"), _col(df, "t_min")
+    tmean = (tmax + tmin) / 2.0
+    es = (sat_vp(tmax) + sat_vp(tmin)) / 2.0                           # eq. 12
+    ea = np.where(~np.isnan(_col(df, "rh_max") + _col(df, "rh_min")),
+                  (sat_vp(tmin) * _col(df, "rh_max") + sat_vp(tmax) * _col(df, "rh_min")) / 200.0,  # eq. 17
+         np.where(~np.isnan(_col(df, "rh")), _col(df, "rh") / 100.0 * es,                           # eq. 19
+         np.where(~np.isnan(_col(df, "t_dew")), sat_vp(_col(df, "t_dew")), sat_vp(tmin))))          # eq. 14, 48
+
+    doy = df["timestamp"].dt.dayofyear.to_numpy(dtype=float)
+    phi, dr, delta, ws = _solar_geometry(doy, site.lat_deg)
+    ra = 24 * 60 / np.pi * GSC * dr * (ws * np.sin(phi) * np.sin(delta)
+                                       + np.cos(phi) * np.cos(delta) * np.sin(ws))  # eq. 21
+    n_max = 24.0 / np.pi * ws                                          # eq. 34
+    rs = np.where(~np.isnan(_col(df, "rs_mj")), _col(df, "rs_mj"),
+         np.where(~np.isnan(_col(df, "rs_wm2")), _col(df, "rs_wm2") * 0.0864,
+         np.where(~np.isnan(_col(df, "sunshine_h")), (0.25 + 0.5 * _col(df, "sunshine_h") / n_max) * ra,  # eq. 35
+                  0.16 * np.sqrt(np.maximum(tmax - tmin, 0.0)) * ra)))                                   # eq. 50
+    rso = (0.75 + 2e-5 * site.elev_m) * ra                              # eq. 37
+    rns = (1.0 - site.albedo) * rs                                      # eq. 38
+    ratio = np.clip(np.divide(rs, rso, out=np.ones_like(rs), where=rso > 0), 0.25, 1.0)
+    rnl = SIGMA_DAY * ((tmax + 273.16) ** 4 + (tmin + 273.16) ** 4) / 2.0 \
+          * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * ratio - 0.35)        # eq. 39
+    rn = rns - rnl
+
+    gamma = psychrometric(site.elev_m)
+    u2 = wind_2m(np.nan_to_num(_col(df, "wind_ms"), nan=2.0), site.wind_height_m)  # 2 m/s default, FAO-56 ch. 3
+    delta_vp = slope_vp(tmean)
+    eto = (0.408 * delta_vp * rn + gamma * 900.0 / (tmean + 273.0) * u2 * (es - ea)) \
+          / (delta_vp + gamma * (1.0 + 0.34 * u2))                      # eq. 6
+    return pd.Series(np.maximum(eto, 0.0), index=df["timestamp"].dt.normalize().to_numpy(), name="eto")
+
+# -- hourly ------------------------------------------------------------------
+@timed("eto.fao56_hourly")
+def fao56_hourly(df: pd.DataFrame, site: Site, period_start: bool = True) -> pd.Series:
+    # One row per hour: t_air, rh or t_dew, wind_ms, rs_mj (MJ m-2 h-1) or
+    # rs_wm2. Timestamps mark the start of the hour unless period_start=False.
+    if site.lon_deg is None or site.utc_offset_h is None:
+        raise ValueError("hourly ETo needs the site longitude and UTC offset")
+    ts = df["timestamp"]
+    t = _col(df, "t_air")
+    e0 = sat_vp(t)
+    ea = np.where(~np.isnan(_col(df, "rh")), _col(df, "rh") / 100.0 * e0, sat_vp(_col(df, "t_dew")))  # eq. 54
+    rs = np.where(~np.isnan(_col(df, "rs_mj")), _col(df, "rs_mj"), _col(df, "rs_wm2") * 0.0036)
+
+    doy = ts.dt.dayofyear.to_numpy(dtype=float)
+    phi, dr, delta, ws = _solar_geometry(doy, site.lat_deg)
+    b = 2 * np.pi * (doy - 81) / 364.0                                  # eq. 33
+    sc = 0.1645 * np.sin(2 * b) - 0.1255 * np.cos(b) - 0.025 * np.sin(b)  # eq. 32
+    hour = (ts.dt.hour + ts.dt.minute / 60.0).to_numpy(dtype=float) + (0.5 if period_start else -0.5)
+    # FAO-56 uses degrees west of Greenwich for Lz and Lm
+    lz = (-15.0 * site.utc_offset_h) % 360.0
+    lm = (-site.lon_deg) % 360.0
+    w = np.pi / 12.0 * ((hour + 0.06667 * (lz - lm) + sc) - 12.0)      # eq. 31
+    w1 = np.clip(w - np.pi / 24.0, -ws, ws)                             # eq. 29, 30
+    w2 = np.clip(w + np.pi / 24.0, -ws, ws)
+    ra = 12 * 60 / np.pi * GSC * dr * ((w2 - w1) * np.sin(phi) * np.sin(delta)
+                                       + np.cos(phi) * np.cos(delta) * (np.sin(w2) - np.sin(w1)))  # eq. 28
+    ra = np.maximum(ra, 0.0)
+    day = ra > 0
+    rso = (0.75 + 2e-5 * site.elev_m) * ra
+    # Rs/Rso at night: carried from the last daylight hour of the same day
+    ratio = pd.Series(np.where(day & (rso > 0), np.clip(rs / np.where(rso > 0, rso, 1.0), 0.25, 1.0), np.nan))
+    ratio = ratio.groupby(ts.dt.normalize().to_numpy()).ffill().fillna(0.8).to_numpy()
+    rns = (1.0 - site.albedo) * rs
+    rnl = SIGMA_HOUR * (t + 273.16) ** 4 * (0.34 - 0.14 * np.sqrt(ea)) * (1.35 * ratio - 0.35)
+    rn = rns - rnl
+    g = np.where(day, 0.1, 0.5) * rn                                    # eq. 45, 46
+
+    gamma = psychrometric(site.elev_m)
+    u2 = wind_2m(_col(df, "wind_ms"), site.wind_height_m)
+    eto = (0.408 * slope_vp(t) * (rn - g) + gamma * 37.0 / (t + 273.0) * u2 * (e0 - ea)) \
+          / (slope_vp(t) + gamma * (1.0 + 0.34 * u2))                   # eq. 53
+    return pd.Series(np.maximum(eto, 0.0), index=ts.to_numpy(), name="eto")
+
+# -- record interval ---------------------------------------------------------
+HOUR = pd.Timedelta(hours=1)
+DAY = pd.Timedelta(days=1)
+# an hour built from sub-hourly records needs at least this share of them
+MIN_HOUR_COVERAGE = 0.5
+# per-interval energy; every other column is a mean state or rate
+_SUMMED = ("rs_mj",)
+
+def record_interval(ts: pd.Series) -> Optional[pd.Timedelta]:
+    # Typical spacing of the station records (median gap), None for a single record
+    gaps = ts.drop_duplicates().sort_values().diff().dropna()
+    return pd.Timedelta(gaps.median()) if len(gaps) else None
+
+def to_hourly(df: pd.DataFrame, interval: pd.Timedelta) -> pd.DataFrame:
+    # Sub-hourly station_frame rows -> one row per hour (timestamps mark the
+    # start of each period). Means of states and rates; rs_mj per record is
+    # scaled to MJ per hour. Hours with too few records are left out.
+    per_hour = HOUR / interval
+    cols = [c for c in df.columns if c != "timestamp"]
+    grp = df.groupby(df["timestamp"].dt.floor("h"))
+    out = grp[cols].mean()
+    for c in _SUMMED:
+        if c in out:
+            out[c] = out[c] * per_hour
+    out = out[grp.size() >= MIN_HOUR_COVERAGE * per_hour]
+    return out.rename_axis("timestamp").reset_index()
+
+def daily_eto(records: pd.DataFrame, site: Site, min_hours: int = 24,
+              interval: Optional[pd.Timedelta] = None) -> pd.Series:
+    # Daily ETo (mm/day) indexed by date for daily, hourly or sub-hourly
+    # station records; the interval is taken from the timestamps unless given.
+    # Days with fewer than min_hours valid hours are left out.
+    df = station_frame(records)
+    if df.empty:
+        return pd.Series(dtype=float, name="eto")
+    interval = interval if interval is not None else record_interval(df["timestamp"])
+    if interval is None or interval >= DAY:
+        out = fao56_daily(df, site)
+    elif interval > HOUR:
+        raise ValueError(f"station records every {interval}: need daily, hourly or sub-hourly records")
+    else:
+        if interval < HOUR:
+            df = to_hourly(df, interval)
+        days = df["timestamp"].dt.normalize()
+        hourly = fao56_hourly(df, site)
+        ok = hourly.notna().to_numpy()
+        grp = pd.DataFrame({"eto": hourly.to_numpy(), "ok": ok}, index=days.to_numpy()).groupby(level=0)
+        out = grp["eto"].sum(min_count=1).where(grp["ok"].sum() >= min_hours)
+    out.index = pd.DatetimeIndex(out.index).date
+    return out.dropna().round(2).rename("eto")
+
+# ETo per date for the station sheet. Each update hashes the records per day and
+# recomputes only the days whose records changed or are new.
+class EToCache:
+    def __init__(self, site: Site, min_hours: int = 24):
+        self.site = site
+        self.min_hours = min_hours
+        self._digest: Dict[date, int] = {}
+        self._eto: Dict[date, float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, records: pd.DataFrame) -> "EToCache":
+        if records is None or records.empty:
+            return self
+        with self._lock:
+            df = station_frame(records)
+            days = df["timestamp"].dt.date
+            h = pd.util.hash_pandas_object(df, index=False).to_numpy()
+            digests = pd.Series(h, index=days.to_numpy()).groupby(level=0).agg(lambda x: int(np.bitwise_xor.reduce(x)))
+            stale = [d for d, dg in digests.items() if self._digest.get(d) != dg]
+            if stale:
+                # interval from all records: a stale day may hold only a few
+                fresh = daily_eto(df[days.isin(stale)], self.site, self.min_hours,
+                                  interval=record_interval(df["timestamp"]))
+                for d in stale:
+                    self._digest[d] = digests[d]
+                    self._eto.pop(d, None)
+                self._eto.update({d: float(v) for d, v in fresh.items()})
+        return self
+
+    def get(self, d: date) -> Optional[float]:
+        return self._eto.get(d)
+
+    def series(self) -> pd.Series:
+        return pd.Series(self._eto, dtype=float, name="eto").sort_index()
+
+    def __len__(self) -> int:
+        return len(self._eto)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import argparse
+import os
+from datetime import date
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from perf import span
+from replay import DAILY_INPUT_HEADERS
+
+# Bulk path for logger files: soil-moisture readings and NDVI captures at any
+# frequency, one row per (timestamp, plot). Files are read in chunks and folded
+# into running per-(day, plot) sums, so memory grows with days × plots, not
+# with file size. The daily means become rows of daily_inputs_ws.
+
+Source = Union[str, "os.PathLike[str]", BinaryIO]
+
+CHUNK_ROWS = 200_000
+
+# canonical column -> accepted (lower-case) names in logger files
+COLUMN_ALIASES: Dict[str, tuple] = {
+    "timestamp": ("timestamp", "datetime", "time", "date"),
+    "plot": ("plot", "plot_id"),
+    "theta_vwc": ("theta_vwc", "theta", "vwc", "soil_moisture"),
+    "ndvi": ("ndvi",),
+}
+VALID_RANGE = {"theta_vwc": (0.0, 0.6), "ndvi": (-1.0, 1.0)}
+ROUND = {"theta_vwc": 3, "ndvi": 2}
+WEATHER_COLUMNS = ["rain_obs", "rain_fcst_24h", "eto"]
+
+def _wanted(col: str) -> bool:
+    return str(col).strip().lower() in {a for aliases in COLUMN_ALIASES.values() for a in aliases}
+
+def _canonical(df: pd.DataFrame) -> pd.DataFrame:
+    lower = {str(c).strip().lower(): c for c in df.columns}
+    out = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        src = next((lower[a] for a in aliases if a in lower), None)
+        if src is not None:
+            out[name] = df[src]
+    missing = {"timestamp", "plot"} - set(out)
+    if missing:
+        raise ValueError(f"sensor file is missing column(s): {', '.join(sorted(missing))}")
+    return pd.DataFrame(out)
+
+def _is_parquet(src: Source) -> bool:
+    name = str(getattr(src, "name", src)).lower()
+    return name.endswith((".parquet", ".pq"))
+
+def iter_chunks(src: Source, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # Only the recognised columns are read.
+    if _is_parquet(src):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(src)
+        cols = [c for c in pf.schema_arrow.names if _wanted(c)]
+        for batch in pf.iter_batches(batch_size=chunk_rows, columns=cols):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(src, chunksize=chunk_rows, usecols=_wanted)
+
+class DailyAggregator:
+    # Running sum and count per (date, plot) and variable; result() gives means.
+    def __init__(self, tz: Optional[str] = None, plots: Optional[Iterable[str]] = None):
+        self.tz = tz
+        self.plots = None if plots is None else set(plots)
+        self.readings = 0
+        self.rejected = 0
+        self.unknown_plots: set = set()
+        self._acc: Optional[pd.DataFrame] = None
+
+    def add(self, chunk: pd.DataFrame):
+        df = _canonical(chunk)
+        ts = pd.to_datetime(df["timestamp"], errors="coerce")
+        if ts.dt.tz is not None:
+            # aware timestamps: the day boundary is local (tz) time, or UTC without tz
+            ts = ts.dt.tz_convert(self.tz or "UTC").dt.tz_localize(None)
+        df = df.assign(date=ts.dt.normalize(), plot=df["plot"].astype(str).str.strip())
+        ok = df["date"].notna() & df["plot"].ne("")
+        if self.plots is not None:
+            known = df["plot"].isin(self.plots)
+            self.unknown_plots.update(df.loc[ok & ~known, "plot"].unique())
+            ok &= known
+        parts = {}
+        for var, (lo, hi) in VALID_RANGE.items():
+            if var not in df:
+                continue
+            v = pd.to_numeric(df[var], errors="coerce")
+            good = ok & v.between(lo, hi)
+            self.readings += int(good.sum())
+            self.rejected += int((ok & v.notna() & ~good).sum())
+            v = v.where(good)
+            parts[f"{var}_sum"] = v.fillna(0.0)
+            parts[f"{var}_n"] = v.notna().astype(np.int64)
+        if not parts:
+            return
+        part = pd.DataFrame(parts).assign(date=df["date"], plot=df["plot"])[ok] \
+                 .groupby(["date", "plot"], sort=False).sum()
+        self._acc = part if self._acc is None else self._acc.add(part, fill_value=0)
+
+    def result(self) -> pd.DataFrame:
+        cols = ["date", "plot"] + list(VALID_RANGE) + [f"n_{v}" for v in VALID_RANGE]
+        if self._acc is None or self._acc.empty:
+            return pd.DataFrame(columns=cols)
+        acc = self._acc
+        out = pd.DataFrame(index=acc.index)
+        for var in VALID_RANGE:
+            n = acc[f"{var}_n"] if f"{var}_n" in acc else pd.Series(0, index=acc.index)
+            s = acc[f"{var}_sum"] if f"{var}_sum" in acc else pd.Series(0.0, index=acc.index)
+            out[var] = (s / n.where(n > 0)).round(ROUND[var])
+            out[f"n_{var}"] = n.astype(np.int64)
+        out = out[(out[[f"n_{v}" for v in VALID_RANGE]] > 0).any(axis=1)]
+        return out.reset_index().sort_values(["date", "plot"], kind="stable").reset_index(drop=True)[cols]
+
+def aggregate_files(sources: Iterable[Source], tz: Optional[str] = None, plots: Optional[Iterable[str]] = None,
+                    chunk_rows: int = CHUNK_ROWS) -> DailyAggregator:
+    agg = DailyAggregator(tz, plots)
+    for src in sources:
+        with span("ingest.read_file", file=str(getattr(src, "name", src))):
+            for chunk in iter_chunks(src, chunk_rows):
+                agg.add(chunk)
+    return agg
+
+def daily_rows(daily: pd.DataFrame, weather: Optional[pd.DataFrame] = None,
+               note: str = "sensor ingest") -> List[List[Any]]:
+    # weather (optional): date + any of rain_obs, rain_fcst_24h, eto per day
+    df = daily.copy()
+    for col in WEATHER_COLUMNS:
+        df[col] = np.nan
+    if weather is not None and not weather.empty:
+        w = weather.assign(date=pd.to_datetime(weather["date"]).dt.normalize()).drop_duplicates("date", keep="last")
+        df = df.drop(columns=[c for c in WEATHER_COLUMNS if c in w]).merge(
+            w[["date"] + [c for c in WEATHER_COLUMNS if c in w]], on="date", how="left")
+        for col in WEATHER_COLUMNS:
+            if col not in df:
+                df[col] = np.nan
+    df["notes"] = note
+    df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    df = df[DAILY_INPUT_HEADERS].astype(object)
+    return df.where(df.notna(), "").values.tolist()
+
+def existing_keys(ws_name: str, start: date, end: date) -> set:
+    from data_io import read_sheet
+    df = read_sheet(ws_name, start=start, end=end)
+    if df.empty:
+        return set()
+    return set(zip(pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"), df["plot"].astype(str)))
+
+def ingest(sources: Iterable[Source], ws_name: str, tz: Optional[str] = None,
+           plots: Optional[Iterable[str]] = None, weather: Optional[pd.DataFrame] = None,
+           include_today: bool = False, dry_run: bool = False,
+           chunk_rows: int = CHUNK_ROWS) -> Dict[str, Any]:
+    # Idempotent: a (date, plot) already in ws_name is never written again, and
+    # today is left out unless include_today (the logger day is not over yet).
+    agg = aggregate_files(sources, tz, plots, chunk_rows)
+    daily = agg.result()
+    if not include_today and not daily.empty:
+        daily = daily[daily["date"] < pd.Timestamp(date.today())]
+    rows = daily_rows(daily, weather)
+    skipped = 0
+    pending = False
+    if rows:
+        seen = existing_keys(ws_name, daily["date"].min().date(), daily["date"].max().date())
+        new = [r for r in rows if (r[0], r[1]) not in seen]
+        skipped = len(rows) - len(new)
+        rows = new
+    if rows and not dry_run:
+        from data_io import append_rows
+        pending = not append_rows(ws_name, rows, wait=True)
+    # pending: the write timed out and the rows are still in the local spool
+    return dict(readings=agg.readings, rejected=agg.rejected, unknown_plots=sorted(agg.unknown_plots),
+                plot_days=len(daily), skipped_existing=skipped, written=0 if dry_run else len(rows),
+                pending=pending, rows=rows)
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Aggregate logger CSV/Parquet files into daily inputs.")
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("--ws", required=True, help="daily inputs worksheet")
+    ap.add_argument("--tz", default=None, help="local time zone for day boundaries, e.g. Asia/Tokyo")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--include-today", action="store_true")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+    res = ingest(args.files, args.ws, tz=args.tz, include_today=args.include_today,
+                 dry_run=args.dry_run, chunk_rows=args.chunk_rows)
+    res.pop("rows")
+    print(res)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from datetime import date
-from typing import Optional, Tuple, Dict
+from functools import lru_cache
+from typing import Callable, Iterator, NamedTuple, Optional, Tuple, Dict
+import numpy as np
+import pandas as pd
+from perf import timed
 
-@dataclass
+# Config and its parts are frozen and hashable: changes go through
+# dataclasses.replace (config_store.apply_settings), and a Config can key caches.
+@dataclass(frozen=True, slots=True)
 class StageParams:
     kc_ini: float = 0.60
     kc_mid: float = 1.05
@@ -15,13 +23,13 @@ class StageParams:
     p_mid: float = 0.45
     p_late: float = 0.55
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SoilParams:
     theta_fc: float = 0.30
     theta_wp: float = 0.12
     alpha: float = 0.60
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NDVI2Kc:
     a: float = 1.25
     b: float = 0.20
@@ -29,15 +37,15 @@ class NDVI2Kc:
     kc_max: float = 1.10
     active_gate: float = 0.80
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
     transplant_date: date
     efficiency: float = 0.85
     area_m2: float = 1.0
     rain_skip_mm: float = 2.0
-    stage: StageParams = StageParams()
-    soil: SoilParams = SoilParams()
-    ndvi2kc: NDVI2Kc = NDVI2Kc()
+    stage: StageParams = field(default_factory=StageParams)
+    soil: SoilParams = field(default_factory=SoilParams)
+    ndvi2kc: NDVI2Kc = field(default_factory=NDVI2Kc)
     strict_t4_and: bool = True
 
 PLOTS = ["T1","T2","T3","T4"]
@@ -81,83 +89,286 @@ def theta_trigger(theta_fc: float, theta_wp: float, alpha: float) -> float:
 def peff(rain_obs_mm: float) -> float:
     return max(0.0, 0.8 * float(rain_obs_mm))
 
+# Stage table: Kc, Zr, p, TAW, RAW and θ_trigger for one days-after-transplant
+# value. Built once per (stage params, soil params, dat) and shared by every
+# scalar decision that uses the same Config.
+class StageRow(NamedTuple):
+    stage: str
+    kc: float
+    zr_m: float
+    p: float
+    TAW: float
+    RAW: float            # p·TAW; T2 and T4 scale it by raw_factor
+    raw_factor: float
+    theta_trigger: float
+
+@lru_cache(maxsize=8192)
+def _stage_row(dat: int, stage: StageParams, soil: SoilParams) -> StageRow:
+    stg = stage_of_day(dat)
+    kc, zr_m, p = getattr(stage, f"kc_{stg}"), getattr(stage, f"zr_{stg}_m"), getattr(stage, f"p_{stg}")
+    TAW, RAW = taw_raw(soil.theta_fc, soil.theta_wp, zr_m, p)
+    return StageRow(stg, kc, zr_m, p, TAW, RAW, 0.8 if dat <= 20 else (1.2 if dat > 45 else 1.0),
+                    theta_trigger(soil.theta_fc, soil.theta_wp, soil.alpha))
+
+def stage_row(dat: int, cfg: Config) -> StageRow:
+    return _stage_row(dat, cfg.stage, cfg.soil)
+
+GATES = ("WB", "Soil", "NDVI", "Fcst")
+DECISION_VALUES = ("dat","ETo","rain_obs","rain_fcst","ndvi","theta_vwc","kc","ETc","zr_m","p","TAW","RAW",
+                   "Dr_start","Dr_end","theta_trigger","irr_net_mm","irr_gross_mm","irr_liters")
+DECISION_TEXT = ("plot","date","decision","reason","stage")
+_VALUE_INDEX = {k: i for i, k in enumerate(DECISION_VALUES)}
+# value keys each treatment's decision carries, as in the dicts decide_T2/T3/T4
+# used to return: T2 has no ndvi, T3 no soil-moisture terms, only T4 has gates
+DECISION_KEYS: Dict[str, Tuple[str, ...]] = {
+    "T2": tuple(k for k in DECISION_VALUES if k != "ndvi"),
+    "T3": tuple(k for k in DECISION_VALUES if k not in ("theta_vwc", "theta_trigger")),
+    "T4": DECISION_VALUES + ("gates",),
+}
+_KEY_SETS = {t: frozenset(keys) for t, keys in DECISION_KEYS.items()}
+
+# One scalar decision. Text fields are slots, the numbers one float64 array
+# (NaN for a missing input). Reads like the dict the decide functions used to
+# return: out["Dr_end"], out.get("ndvi"), dict(out); a key the treatment does
+# not produce (DECISION_KEYS) raises KeyError and is not `in` the decision.
+class Decision(Mapping):
+    __slots__ = ("plot", "date", "decision", "reason", "stage", "values", "gates")
+
+    def __init__(self, plot: str, day: str, decision: str, reason: str, stage: str,
+                 values: array, gates: Optional[Tuple[bool, ...]] = None):
+        self.plot, self.date, self.decision, self.reason, self.stage = plot, day, decision, reason, stage
+        self.values = values
+        self.gates = gates
+
+    def __getitem__(self, key: str):
+        if key in DECISION_TEXT:
+            return getattr(self, key)
+        if key not in _KEY_SETS[self.plot]:
+            raise KeyError(key)
+        if key == "gates":
+            return dict(zip(GATES, self.gates))
+        v = self.values[_VALUE_INDEX[key]]
+        return None if v != v else (int(v) if key == "dat" else v)
+
+    def __contains__(self, key: object) -> bool:
+        return key in DECISION_TEXT or key in _KEY_SETS[self.plot]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from DECISION_TEXT
+        yield from DECISION_KEYS[self.plot]
+
+    def __len__(self) -> int:
+        return len(DECISION_TEXT) + len(DECISION_KEYS[self.plot])
+
+    def __repr__(self) -> str:
+        return f"Decision({self.plot} {self.date} {self.decision}: {self.reason})"
+
+def _opt(v: Optional[float]) -> float:
+    return np.nan if v is None else v
+
+def _decision(plot: str, d: date, irrigate: bool, reason: str, dat: int, row: StageRow, ETo: float,
+              rain_obs: float, rain_fcst: float, ndvi: Optional[float], theta_vwc: Optional[float], kc: float,
+              ETc: float, RAW: float, Dr_start: float, Dr_end: float, thr: Optional[float], irr_net: float,
+              irr_gross: float, liters: float, gates: Optional[Tuple[bool, ...]] = None) -> Decision:
+    return Decision(plot, d.isoformat(), "Irrigate" if irrigate else "Skip", reason, row.stage,
+                    array("d", (dat, ETo, rain_obs, rain_fcst, _opt(ndvi), _opt(theta_vwc), kc, ETc, row.zr_m,
+                                row.p, row.TAW, RAW, Dr_start, Dr_end, _opt(thr), irr_net, irr_gross, liters)),
+                    gates)
+
 def decide_T2(d: date, ETo: float, rain_obs: float, rain_fcst_24h: float,
-              theta_vwc: Optional[float], Dr_start: float, cfg: Config) -> Dict:
+              theta_vwc: Optional[float], Dr_start: float, cfg: Config) -> Decision:
     dat = days_after_transplant(d, cfg.transplant_date)
-    kc_stg, zr_m, p = stage_params_for(dat, cfg)
-    ETc = ETo * kc_stg
-    TAW, RAW = taw_raw(cfg.soil.theta_fc, cfg.soil.theta_wp, zr_m, p)
-    RAW_stage = RAW * (0.8 if dat <= 20 else (1.2 if dat > 45 else 1.0))
+    row = stage_row(dat, cfg)
+    ETc = ETo * row.kc
+    RAW_stage = row.RAW * row.raw_factor
     Dr_end = max(0.0, Dr_start + ETc - peff(rain_obs))
 
     trig_wb = Dr_start > RAW_stage
-    trig_soil = (theta_vwc is not None) and (theta_vwc < theta_trigger(cfg.soil.theta_fc, cfg.soil.theta_wp, cfg.soil.alpha))
+    trig_soil = (theta_vwc is not None) and (theta_vwc < row.theta_trigger)
     skip_fcst = rain_fcst_24h >= cfg.rain_skip_mm
 
     irrigate = (trig_wb or trig_soil) and (not skip_fcst)
 
     irr_net = Dr_start if irrigate else 0.0
     irr_gross = irr_net / cfg.efficiency if irrigate else 0.0
-    liters = irr_gross * cfg.area_m2
 
-    return dict(plot="T2", date=d.isoformat(), decision="Irrigate" if irrigate else "Skip",
-                reason=("WB" if trig_wb else "") + (" & Soil" if trig_soil and irrigate else ("")),
-                dat=dat, stage=stage_of_day(dat), ETo=ETo, rain_obs=rain_obs, rain_fcst=rain_fcst_24h,
-                kc=kc_stg, ETc=ETc, zr_m=zr_m, p=p, TAW=TAW, RAW=RAW_stage, Dr_start=Dr_start, Dr_end=Dr_end if not irrigate else 0.0,
-                theta_vwc=theta_vwc, theta_trigger=theta_trigger(cfg.soil.theta_fc, cfg.soil.theta_wp, cfg.soil.alpha),
-                irr_net_mm=irr_net, irr_gross_mm=irr_gross, irr_liters=liters)
+    return _decision("T2", d, irrigate, ("WB" if trig_wb else "") + (" & Soil" if trig_soil and irrigate else ""),
+                     dat, row, ETo, rain_obs, rain_fcst_24h, None, theta_vwc, row.kc, ETc, RAW_stage,
+                     Dr_start, Dr_end if not irrigate else 0.0, row.theta_trigger,
+                     irr_net, irr_gross, irr_gross * cfg.area_m2)
 
 def decide_T3(d: date, ETo: float, rain_obs: float, rain_fcst_24h: float,
-              ndvi: Optional[float], Dr_start: float, cfg: Config) -> Dict:
+              ndvi: Optional[float], Dr_start: float, cfg: Config) -> Decision:
     dat = days_after_transplant(d, cfg.transplant_date)
-    kc_stg, zr_m, p = stage_params_for(dat, cfg)
-    kc_ndvi = kc_from_ndvi(ndvi, cfg, kc_stg)
+    row = stage_row(dat, cfg)
+    kc_ndvi = kc_from_ndvi(ndvi, cfg, row.kc)
     ETc = ETo * kc_ndvi
-    TAW, RAW = taw_raw(cfg.soil.theta_fc, cfg.soil.theta_wp, zr_m, p)
     Dr_end = max(0.0, Dr_start + ETc - peff(rain_obs))
 
     trig_active = kc_ndvi >= cfg.ndvi2kc.active_gate
-    trig_wb = Dr_start > RAW
+    trig_wb = Dr_start > row.RAW
     skip_fcst = rain_fcst_24h >= cfg.rain_skip_mm
 
     irrigate = (trig_wb and trig_active) and (not skip_fcst)
 
     irr_net = Dr_start if irrigate else 0.0
     irr_gross = irr_net / cfg.efficiency if irrigate else 0.0
-    liters = irr_gross * cfg.area_m2
 
-    return dict(plot="T3", date=d.isoformat(), decision="Irrigate" if irrigate else "Skip",
-                reason=("WB&ActiveNDVI" if irrigate else ("Forecast≥2mm" if skip_fcst else ("WB≤RAW/NDVI gate"))),
-                dat=dat, stage=stage_of_day(dat), ETo=ETo, rain_obs=rain_obs, rain_fcst=rain_fcst_24h,
-                ndvi=ndvi, kc=kc_ndvi, ETc=ETc, zr_m=zr_m, p=p, TAW=TAW, RAW=RAW, Dr_start=Dr_start, Dr_end=Dr_end if not irrigate else 0.0,
-                irr_net_mm=irr_net, irr_gross_mm=irr_gross, irr_liters=liters)
+    return _decision("T3", d, irrigate,
+                     "WB&ActiveNDVI" if irrigate else ("Forecast≥2mm" if skip_fcst else "WB≤RAW/NDVI gate"),
+                     dat, row, ETo, rain_obs, rain_fcst_24h, ndvi, None, kc_ndvi, ETc, row.RAW,
+                     Dr_start, Dr_end if not irrigate else 0.0, None, irr_net, irr_gross, irr_gross * cfg.area_m2)
 
 def decide_T4_strict(d: date, ETo: float, rain_obs: float, rain_fcst_24h: float,
-                     ndvi: Optional[float], theta_vwc: Optional[float], Dr_start: float, cfg: Config) -> Dict:
+                     ndvi: Optional[float], theta_vwc: Optional[float], Dr_start: float, cfg: Config) -> Decision:
     dat = days_after_transplant(d, cfg.transplant_date)
-    kc_stg, zr_m, p = stage_params_for(dat, cfg)
-    kc_ndvi = kc_from_ndvi(ndvi, cfg, kc_stg)
+    row = stage_row(dat, cfg)
+    kc_ndvi = kc_from_ndvi(ndvi, cfg, row.kc)
     ETc = ETo * kc_ndvi
-    TAW, RAW = taw_raw(cfg.soil.theta_fc, cfg.soil.theta_wp, zr_m, p)
-    RAW_stage = RAW * (0.8 if dat <= 20 else (1.2 if dat > 45 else 1.0))
+    RAW_stage = row.RAW * row.raw_factor
     Dr_end = max(0.0, Dr_start + ETc - peff(rain_obs))
 
-    trig_wb   = Dr_start > RAW_stage
-    trig_soil = (theta_vwc is not None) and (theta_vwc < theta_trigger(cfg.soil.theta_fc, cfg.soil.theta_wp, cfg.soil.alpha))
-    trig_ndvi = kc_ndvi >= cfg.ndvi2kc.active_gate
-    trig_fcst = rain_fcst_24h < cfg.rain_skip_mm
+    trig_wb   = bool(Dr_start > RAW_stage)
+    trig_soil = (theta_vwc is not None) and bool(theta_vwc < row.theta_trigger)
+    trig_ndvi = bool(kc_ndvi >= cfg.ndvi2kc.active_gate)
+    trig_fcst = bool(rain_fcst_24h < cfg.rain_skip_mm)
 
-    irrigate = bool(trig_wb and trig_soil and trig_ndvi and trig_fcst)
+    irrigate = trig_wb and trig_soil and trig_ndvi and trig_fcst
 
     irr_net = Dr_start if irrigate else 0.0
     irr_gross = irr_net / cfg.efficiency if irrigate else 0.0
-    liters = irr_gross * cfg.area_m2
-
-    return dict(plot="T4", date=d.isoformat(), decision="Irrigate" if irrigate else "Skip",
-                reason=f"AND: WB={trig_wb}, Soil={trig_soil}, NDVI={trig_ndvi}, Fcst={trig_fcst}",
-                dat=dat, stage=stage_of_day(dat), ETo=ETo, rain_obs=rain_obs, rain_fcst=rain_fcst_24h,
-                ndvi=ndvi, theta_vwc=theta_vwc, kc=kc_ndvi, ETc=ETc, zr_m=zr_m, p=p, TAW=TAW, RAW=RAW_stage,
-                Dr_start=Dr_start, Dr_end=Dr_end if not irrigate else 0.0,
-                theta_trigger=theta_trigger(cfg.soil.theta_fc, cfg.soil.theta_wp, cfg.soil.alpha),
-                irr_net_mm=irr_net, irr_gross_mm=irr_gross, irr_liters=liters,
-                gates=dict(WB=trig_wb, Soil=trig_soil, NDVI=trig_ndvi, Fcst=trig_fcst))
+
+    return _decision("T4", d, irrigate, f"AND: WB={trig_wb}, Soil={trig_soil}, NDVI={trig_ndvi}, Fcst={trig_fcst}",
+                     dat, row, ETo, rain_obs, rain_fcst_24h, ndvi, theta_vwc, kc_ndvi, ETc, RAW_stage,
+                     Dr_start, Dr_end if not irrigate else 0.0, row.theta_trigger,
+                     irr_net, irr_gross, irr_gross * cfg.area_m2, (trig_wb, trig_soil, trig_ndvi, trig_fcst))
+
+# Treatment -> decision function, all called as
+# fn(d, ETo, rain_obs, rain_fcst_24h, theta_vwc, ndvi, Dr_start, cfg).
+# A treatment with no entry (T1) is irrigated by the farmer.
+Decider = Callable[[date, float, float, float, Optional[float], Optional[float], float, Config], Decision]
+
+DECIDERS: Dict[str, Decider] = {
+    "T2": lambda d, ETo, ro, rf, theta, ndvi, Dr, cfg: decide_T2(d, ETo, ro, rf, theta, Dr, cfg),
+    "T3": lambda d, ETo, ro, rf, theta, ndvi, Dr, cfg: decide_T3(d, ETo, ro, rf, ndvi, Dr, cfg),
+    "T4": lambda d, ETo, ro, rf, theta, ndvi, Dr, cfg: decide_T4_strict(d, ETo, ro, rf, ndvi, theta, Dr, cfg),
+}
+
+def decide(treatment: str, d: date, ETo: float, rain_obs: float, rain_fcst_24h: float,
+           theta_vwc: Optional[float], ndvi: Optional[float], Dr_start: float, cfg: Config) -> Optional[Decision]:
+    fn = DECIDERS.get(treatment)
+    return None if fn is None else fn(d, ETo, rain_obs, rain_fcst_24h, theta_vwc, ndvi, Dr_start, cfg)
+
+# ---------------------------------------------------------------------------
+# Batch engine: same rules as decide_T2 / decide_T3 / decide_T4_strict, one
+# vectorized pass over many (plot, day) rows. Each row carries its own Dr_start.
+# ---------------------------------------------------------------------------
+
+BATCH_INPUT_COLUMNS = ["date","ETo","rain_obs","rain_fcst","theta","ndvi","Dr_start","treatment"]
+BATCH_OUTPUT_COLUMNS = [
+    "plot","date","decision","reason","dat","stage","ETo","rain_obs","rain_fcst",
+    "ndvi","theta_vwc","kc","ETc","zr_m","p","TAW","RAW","Dr_start","Dr_end","theta_trigger",
+    "irr_net_mm","irr_gross_mm","irr_liters","gate_WB","gate_Soil","gate_NDVI","gate_Fcst",
+]
+
+def stage_arrays(dat: np.ndarray, cfg: Config) -> Dict[str, np.ndarray]:
+    dat = np.asarray(dat)
+    ini = dat <= 20
+    mid = (dat > 20) & (dat <= 45)
+    s = cfg.stage
+    return dict(
+        stage=np.where(ini, "ini", np.where(mid, "mid", "late")),
+        kc=np.where(ini, s.kc_ini, np.where(mid, s.kc_mid, s.kc_late)),
+        zr_m=np.where(ini, s.zr_ini_m, np.where(mid, s.zr_mid_m, s.zr_late_m)),
+        p=np.where(ini, s.p_ini, np.where(mid, s.p_mid, s.p_late)),
+        raw_factor=np.where(ini, 0.8, np.where(dat > 45, 1.2, 1.0)),
+    )
+
+def _float_col(df: pd.DataFrame, name: str) -> np.ndarray:
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+
+def decide_arrays(stg: Dict[str, np.ndarray], ETo: np.ndarray, rain_obs: np.ndarray, rain_fcst: np.ndarray,
+                  theta: np.ndarray, ndvi: np.ndarray, Dr_start: np.ndarray,
+                  is_t2: np.ndarray, is_t3: np.ndarray, is_t4: np.ndarray, cfg: Config) -> Dict[str, np.ndarray]:
+    n2k = cfg.ndvi2kc
+    kc_ndvi = np.where(np.isnan(ndvi), stg["kc"],
+                       np.maximum(n2k.kc_min, np.minimum(n2k.kc_max, n2k.a * ndvi + n2k.b)))
+    kc = np.where(is_t2, stg["kc"], kc_ndvi)
+    ETc = ETo * kc
+    TAW, RAW = taw_raw(cfg.soil.theta_fc, cfg.soil.theta_wp, stg["zr_m"], stg["p"])
+    RAW = np.where(is_t3, RAW, RAW * stg["raw_factor"])
+    Dr_end = np.maximum(0.0, Dr_start + ETc - np.maximum(0.0, 0.8 * rain_obs))
+    thr = theta_trigger(cfg.soil.theta_fc, cfg.soil.theta_wp, cfg.soil.alpha)
+
+    trig_wb = Dr_start > RAW
+    trig_soil = theta < thr
+    trig_ndvi = kc >= n2k.active_gate
+    skip_fcst = rain_fcst >= cfg.rain_skip_mm
+    trig_fcst = rain_fcst < cfg.rain_skip_mm
+
+    irrigate = np.select(
+        [is_t2, is_t3, is_t4],
+        [(trig_wb | trig_soil) & ~skip_fcst,
+         trig_wb & trig_ndvi & ~skip_fcst,
+         trig_wb & trig_soil & trig_ndvi & trig_fcst],
+        default=False,
+    )
+    irr_net = np.where(irrigate, Dr_start, 0.0)
+    irr_gross = np.where(irrigate, irr_net / cfg.efficiency, 0.0)
+    return dict(kc=kc, ETc=ETc, TAW=TAW, RAW=RAW, Dr_end=np.where(irrigate, 0.0, Dr_end), theta_trigger=thr,
+                trig_wb=trig_wb, trig_soil=trig_soil, trig_ndvi=trig_ndvi, skip_fcst=skip_fcst, trig_fcst=trig_fcst,
+                irrigate=irrigate, irr_net=irr_net, irr_gross=irr_gross, irr_liters=irr_gross * cfg.area_m2)
+
+@timed("logic.decide_batch")
+def decide_batch(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    dates = pd.to_datetime(df["date"])
+    dat = (dates - pd.Timestamp(cfg.transplant_date)).dt.days.to_numpy()
+    ETo = _float_col(df, "ETo")
+    rain_obs = _float_col(df, "rain_obs")
+    rain_fcst = _float_col(df, "rain_fcst")
+    theta = _float_col(df, "theta")
+    ndvi = _float_col(df, "ndvi")
+    Dr_start = _float_col(df, "Dr_start")
+    treatment = df["treatment"].astype(str).to_numpy()
+    is_t2, is_t3, is_t4 = treatment == "T2", treatment == "T3", treatment == "T4"
+    auto = is_t2 | is_t3 | is_t4
+
+    stg = stage_arrays(dat, cfg)
+    res = decide_arrays(stg, ETo, rain_obs, rain_fcst, theta, ndvi, Dr_start, is_t2, is_t3, is_t4, cfg)
+    irrigate, trig_wb, trig_soil = res["irrigate"], res["trig_wb"], res["trig_soil"]
+    trig_ndvi, skip_fcst, trig_fcst = res["trig_ndvi"], res["skip_fcst"], res["trig_fcst"]
+    thr = res["theta_trigger"]
+
+    tf = lambda a: np.where(a, "True", "False")
+    reason = np.select(
+        [is_t2, is_t3, is_t4],
+        [np.char.add(np.where(trig_wb, "WB", ""), np.where(trig_soil & irrigate, " & Soil", "")),
+         np.where(irrigate, "WB&ActiveNDVI", np.where(skip_fcst, "Forecast≥2mm", "WB≤RAW/NDVI gate")),
+         np.char.add(np.char.add(np.char.add("AND: WB=", tf(trig_wb)), np.char.add(", Soil=", tf(trig_soil))),
+                     np.char.add(np.char.add(", NDVI=", tf(trig_ndvi)), np.char.add(", Fcst=", tf(trig_fcst))))],
+        default="Farmer",
+    )
+
+    def auto_only(values, mask=auto):
+        return np.where(mask, values, np.nan)
+
+    out = pd.DataFrame({
+        "plot": treatment,
+        "date": dates.dt.strftime("%Y-%m-%d").to_numpy(),
+        "decision": np.where(auto, np.where(irrigate, "Irrigate", "Skip"), "Manual"),
+        "reason": reason.astype(object),
+        "dat": dat,
+        "stage": stg["stage"].astype(object),
+        "ETo": ETo, "rain_obs": rain_obs, "rain_fcst": rain_fcst,
+        "ndvi": auto_only(ndvi, is_t3 | is_t4),
+        "theta_vwc": auto_only(theta, is_t2 | is_t4),
+        "kc": auto_only(res["kc"]), "ETc": auto_only(res["ETc"]), "zr_m": auto_only(stg["zr_m"]),
+        "p": auto_only(stg["p"]), "TAW": auto_only(res["TAW"]), "RAW": auto_only(res["RAW"]),
+        "Dr_start": Dr_start,
+        "Dr_end": auto_only(res["Dr_end"]),
+        "theta_trigger": auto_only(np.full(len(dat), thr), is_t2 | is_t4),
+        "irr_net_mm": auto_only(res["irr_net"]), "irr_gross_mm": auto_only(res["irr_gross"]),
+        "irr_liters": auto_only(res["irr_liters"]),
+        "gate_WB": trig_wb, "gate_Soil": trig_soil, "gate_NDVI": trig_ndvi, "gate_Fcst": trig_fcst,
+    }, index=df.index)
+    return out[BATCH_OUTPUT_COLUMNS]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Lightweight timing spans and counters. A trace groups everything recorded
+# while it is current (one Streamlit rerun); spans recorded outside any trace
+# (write-behind thread, report workers) go to a rolling "background" trace.
+# Set IRRIGATION_PERF_LOG=path to append every finished trace as JSON lines;
+# the "irrigation.perf" logger gets one structured summary line per trace.
+
+MAX_TRACES = 200
+MAX_SPANS = 5000
+PERF_LOG = os.environ.get("IRRIGATION_PERF_LOG")
+
+log = logging.getLogger("irrigation.perf")
+
+# (name, offset from trace start in s, duration in s, tags)
+Span = Tuple[str, float, float, Dict[str, Any]]
+
+@dataclass
+class Trace:
+    id: int
+    label: str
+    started: float                   # wall clock
+    t0: float                        # perf_counter at start
+    spans: Deque[Span] = field(default_factory=lambda: deque(maxlen=MAX_SPANS))
+    counters: Dict[str, float] = field(default_factory=dict)
+    duration_s: Optional[float] = None
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [dict(trace=self.id, label=self.label, span=name, start_ms=round(off * 1e3, 3),
+                     duration_ms=round(dur * 1e3, 3), **tags) for name, off, dur, tags in list(self.spans)]
+
+_lock = threading.Lock()
+_traces: Deque[Trace] = deque(maxlen=MAX_TRACES)
+_next_id = [1]
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("perf_trace", default=None)
+
+def _new_trace(label: str) -> Trace:
+    with _lock:
+        tid = _next_id[0]
+        _next_id[0] += 1
+    return Trace(tid, label, time.time(), time.perf_counter())
+
+_background = _new_trace("background")
+
+def begin_trace(label: str = "rerun") -> Trace:
+    trace = _new_trace(label)
+    _current.set(trace)
+    return trace
+
+def end_trace(trace: Trace):
+    trace.duration_s = time.perf_counter() - trace.t0
+    if _current.get() is trace:
+        _current.set(None)
+    with _lock:
+        _traces.append(trace)
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps(dict(trace=trace.id, label=trace.label, duration_ms=round(trace.duration_s * 1e3, 3),
+                                 spans=len(trace.spans), counters=trace.counters)))
+    if PERF_LOG:
+        try:
+            with open(PERF_LOG, "a", encoding="utf-8") as f:
+                f.write(export_jsonl([trace]))
+        except OSError as e:
+            log.warning("could not write %s: %s", PERF_LOG, e)
+
+def current_trace() -> Trace:
+    return _current.get() or _background
+
+def record(name: str, t0: float, duration_s: float, **tags):
+    trace = current_trace()
+    trace.spans.append((name, t0 - trace.t0, duration_s, tags))
+
+def count(name: str, n: float = 1):
+    c = current_trace().counters
+    c[name] = c.get(name, 0) + n
+
+@contextmanager
+def span(name: str, **tags):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, t0, time.perf_counter() - t0, **tags)
+
+def timed(name: str) -> Callable:
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, t0, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+def bind(fn: Callable) -> Callable:
+    # Run fn (e.g. on a worker thread) with the caller's current trace.
+    return functools.partial(contextvars.copy_context().run, fn)
+
+# -- reading back ------------------------------------------------------------
+def traces(label: Optional[str] = None, include_background: bool = False) -> List[Trace]:
+    with _lock:
+        out = list(_traces)
+    if include_background:
+        out.append(_background)
+    return [t for t in out if label is None or t.label == label]
+
+def summarize(trs: Iterable[Trace]) -> pd.DataFrame:
+    # p50/p95 per span name across the given traces.
+    durations: Dict[str, List[float]] = {}
+    for t in trs:
+        for name, _, dur, _ in list(t.spans):
+            durations.setdefault(name, []).append(dur)
+    rows = []
+    for name, ds in durations.items():
+        a = np.asarray(ds) * 1e3
+        rows.append(dict(span=name, count=len(a), total_ms=a.sum(), p50_ms=np.percentile(a, 50),
+                         p95_ms=np.percentile(a, 95), max_ms=a.max()))
+    cols = ["span", "count", "total_ms", "p50_ms", "p95_ms", "max_ms"]
+    return pd.DataFrame(rows, columns=cols).sort_values("total_ms", ascending=False).reset_index(drop=True)
+
+def trace_durations(trs: Iterable[Trace]) -> Dict[str, float]:
+    ds = np.asarray([t.duration_s for t in trs if t.duration_s is not None]) * 1e3
+    if not len(ds):
+        return {}
+    return dict(n=len(ds), p50_ms=float(np.percentile(ds, 50)), p95_ms=float(np.percentile(ds, 95)))
+
+def export_jsonl(trs: Iterable[Trace]) -> str:
+    return "".join(json.dumps(r, default=str) + "\n" for t in trs for r in t.records())
+
+# -- profiling ---------------------------------------------------------------
+def start_profile() -> cProfile.Profile:
+    prof = cProfile.Profile()
+    prof.enable()
+    return prof
+
+def profile_report(prof: cProfile.Profile, limit: int = 40, sort: str = "cumulative") -> str:
+    prof.disable()
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
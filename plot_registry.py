@@ -0,0 +1,145 @@
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from logic import Config, PLOTS, decide_batch
+from config_store import apply_settings
+
+PLOT_HEADERS = ["plot","treatment","area_m2","theta_fc","theta_wp","alpha","active","timestamp"]
+
+# per-plot override columns: settings names, mapped onto Config by
+# config_store.apply_settings
+OVERRIDE_FIELDS = ("area_m2", "theta_fc", "theta_wp", "alpha")
+
+@dataclass(frozen=True)
+class PlotSpec:
+    plot: str
+    treatment: str
+    area_m2: Optional[float] = None
+    theta_fc: Optional[float] = None
+    theta_wp: Optional[float] = None
+    alpha: Optional[float] = None
+    active: bool = True
+
+    def overrides(self) -> Tuple[Tuple[str, float], ...]:
+        return tuple((k, getattr(self, k)) for k in OVERRIDE_FIELDS if getattr(self, k) is not None)
+
+    def row(self, timestamp: str) -> List[Any]:
+        def cell(v):
+            return "" if v is None else v
+        return [self.plot, self.treatment, cell(self.area_m2), cell(self.theta_fc), cell(self.theta_wp),
+                cell(self.alpha), 1 if self.active else 0, timestamp]
+
+def _opt_float(v: Any) -> Optional[float]:
+    v = pd.to_numeric(v, errors="coerce")
+    return None if pd.isna(v) else float(v)
+
+def _flag(v: Any) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() not in ("0", "false", "no", "n", "")
+    return True if v is None or pd.isna(v) else bool(v)
+
+def spec_from_record(r: Dict[str, Any]) -> PlotSpec:
+    plot = str(r["plot"]).strip()
+    treatment = str(r.get("treatment") or "").strip() or plot
+    return PlotSpec(plot, treatment, _opt_float(r.get("area_m2")), _opt_float(r.get("theta_fc")),
+                    _opt_float(r.get("theta_wp")), _opt_float(r.get("alpha")), _flag(r.get("active", 1)))
+
+# Plots under study, from the append-only plots worksheet: the last row for a
+# plot wins and active=0 retires it. With an empty sheet the registry is the
+# original T1–T4 layout, each plot running the treatment of the same name.
+class PlotRegistry:
+    def __init__(self, specs: Optional[Iterable[PlotSpec]] = None):
+        self.n_rows = 0
+        self._specs: Dict[str, PlotSpec] = {}
+        self._lock = threading.Lock()
+        self._set_specs(specs if specs is not None else [PlotSpec(p, p) for p in PLOTS])
+
+    def _set_specs(self, specs: Iterable[PlotSpec]):
+        self._specs = {s.plot: s for s in specs}
+        self._active = [p for p, s in self._specs.items() if s.active]
+        self._configs: Dict[Tuple[Config, Tuple], Config] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PlotRegistry":
+        reg = cls()
+        reg.sync(df)
+        return reg
+
+    def sync(self, df: pd.DataFrame) -> "PlotRegistry":
+        # df is the whole plots sheet; rebuilt only when rows were appended.
+        with self._lock:
+            if df is not None and not df.empty and len(df) != self.n_rows and "plot" in df.columns:
+                specs: Dict[str, PlotSpec] = {}
+                for r in df.to_dict("records"):
+                    if str(r.get("plot") or "").strip():
+                        s = spec_from_record(r)
+                        specs.pop(s.plot, None)
+                        specs[s.plot] = s
+                self._set_specs(specs.values())
+                self.n_rows = len(df)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def plots(self) -> List[str]:
+        return list(self._active)
+
+    def specs(self, include_inactive: bool = False) -> List[PlotSpec]:
+        return [s for s in self._specs.values() if include_inactive or s.active]
+
+    def spec(self, plot: str) -> PlotSpec:
+        return self._specs.get(plot) or PlotSpec(plot, plot)
+
+    def treatment_of(self, plot: str) -> str:
+        return self.spec(plot).treatment
+
+    def treatments(self, plots: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        return {p: self.treatment_of(p) for p in (self._active if plots is None else plots)}
+
+    def page(self, number: int, size: int) -> List[str]:
+        # 1-based page of active plots
+        return self._active[(number - 1) * size: number * size]
+
+    def config_for(self, plot: str, cfg: Config) -> Config:
+        return self._with_overrides(cfg, self.spec(plot).overrides())
+
+    def _with_overrides(self, cfg: Config, ov: Tuple[Tuple[str, float], ...]) -> Config:
+        # Config is hashable, so each (cfg, overrides) pair is built once.
+        if not ov:
+            return cfg
+        hit = self._configs.get((cfg, ov))
+        if hit is None:
+            if len(self._configs) > 256:
+                self._configs.clear()
+            hit = self._configs[(cfg, ov)] = apply_settings(cfg, dict(ov))
+        return hit
+
+    def decide_batch(self, df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+        # decide_batch once per group of plots sharing the same overrides.
+        ov = df["plot"].map(lambda p: self.spec(p).overrides())
+        if (ov.map(len) == 0).all():
+            return decide_batch(df, cfg)
+        parts = [decide_batch(grp, self._with_overrides(cfg, key)) for key, grp in df.groupby(ov, sort=False)]
+        return pd.concat(parts).loc[df.index]
+
+    def to_frame(self, include_inactive: bool = True) -> pd.DataFrame:
+        cols = ["plot","treatment"] + list(OVERRIDE_FIELDS) + ["active"]
+        return pd.DataFrame([[getattr(s, c) for c in cols] for s in self.specs(include_inactive)], columns=cols) \
+                 .astype({c: float for c in OVERRIDE_FIELDS})
+
+    def changed_rows(self, df: pd.DataFrame, timestamp: Optional[str] = None) -> List[List[Any]]:
+        # Sheet rows for the specs in df (e.g. an edited to_frame()) that differ
+        # from the registry, plus every spec when the sheet is still empty.
+        timestamp = timestamp or date.today().isoformat()
+        rows = []
+        for r in df.to_dict("records"):
+            if not str(r.get("plot") or "").strip():
+                continue
+            s = spec_from_record(r)
+            if self.n_rows == 0 or self._specs.get(s.plot) != s:
+                rows.append(s.row(timestamp))
+        return rows
@@ -0,0 +1,355 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from perf import span
+
+# NDVI captures (drone / multispectral camera rasters) reduced to per-plot
+# zonal statistics for daily_inputs_ws. The red and NIR bands are opened as
+# memory-mapped arrays and read in row blocks; each block adds to a per-plot
+# NDVI sum and histogram, so memory grows with the block and plots × bins, not
+# with the image. Means are exact, percentiles to one histogram bin.
+#   python raster.py --ws daily_inputs --date 2025-12-01 --red red.npy --nir nir.npy --polygons plots.geojson
+
+BLOCK_PIXELS = 4_000_000
+HIST_BINS = 2000          # over NDVI [-1, 1]: percentiles to 0.001
+PERCENTILES = (10, 50, 90)
+STAT_COLUMNS = ["plot", "ndvi", "ndvi_p10", "ndvi_p50", "ndvi_p90", "n_pixels", "valid_frac"]
+
+Band = Union[str, "os.PathLike[str]", np.ndarray]
+GeoTransform = Tuple[float, float, float, float, float, float]
+
+def open_band(src: Band, band: Optional[int] = None, shape: Optional[Tuple[int, int]] = None,
+              dtype: Optional[str] = None) -> np.ndarray:
+    # Memory-mapped, nothing is read yet. .npy via np.load, uncompressed TIFF
+    # via tifffile, anything else as a raw file of the given shape and dtype.
+    # band picks one plane of a multi-band array: (bands, rows, cols), or
+    # (rows, cols, bands) when the last axis is the short one.
+    if isinstance(src, np.ndarray):
+        arr = src
+    else:
+        path = os.fspath(src)
+        lower = path.lower()
+        if lower.endswith(".npy"):
+            arr = np.load(path, mmap_mode="r")
+        elif lower.endswith((".tif", ".tiff")):
+            try:
+                import tifffile
+            except ImportError as e:
+                raise ImportError(f"{path}: reading TIFF bands needs the tifffile package "
+                                  "(pip install tifffile), or pass a .npy / raw band") from e
+            arr = tifffile.memmap(path, mode="r")
+        else:
+            if shape is None or dtype is None:
+                raise ValueError(f"{path}: raw band files need shape and dtype")
+            arr = np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape))
+    if arr.ndim == 3:
+        if band is None:
+            raise ValueError(f"multi-band array {arr.shape}: pass band=")
+        arr = arr[..., band] if arr.shape[-1] < arr.shape[0] else arr[band]
+    if arr.ndim != 2:
+        raise ValueError(f"band must be 2-D, got shape {arr.shape}")
+    return arr
+
+# -- zones -------------------------------------------------------------------
+# A zone source maps each pixel of a row block to a plot index (-1: no plot).
+class LabelZones:
+    # Integer label raster (memory-mapped like the bands); labels maps label
+    # value -> plot, other values are outside every plot.
+    def __init__(self, labels: Band, plots: Dict[int, str]):
+        self.labels = open_band(labels)
+        self.plots = list(dict.fromkeys(plots.values()))
+        index = {p: i for i, p in enumerate(self.plots)}
+        self._lookup = dict((int(k), index[v]) for k, v in plots.items())
+        self._lut = np.full(max([0, *self._lookup]) + 1, -1, dtype=np.int32)
+        for k, i in self._lookup.items():
+            if k >= 0:
+                self._lut[k] = i
+
+    def block(self, r0: int, r1: int) -> np.ndarray:
+        lab = np.asarray(self.labels[r0:r1]).astype(np.int64, copy=False)
+        inside = (lab >= 0) & (lab < len(self._lut))
+        return np.where(inside, self._lut[np.where(inside, lab, 0)], -1)
+
+    def digest(self) -> str:
+        return "labels:" + _band_digest(self.labels) + json.dumps(sorted(self._lookup.items()))
+
+class PolygonZones:
+    # plot -> rings of (x, y) vertices. With a GDAL-style geotransform the
+    # vertices are map coordinates, otherwise pixel (col, row) coordinates.
+    # Rings are combined even-odd, so holes (and MultiPolygon parts) just work.
+    # A pixel belongs to a plot when its centre is inside.
+    def __init__(self, polygons: Dict[str, Sequence[Sequence[Tuple[float, float]]]],
+                 transform: Optional[GeoTransform] = None):
+        self.plots = list(polygons)
+        self.transform = transform
+        self._rings = [[self._to_pixels(np.asarray(ring, dtype=float)) for ring in rings]
+                       for rings in polygons.values()]
+        self._bbox = []
+        for rings in self._rings:
+            pts = np.vstack(rings) if rings else np.zeros((0, 2))
+            self._bbox.append((pts[:, 0].min(), pts[:, 0].max(), pts[:, 1].min(), pts[:, 1].max())
+                              if len(pts) else None)
+        self.width: Optional[int] = None
+
+    def _to_pixels(self, xy: np.ndarray) -> np.ndarray:
+        if self.transform is None:
+            return xy
+        x0, dx, rx, y0, ry, dy = self.transform
+        if rx or ry:
+            raise ValueError("rotated geotransforms are not supported")
+        return np.column_stack([(xy[:, 0] - x0) / dx, (xy[:, 1] - y0) / dy])
+
+    def block(self, r0: int, r1: int) -> np.ndarray:
+        out = np.full((r1 - r0, self.width), -1, dtype=np.int32)
+        for i, (rings, bbox) in enumerate(zip(self._rings, self._bbox)):
+            if bbox is None:
+                continue
+            c0, c1 = max(0, int(np.floor(bbox[0]))), min(self.width, int(np.ceil(bbox[1])) + 1)
+            b0, b1 = max(r0, int(np.floor(bbox[2]))), min(r1, int(np.ceil(bbox[3])) + 1)
+            if c0 >= c1 or b0 >= b1:
+                continue
+            px = np.arange(c0, c1) + 0.5
+            py = (np.arange(b0, b1) + 0.5)[:, None]
+            inside = np.zeros((b1 - b0, c1 - c0), dtype=bool)
+            for ring in rings:
+                for (xa, ya), (xb, yb) in zip(ring, np.roll(ring, -1, axis=0)):
+                    if ya == yb:
+                        continue
+                    crosses = (ya > py) != (yb > py)
+                    x_at = xa + (py - ya) * (xb - xa) / (yb - ya)
+                    inside ^= crosses & (px < x_at)
+            window = out[b0 - r0:b1 - r0, c0:c1]
+            window[inside] = i
+        return out
+
+    def digest(self) -> str:
+        return "polygons:" + json.dumps([self.plots, [[r.round(6).tolist() for r in rings] for rings in self._rings]])
+
+Zones = Union[LabelZones, PolygonZones]
+
+def load_polygons(path: str, plot_field: str = "plot") -> Dict[str, List[List[Tuple[float, float]]]]:
+    # GeoJSON Polygon / MultiPolygon features, the plot name in properties[plot_field]
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    out: Dict[str, List] = {}
+    for feat in doc.get("features", [doc]):
+        geom = feat.get("geometry") or {}
+        plot = str((feat.get("properties") or {}).get(plot_field, "")).strip()
+        if not plot:
+            continue
+        parts = [geom.get("coordinates", [])] if geom.get("type") == "Polygon" else geom.get("coordinates", [])
+        out.setdefault(plot, []).extend([[tuple(pt[:2]) for pt in ring] for part in parts for ring in part])
+    return out
+
+# -- zonal statistics ---------------------------------------------------------
+def zonal_ndvi(red: np.ndarray, nir: np.ndarray, zones: Zones, nodata: Optional[float] = None,
+               block_pixels: int = BLOCK_PIXELS, bins: int = HIST_BINS,
+               percentiles: Sequence[int] = PERCENTILES) -> pd.DataFrame:
+    if red.shape != nir.shape:
+        raise ValueError(f"red {red.shape} and NIR {nir.shape} bands differ in shape")
+    rows, width = red.shape
+    if isinstance(zones, PolygonZones):
+        zones.width = width
+    elif zones.labels.shape != red.shape:
+        raise ValueError(f"label raster {zones.labels.shape} does not match the bands {red.shape}")
+    n = len(zones.plots)
+    hist = np.zeros(n * bins, dtype=np.int64)
+    sums = np.zeros(n)
+    pixels = np.zeros(n, dtype=np.int64)
+    step = max(1, block_pixels // max(1, width))
+    with span("raster.zonal_ndvi", pixels=rows * width, plots=n):
+        for r0 in range(0, rows, step):
+            r1 = min(rows, r0 + step)
+            zone = zones.block(r0, r1).ravel()
+            inzone = zone >= 0
+            if not inzone.any():
+                continue
+            # only the block's in-zone pixels are converted to float
+            z = zone[inzone]
+            r = np.asarray(red[r0:r1]).ravel()[inzone].astype(np.float32)
+            v = np.asarray(nir[r0:r1]).ravel()[inzone].astype(np.float32)
+            pixels += np.bincount(z, minlength=n)
+            denom = v + r
+            ok = denom > 0
+            if nodata is not None:
+                ok &= (r != nodata) & (v != nodata)
+            ndvi = np.clip((v[ok] - r[ok]) / denom[ok], -1.0, 1.0)
+            z = z[ok]
+            sums += np.bincount(z, weights=ndvi, minlength=n)
+            b = np.minimum(((ndvi + 1.0) * (bins / 2.0)).astype(np.int64), bins - 1)
+            hist += np.bincount(z * bins + b, minlength=n * bins)
+    hist = hist.reshape(n, bins)
+    valid = hist.sum(axis=1)
+    out = pd.DataFrame({"plot": zones.plots, "ndvi": sums / np.where(valid > 0, valid, np.nan)})
+    cum = np.cumsum(hist, axis=1)
+    centres = -1.0 + (np.arange(bins) + 0.5) * (2.0 / bins)
+    for q in percentiles:
+        first = (cum >= (q / 100.0) * valid[:, None]).argmax(axis=1)
+        out[f"ndvi_p{q}"] = np.where(valid > 0, centres[first], np.nan)
+    out["n_pixels"] = pixels
+    out["valid_frac"] = valid / np.where(pixels > 0, pixels, np.nan)
+    return out
+
+# -- per-capture cache ----------------------------------------------------------
+def _band_digest(arr: np.ndarray) -> str:
+    # memmaps: file identity (path, size, mtime); in-memory arrays: content
+    path = arr.filename if isinstance(arr, np.memmap) else None
+    if path:
+        root = arr
+        while isinstance(root.base, np.ndarray):
+            root = root.base
+        offset = arr.__array_interface__["data"][0] - root.__array_interface__["data"][0]
+        st = os.stat(path)
+        return f"{path}:{st.st_size}:{st.st_mtime_ns}:{offset}:{arr.shape}:{arr.strides}:{arr.dtype}"
+    return hashlib.sha256(np.ascontiguousarray(arr).view(np.uint8).ravel().tobytes()).hexdigest()
+
+def capture_key(red: np.ndarray, nir: np.ndarray, zones: Zones, nodata: Optional[float] = None,
+                bins: int = HIST_BINS, percentiles: Sequence[int] = PERCENTILES) -> str:
+    parts = [_band_digest(red), _band_digest(nir), zones.digest(), repr(nodata), str(bins), repr(tuple(percentiles))]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+# Results per capture key, in memory and (with a directory) as small JSON
+# files, so re-running an ingest over the same captures reads no pixels.
+class ZonalCache:
+    def __init__(self, directory: Optional[str] = None, max_items: int = 64):
+        self.directory = directory
+        self.max_items = max_items
+        self._done: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.directory, key + ".json") if self.directory else None
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if key in self._done:
+                self._done.move_to_end(key)
+                return self._done[key].copy()
+        path = self._path(key)
+        if path and os.path.exists(path):
+            df = pd.read_json(path, orient="records", dtype={"plot": str})[STAT_COLUMNS].astype(
+                {**{c: float for c in STAT_COLUMNS[1:]}, "n_pixels": np.int64})
+            self._put(key, df)
+            return df.copy()
+        return None
+
+    def _put(self, key: str, df: pd.DataFrame):
+        with self._lock:
+            self._done[key] = df
+            while len(self._done) > self.max_items:
+                self._done.popitem(last=False)
+
+    def put(self, key: str, df: pd.DataFrame):
+        self._put(key, df.copy())
+        path = self._path(key)
+        if path:
+            tmp = path + ".tmp"
+            df.to_json(tmp, orient="records")
+            os.replace(tmp, path)
+
+    def zonal_ndvi(self, red: np.ndarray, nir: np.ndarray, zones: Zones, nodata: Optional[float] = None,
+                   **kwargs) -> pd.DataFrame:
+        key = capture_key(red, nir, zones, nodata, kwargs.get("bins", HIST_BINS),
+                          kwargs.get("percentiles", PERCENTILES))
+        hit = self.get(key)
+        if hit is None:
+            hit = zonal_ndvi(red, nir, zones, nodata, **kwargs)
+            self.put(key, hit)
+        return hit
+
+# -- daily inputs ---------------------------------------------------------------
+def _cell(v: Any) -> Any:
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return ""
+    return v.item() if hasattr(v, "item") else v
+
+def ndvi_rows(stats: pd.DataFrame, day: date, existing: Optional[pd.DataFrame] = None,
+              note: str = "NDVI capture") -> List[List[Any]]:
+    # daily_inputs_ws rows for day with the capture's mean NDVI. A plot that
+    # already has a row that day keeps its other values; only ndvi changes.
+    from ingest import ROUND, daily_rows
+    from replay import DAILY_INPUT_HEADERS
+    stats = stats[stats["ndvi"].notna()]
+    if stats.empty:
+        return []
+    old: Dict[str, Dict[str, Any]] = {}
+    if existing is not None and not existing.empty:
+        ex = existing[pd.to_datetime(existing["date"]).dt.date == day]
+        old = {str(r["plot"]): r for r in ex.to_dict("records")}
+    fresh = stats[~stats["plot"].isin(old)]
+    rows = daily_rows(pd.DataFrame({"date": pd.Timestamp(day), "plot": fresh["plot"], "theta_vwc": np.nan,
+                                    "ndvi": fresh["ndvi"].round(ROUND["ndvi"])}), note=note)
+    for plot, value in zip(stats["plot"], stats["ndvi"]):
+        if plot in old:
+            r = dict(old[plot], date=day.isoformat(), ndvi=round(float(value), ROUND["ndvi"]))
+            rows.append([_cell(r.get(h)) for h in DAILY_INPUT_HEADERS])
+    return rows
+
+def ingest_capture(red: np.ndarray, nir: np.ndarray, zones: Zones, day: date, ws_name: str,
+                   nodata: Optional[float] = None, cache: Optional[ZonalCache] = None,
+                   dry_run: bool = False) -> Dict[str, Any]:
+    from data_io import ensure_headers, read_sheet, upsert_rows
+    from replay import DAILY_INPUT_HEADERS, ROW_KEY
+    ensure_headers(ws_name, DAILY_INPUT_HEADERS)
+    stats = (cache or ZonalCache()).zonal_ndvi(red, nir, zones, nodata)
+    rows = ndvi_rows(stats, day, read_sheet(ws_name, start=day, end=day))
+    pending = bool(rows) and not dry_run and not upsert_rows(ws_name, rows, ROW_KEY, wait=True)
+    return dict(plots=int(stats["ndvi"].notna().sum()), no_pixels=sorted(stats.loc[stats["ndvi"].isna(), "plot"]),
+                written=0 if dry_run else len(rows), pending=pending, stats=stats, rows=rows)
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Per-plot NDVI from red/NIR rasters into daily inputs.")
+    ap.add_argument("--ws", required=True, help="daily inputs worksheet")
+    ap.add_argument("--date", required=True, type=date.fromisoformat, help="capture date")
+    ap.add_argument("--red", required=True)
+    ap.add_argument("--nir", help="NIR band file (default: --red, with --nir-band)")
+    ap.add_argument("--red-band", type=int)
+    ap.add_argument("--nir-band", type=int)
+    ap.add_argument("--shape", help="rows,cols for raw band files")
+    ap.add_argument("--dtype", help="dtype for raw band files, e.g. uint16")
+    ap.add_argument("--nodata", type=float)
+    zones = ap.add_mutually_exclusive_group(required=True)
+    zones.add_argument("--polygons", help="GeoJSON with one Polygon/MultiPolygon feature per plot")
+    zones.add_argument("--labels", help="integer label raster (same grid as the bands)")
+    ap.add_argument("--label-map", help="JSON {label: plot} for --labels (default: label = plot name)")
+    ap.add_argument("--plot-field", default="plot")
+    ap.add_argument("--transform", help="GDAL geotransform x0,dx,0,y0,0,dy when polygons are map coordinates")
+    ap.add_argument("--cache-dir", default=os.environ.get("IRRIGATION_RASTER_CACHE"))
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+    shape = tuple(int(v) for v in args.shape.split(",")) if args.shape else None
+    red = open_band(args.red, args.red_band, shape, args.dtype)
+    nir = open_band(args.nir or args.red, args.nir_band, shape, args.dtype)
+    if args.polygons:
+        transform = tuple(float(v) for v in args.transform.split(",")) if args.transform else None
+        z: Zones = PolygonZones(load_polygons(args.polygons, args.plot_field), transform)
+    else:
+        labels = open_band(args.labels, shape=shape, dtype="int32" if shape else None)
+        if args.label_map:
+            with open(args.label_map, encoding="utf-8") as f:
+                mapping = {int(k): str(v) for k, v in json.load(f).items()}
+        else:
+            step = max(1, BLOCK_PIXELS // labels.shape[1])
+            found = set()
+            for r0 in range(0, labels.shape[0], step):
+                found.update(np.unique(labels[r0:r0 + step]).tolist())
+            mapping = {int(k): str(k) for k in sorted(found) if k > 0}
+        z = LabelZones(labels, mapping)
+    res = ingest_capture(red, nir, z, args.date, args.ws, nodata=args.nodata,
+                         cache=ZonalCache(args.cache_dir), dry_run=args.dry_run)
+    print(res.pop("stats").to_string(index=False))
+    res.pop("rows")
+    print(res)
+
+if __name__ == "__main__":
+    main()
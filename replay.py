@@ -0,0 +1,143 @@
+from __future__ import annotations
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Any
+import numpy as np
+import pandas as pd
+from logic import Config, PLOTS, BATCH_OUTPUT_COLUMNS, decide, decide_batch
+from dr_store import carried_dr
+
+DAILY_INPUT_HEADERS = ["date","plot","theta_vwc","rain_obs","rain_fcst_24h","ndvi","eto","notes"]
+DECISION_HEADERS = ["date","plot","treatment","decision","reason","Dr","RAW","theta","theta_trigger",
+                    "ndvi","Kc","rain_fcst","irr_mm","irr_L"]
+# one row per key in both sheets; saves upsert on it
+ROW_KEY = ("date", "plot")
+
+# daily_inputs_ws column -> decide_batch column
+INPUT_COLUMNS = {"eto": "ETo", "rain_obs": "rain_obs", "rain_fcst_24h": "rain_fcst",
+                 "theta_vwc": "theta", "ndvi": "ndvi"}
+
+def normalize_inputs(df_in: pd.DataFrame, plots: Optional[List[str]] = None,
+                     eto: Optional[pd.Series] = None) -> pd.DataFrame:
+    # eto: computed ETo by date (eto.EToCache.series()), used where the sheet's eto is blank
+    if df_in.empty:
+        return pd.DataFrame(columns=["date","plot"] + list(INPUT_COLUMNS.values()))
+    df = df_in.rename(columns=INPUT_COLUMNS).copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+    df = df.dropna(subset=["date"])
+    df["plot"] = df["plot"].astype(str)
+    if plots is not None:
+        df = df[df["plot"].isin(plots)]
+    for col in INPUT_COLUMNS.values():
+        # the dashboard stores "no reading" as an empty cell
+        df[col] = pd.to_numeric(df[col] if col in df else np.nan, errors="coerce")
+    if eto is not None and len(eto):
+        computed = pd.Series(eto.to_numpy(dtype=float), index=pd.DatetimeIndex(pd.to_datetime(eto.index)).normalize())
+        df["ETo"] = df["ETo"].fillna(df["date"].map(computed))
+    for col in ("ETo", "rain_obs", "rain_fcst"):
+        df[col] = df[col].fillna(0.0)
+    df = df.drop_duplicates(["date","plot"], keep="last")
+    return df.sort_values(["date","plot"], kind="stable")[["date","plot"] + list(INPUT_COLUMNS.values())]
+
+def iter_season(df_in: pd.DataFrame, cfg: Config, plots: Optional[List[str]] = None,
+                Dr0: Optional[Dict[str, float]] = None,
+                start: Optional[date] = None, end: Optional[date] = None,
+                cfg_for: Optional[Callable[[date], Config]] = None,
+                registry=None, eto: Optional[pd.Series] = None) -> Iterator[pd.DataFrame]:
+    # One decide_batch call per day across all plots; only the carried Dr per
+    # plot is kept between days. cfg_for (e.g. ConfigHistory.as_of) picks the
+    # parameters in effect on each day instead of a single cfg. A PlotRegistry
+    # supplies each plot's treatment and overrides (default: treatment = plot).
+    df = normalize_inputs(df_in, plots or (registry.plots() if registry is not None else PLOTS), eto)
+    treatment_of = registry.treatment_of if registry is not None else str
+    decide = registry.decide_batch if registry is not None else decide_batch
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    Dr = dict(Dr0 or {})
+    for ts, day in df.groupby("date", sort=True):
+        batch = day.assign(treatment=day["plot"].map(treatment_of),
+                           Dr_start=[Dr.get(p, 0.0) for p in day["plot"]])
+        out = decide(batch, cfg_for(ts.date()) if cfg_for else cfg)
+        out["plot"] = day["plot"].to_numpy()
+        out["treatment"] = batch["treatment"].to_numpy()
+        auto = out["decision"] != "Manual"
+        for p, end_dr in zip(out.loc[auto, "plot"], out.loc[auto, "Dr_end"]):
+            Dr[p] = float(end_dr)
+        yield out
+
+def decision_rows(out: pd.DataFrame) -> List[List[Any]]:
+    # Same layout and rounding as the dashboard's "Compute & save" rows.
+    def r(v, nd):
+        return "" if v is None or pd.isna(v) else round(float(v), nd)
+
+    rows = []
+    for o in out.to_dict("records"):
+        irr = o["decision"] == "Irrigate"
+        if o["decision"] == "Manual":
+            rows.append([o["date"], o["plot"], o["treatment"], "Manual", "Farmer",
+                         "", "", "", "", "", "", o["rain_fcst"], "", ""])
+            continue
+        rows.append([o["date"], o["plot"], o["treatment"], o["decision"], o["reason"],
+                     r(o["Dr_start"], 1), r(o["RAW"], 1), r(o["theta_vwc"], 3), r(o["theta_trigger"], 3),
+                     r(o["ndvi"], 2), r(o["kc"], 2), o["rain_fcst"],
+                     r(o["irr_gross_mm"], 1) if irr else "", r(o["irr_liters"], 1) if irr else ""])
+    return rows
+
+def replay_season(df_in: pd.DataFrame, cfg: Config, plots: Optional[List[str]] = None,
+                  ws_name: Optional[str] = None, ledger=None, **kwargs) -> pd.DataFrame:
+    # Dry run unless ws_name is given; then all decision rows go out in a
+    # single upsert. A DrLedger, if passed, is updated (the caller flushes it).
+    frames = list(iter_season(df_in, cfg, plots, **kwargs))
+    if not frames:
+        return pd.DataFrame(columns=BATCH_OUTPUT_COLUMNS + ["treatment"])
+    out = pd.concat(frames, ignore_index=True)
+    if ledger is not None:
+        auto = out[out["decision"] != "Manual"]
+        for p, d, s, e in zip(auto["plot"], auto["date"], auto["Dr_start"], auto["Dr_end"]):
+            ledger.set(p, date.fromisoformat(d), float(s), float(e))
+    if ws_name is not None:
+        from data_io import upsert_rows
+        upsert_rows(ws_name, decision_rows(out), ROW_KEY)
+    return out
+
+# -- carrying a changed Dr forward -------------------------------------------
+def _num(v: Any) -> Optional[float]:
+    v = pd.to_numeric(v, errors="coerce")
+    return None if pd.isna(v) else float(v)
+
+def inputs_by_date(df_in: pd.DataFrame) -> Dict[date, Dict[str, Any]]:
+    # one plot's daily_inputs_ws rows by date, the last row for a date winning
+    if df_in.empty:
+        return {}
+    return dict(zip(pd.to_datetime(df_in["date"]).dt.date, df_in.to_dict("records")))
+
+def replay_later_days(ledger, plot: str, since: date, inputs: Dict[date, Dict[str, Any]], treatment: str,
+                      cfg_for: Callable[[date], Config],
+                      eto_of: Optional[Callable[[date], Optional[float]]] = None) -> List[Dict[str, Any]]:
+    # A day was (re)computed or its inputs edited: carry the new Dr forward
+    # through the days already in the DrLedger from `since`, re-deciding each
+    # from its stored inputs (eto_of fills a blank eto), until a day comes out
+    # unchanged. -> the re-run decisions, for the decisions sheet. A ledger day
+    # with no stored inputs keeps its change in Dr and its decision row.
+    outs: List[Dict[str, Any]] = []
+
+    def step(day, Dr_start):
+        r = inputs.get(day)
+        if r is None:
+            return None
+        day_eto = _num(r.get("eto"))
+        if day_eto is None:
+            day_eto = (eto_of(day) if eto_of else None) or 0.0
+        out = decide(treatment, day, day_eto, _num(r.get("rain_obs")) or 0.0, _num(r.get("rain_fcst_24h")) or 0.0,
+                     _num(r.get("theta_vwc")), _num(r.get("ndvi")), Dr_start, cfg_for(day))
+        outs.append(dict(out, plot=plot, treatment=treatment))
+        return carried_dr(out)
+
+    ledger.recompute(plot, since, step)
+    return outs
+
+def replayed_rows(outs: List[Dict[str, Any]]) -> List[List[Any]]:
+    if not outs:
+        return []
+    return decision_rows(pd.DataFrame(outs).reindex(columns=BATCH_OUTPUT_COLUMNS + ["treatment"]))
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional
+import pandas as pd
+from perf import bind, timed
+
+def chart_key(chart) -> str:
+    # The Vega-Lite dict carries the inline data as well as the spec.
+    spec = json.dumps(chart.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+def frame_digest(df: Optional[pd.DataFrame]) -> str:
+    h = hashlib.sha256()
+    if df is not None and not df.empty:
+        h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+@timed("report.weekly_charts")
+def weekly_charts(totals: pd.DataFrame, df_in_w: pd.DataFrame, daily_w: pd.DataFrame) -> Dict[str, object]:
+    # Charts shown on the Reports tab and embedded in the PDF, in that order;
+    # "height" and "wue" are None when the week has no plant heights.
+    # totals / daily_w: SummaryStore.plot_totals() / daily() over the week.
+    import altair as alt
+    irr = totals[totals["n_decisions"] > 0][["plot", "irr_L"]]
+    irr_chart = alt.Chart(irr).mark_bar().encode(
+        x="plot:N", y=alt.Y("irr_L:Q", title="Irrigation (L)"), color="plot:N", tooltip=["plot", "irr_L"]
+    ).properties(title="Total Irrigation (L) – This Week", height=300)
+
+    ndvi_chart = alt.Chart(df_in_w).mark_circle(size=60).encode(
+        x=alt.X("theta_vwc:Q", title="Soil Moisture (m³/m³)"),
+        y=alt.Y("ndvi:Q", title="NDVI"),
+        color="plot:N",
+        tooltip=["plot","date","theta_vwc","ndvi"]
+    ).properties(title="NDVI vs Soil Moisture", height=300)
+
+    height_chart = None
+    df_hm = daily_w[daily_w["n_heights"] > 0][["date", "plot", "height_mean"]].rename(columns={"height_mean": "height_cm"})
+    if not df_hm.empty:
+        height_chart = alt.Chart(df_hm).mark_line(point=True).encode(
+            x="date:T", y=alt.Y("height_cm:Q", title="Mean height (cm)"), color="plot:N",
+            tooltip=["plot","date","height_cm"]
+        ).properties(title="Plant Height Trend (mean of 6 plants)", height=300)
+
+    wue_chart = None
+    if not df_hm.empty and not irr.empty:
+        h_mean = totals[totals["n_heights"] > 0][["plot", "height_mean"]]
+        wue = h_mean.merge(irr.rename(columns={"irr_L": "irr_L_week"}), on="plot", how="left")
+        wue["WUE_cm_per_L"] = wue["height_mean"] / wue["irr_L_week"].replace(0, pd.NA)
+        wue_chart = alt.Chart(wue.fillna(0)).mark_bar().encode(
+            x="plot:N", y=alt.Y("WUE_cm_per_L:Q", title="WUE (cm/L)"),
+            color="plot:N", tooltip=["plot","height_mean","irr_L_week","WUE_cm_per_L"]
+        ).properties(title="Water-Use Efficiency (this week)", height=300)
+
+    return dict(irr=irr_chart, ndvi=ndvi_chart, height=height_chart, wue=wue_chart)
+
+@timed("report.chart_to_png")
+def chart_to_png(chart, scale: float = 2.0) -> bytes:
+    import vl_convert as vlc
+    return vlc.vegalite_to_png(chart.to_dict(), scale=scale)
+
+def chart_to_image(chart) -> io.BytesIO:
+    return io.BytesIO(chart_to_png(chart))
+
+@timed("report.make_pdf")
+def make_pdf(buffer, totals: pd.DataFrame, charts_images, week_start: date, today: date):
+    # totals: SummaryStore.plot_totals() over the report period
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1.5*cm, bottomMargin=1.5*cm)
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='CenterTitle', alignment=1, fontSize=18, spaceAfter=20))
+    styles.add(ParagraphStyle(name='SectionHeader', fontSize=14, textColor=colors.HexColor('#006400'), spaceAfter=10))
+    story = []
+    story.append(Paragraph("<b>Smart Irrigation System – Weekly Report</b>", styles['CenterTitle']))
+    story.append(Paragraph("<b>Crop:</b> Spinach  &nbsp;&nbsp;  <b>Site:</b> Utsunomiya, Japan", styles['Normal']))
+    story.append(Paragraph(f"<b>Period:</b> {week_start} – {today}", styles['Normal']))
+    story.append(Paragraph("<b>Prepared by:</b> Patrick Habyarimana<br/><b>Verified by:</b> Supervisor / Advisor", styles['Normal']))
+    story.append(Spacer(1, 20))
+    story.append(Paragraph("Executive Summary", styles['SectionHeader']))
+    irr_tbl = totals[totals["n_decisions"] > 0][["plot", "irr_L"]]
+    ndvi_tbl = totals[totals["n_ndvi"] > 0][["plot", "ndvi_mean"]].rename(columns={"ndvi_mean": "ndvi"})
+    try:
+        total_irr = irr_tbl.set_index("plot")["irr_L"].to_dict()
+        mean_ndvi = ndvi_tbl.set_index("plot")["ndvi"].to_dict()
+        best_eff = min(total_irr, key=total_irr.get) if total_irr else None
+        highest_ndvi = max(mean_ndvi, key=mean_ndvi.get) if mean_ndvi else None
+        diff_ratio = (1 - (total_irr.get("T3", 0) / (total_irr.get("T2", 1) + 1e-6))) * 100
+        summary_text = f"""During {week_start}–{today}, plot <b>{best_eff}</b> used the least water ({total_irr.get(best_eff,0):.1f} L),
+        while plot <b>{highest_ndvi}</b> achieved the highest mean NDVI ({mean_ndvi.get(highest_ndvi,0):.2f}).
+        T3 used {diff_ratio:.1f}% less water than T2 with comparable canopy vigor."""
+        story.append(Paragraph(summary_text, styles['Normal']))
+    except Exception as e:
+        story.append(Paragraph(f"<i>Summary unavailable (data incomplete): {e}</i>", styles['Normal']))
+    story.append(Spacer(1, 12))
+    story.append(Paragraph("Irrigation & NDVI Analysis", styles['SectionHeader']))
+    for img in charts_images:
+        story.append(RLImage(img, width=15*cm, height=8*cm))
+        story.append(Spacer(1, 10))
+    merged = pd.merge(irr_tbl, ndvi_tbl, on="plot", how="left").round(2)
+    data = [["Plot", "Irrigation (L)", "Mean NDVI"]] + merged.values.tolist()
+    table = Table(data)
+    story.append(table)
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+# Content-addressed cache of chart PNGs and finished PDFs. Misses are rendered
+# on worker threads (charts in parallel); callers get a Future and can serve
+# the bytes once it is done. PDF jobs have their own pool so they never wait
+# on chart renders queued behind them.
+class ReportCache:
+    def __init__(self, max_items: int = 128, chart_workers: int = 4, pdf_workers: int = 1):
+        self.max_items = max_items
+        self._done: "OrderedDict[str, bytes]" = OrderedDict()
+        self._running: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._chart_pool = ThreadPoolExecutor(max_workers=chart_workers, thread_name_prefix="chart-png")
+        self._pdf_pool = ThreadPoolExecutor(max_workers=pdf_workers, thread_name_prefix="report-pdf")
+
+    def _get_or_submit(self, key: str, pool: ThreadPoolExecutor, fn) -> Future:
+        with self._lock:
+            if key in self._done:
+                self._done.move_to_end(key)
+                fut: Future = Future()
+                fut.set_result(self._done[key])
+                return fut
+            if key in self._running:
+                return self._running[key]
+            fut = pool.submit(bind(fn))  # spans land in the requesting rerun's trace
+            self._running[key] = fut
+        fut.add_done_callback(lambda f: self._finish(key, f))
+        return fut
+
+    def _finish(self, key: str, fut: Future):
+        with self._lock:
+            self._running.pop(key, None)
+            if fut.cancelled() or fut.exception() is not None:
+                return  # not cached: the next request retries
+            self._done[key] = fut.result()
+            while len(self._done) > self.max_items:
+                self._done.popitem(last=False)
+
+    def chart_png(self, chart) -> Future:
+        return self._get_or_submit("png:" + chart_key(chart), self._chart_pool, lambda: chart_to_png(chart))
+
+    def pdf(self, totals: pd.DataFrame, charts: List, week_start: date, today: date) -> Future:
+        keys = [chart_key(c) for c in charts]
+        key = "pdf:" + hashlib.sha256("|".join(
+            keys + [frame_digest(totals), str(week_start), str(today)]).encode("utf-8")).hexdigest()
+
+        def build() -> bytes:
+            pngs = [self.chart_png(c) for c in charts]
+            imgs = [io.BytesIO(f.result()) for f in pngs]
+            return make_pdf(io.BytesIO(), totals, imgs, week_start, today).getvalue()
+
+        return self._get_or_submit(key, self._pdf_pool, build)
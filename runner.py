@@ -0,0 +1,316 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import perf
+from config_store import ConfigHistory, DEFAULT_TRANSPLANT, METADATA_HEADERS
+from dr_store import DR_HEADERS, DrLedger
+from eto import EToCache, Site, site_from_settings
+from logic import Config
+from plot_registry import PlotRegistry, PLOT_HEADERS
+from replay import (DAILY_INPUT_HEADERS, DECISION_HEADERS, ROW_KEY, decision_rows, inputs_by_date,
+                    replay_later_days, replay_season, replayed_rows)
+from storage import StorageBackend, SQLiteBackend, filter_frame
+
+# Headless entry point: decisions and the weekly report for every site in a
+# TOML file, no Streamlit involved.
+#   python runner.py sites.toml decide [--date 2025-12-01]
+#   python runner.py sites.toml report --send
+#   python runner.py sites.toml daemon --decide-at 07:00 --report-at mon@08:00 --send
+# Each [[sites]] table has the shape of the app's secrets.toml ([gsheets],
+# [gmail], [site], [storage]); top-level tables are defaults for every site,
+# so a secrets.toml on its own is a one-site file. Sites run on a worker pool;
+# they share one gspread client and one Gmail service, and API calls are
+# bounded per API (Sheets: --sheets-concurrency, Gmail: one at a time).
+
+log = logging.getLogger("irrigation.runner")
+
+WORKSHEET_DEFAULTS = {"dr_ws": "dr_ledger", "plots_ws": "plots", "weather_ws": "weather"}
+PLANT_HEADERS = ["date","plot","plant_id","height_cm"]
+
+@dataclass
+class SiteConfig:
+    name: str
+    gsheets: Dict[str, str]
+    gmail: Dict[str, str] = field(default_factory=dict)
+    site: Site = field(default_factory=lambda: site_from_settings({}))
+    transplant: date = DEFAULT_TRANSPLANT
+    storage: str = "gsheets"
+
+    def ws(self, key: str) -> str:
+        return self.gsheets.get(key) or WORKSHEET_DEFAULTS[key]
+
+def load_sites(path: str) -> Tuple[Optional[Dict[str, Any]], List[SiteConfig]]:
+    # -> (service account info or None, sites)
+    with open(path, "rb") as f:
+        doc = tomllib.load(f)
+    account = doc.get("gcp_service_account")
+    if account is None and doc.get("service_account_file"):
+        with open(doc["service_account_file"], encoding="utf-8") as f:
+            account = json.load(f)
+    sites = []
+    for i, t in enumerate(doc.get("sites") or [doc]):
+        merged = {k: {**doc.get(k, {}), **t.get(k, {})} for k in ("gsheets", "gmail", "site", "storage")}
+        name = str(t.get("name") or merged["gsheets"].get("workbook_name") or f"site{i + 1}")
+        transplant = merged["site"].get("transplant_date")
+        sites.append(SiteConfig(
+            name=name, gsheets=merged["gsheets"], gmail=merged["gmail"], site=site_from_settings(merged["site"]),
+            transplant=date.fromisoformat(str(transplant)) if transplant else DEFAULT_TRANSPLANT,
+            storage=str(merged["storage"].get("backend", "gsheets"))))
+    return account, sites
+
+class Limits:
+    def __init__(self, sheets: int = 4, render: int = 2):
+        self.sheets = threading.BoundedSemaphore(sheets)
+        self.render = threading.BoundedSemaphore(render)
+        # the Gmail client (httplib2) is not thread-safe: one send at a time
+        self.gmail = threading.Lock()
+
+# One gspread client, one Gmail service and one storage backend per site,
+# built on first use and kept for the life of the process (daemon runs reuse
+# the backends' sheet caches too).
+class Clients:
+    def __init__(self, service_account_info: Optional[Dict[str, Any]]):
+        self.info = service_account_info
+        self._gspread = None
+        self._gmail = None
+        self._backends: Dict[str, StorageBackend] = {}
+        self._lock = threading.Lock()
+
+    def _account(self) -> Dict[str, Any]:
+        if self.info is None:
+            raise RuntimeError("no gcp_service_account / service_account_file in the sites file")
+        return self.info
+
+    def gspread(self):
+        with self._lock:
+            if self._gspread is None:
+                from sheets import authorize
+                self._gspread = authorize(self._account())
+            return self._gspread
+
+    def gmail(self):
+        with self._lock:
+            if self._gmail is None:
+                from emailer import gmail_service
+                self._gmail = gmail_service(self._account())
+            return self._gmail
+
+    def backend(self, site: SiteConfig, limits: Optional[Limits] = None) -> StorageBackend:
+        with self._lock:
+            backend = self._backends.get(site.name)
+        if backend is None:
+            backend = self._open_backend(site, limits)
+            with self._lock:
+                backend = self._backends.setdefault(site.name, backend)
+        return backend
+
+    def _open_backend(self, site: SiteConfig, limits: Optional[Limits] = None) -> StorageBackend:
+        if site.storage.startswith("sqlite"):
+            backend = SQLiteBackend(site.storage.partition(":")[2] or f"{site.name}.db")
+        else:
+            from sheets import GSheetsBackend
+            workbook = site.gsheets["workbook_name"]
+            backend = GSheetsBackend(lambda: self.gspread().open(workbook))
+        g = site.gsheets
+        # a dozen Sheets calls per site: bounded like every other Sheets call
+        with limits.sheets if limits is not None else contextlib.nullcontext():
+            for ws, headers in ((g["daily_inputs_ws"], DAILY_INPUT_HEADERS), (g["decisions_ws"], DECISION_HEADERS),
+                                (g["plant_ws"], PLANT_HEADERS), (g["metadata_ws"], METADATA_HEADERS),
+                                (site.ws("dr_ws"), DR_HEADERS), (site.ws("plots_ws"), PLOT_HEADERS)):
+                backend.ensure_headers(ws, headers)
+        return backend
+
+# -- jobs --------------------------------------------------------------------
+def decide_site(site: SiteConfig, backend: StorageBackend, limits: Limits, day: date) -> Dict[str, Any]:
+    # The day's decisions for every active plot with an inputs row, as the
+    # dashboard's "Compute & save": a plot whose Dr for the day changed has
+    # its later days in the Dr ledger carried forward until one comes out
+    # unchanged, and only those decision rows are rewritten.
+    g = site.gsheets
+    names = [g["daily_inputs_ws"], site.ws("dr_ws"), g["metadata_ws"], site.ws("plots_ws"), site.ws("weather_ws")]
+    with limits.sheets:
+        frames = backend.read_many(names)
+    df_in, df_dr, df_meta, df_plots, df_weather = (frames[n] for n in names)
+    history = ConfigHistory(Config(transplant_date=site.transplant)).sync(df_meta)
+    registry = PlotRegistry().sync(df_plots)
+    eto = EToCache(site.site).update(df_weather)
+    ledger = DrLedger.from_frame(df_dr)
+    plots = registry.plots()
+    out = replay_season(df_in, history.as_of(day), plots, Dr0={p: ledger.dr_start(p, day) for p in plots},
+                        start=day, end=day, registry=registry, eto=eto.series())
+    if out.empty:
+        return dict(site=site.name, job="decide", day=day.isoformat(), decisions=0)
+    later = []
+    auto = out[out["decision"] != "Manual"]
+    for p, start, end in zip(auto["plot"], auto["Dr_start"], auto["Dr_end"]):
+        if ledger.set(p, day, float(start), float(end)) and ledger.has_later(p, day):
+            plot_in = df_in[df_in["plot"].astype(str) == p] if not df_in.empty else df_in
+            later += replay_later_days(ledger, p, day + timedelta(days=1), inputs_by_date(plot_in),
+                                       registry.treatment_of(p),
+                                       lambda d, p=p: registry.config_for(p, history.as_of(d)), eto.get)
+    rows = decision_rows(out) + replayed_rows(later)
+    with limits.sheets:
+        backend.upsert_rows(g["decisions_ws"], rows, ROW_KEY)
+        ledger.flush(site.ws("dr_ws"), append=backend.append_rows)
+    return dict(site=site.name, job="decide", day=day.isoformat(), decisions=len(out), recomputed=len(later),
+                irrigate=sorted(out.loc[out["decision"] == "Irrigate", "plot"]),
+                irr_L=round(float(pd.to_numeric(out["irr_liters"], errors="coerce").fillna(0).sum()), 1))
+
+def report_site(site: SiteConfig, backend: StorageBackend, limits: Limits, clients: Clients, today: date,
+                send: bool = False, out_dir: Optional[str] = None) -> Dict[str, Any]:
+    from report import chart_to_png, make_pdf, weekly_charts
+    from summaries import SummaryStore
+    g = site.gsheets
+    week_start = today - timedelta(days=7)
+    names = [g["decisions_ws"], g["daily_inputs_ws"], g["plant_ws"]]
+    with limits.sheets:
+        frames = backend.read_many(names)
+    store = SummaryStore().update(*(frames[n] for n in names))
+    totals = store.plot_totals(week_start, today)
+    df_in_w = filter_frame(frames[g["daily_inputs_ws"]], week_start, today)
+    charts = [c for c in weekly_charts(totals, df_in_w, store.daily(week_start, today)).values() if c is not None]
+    with limits.render:
+        pdf = make_pdf(io.BytesIO(), totals, [io.BytesIO(chart_to_png(c)) for c in charts], week_start, today)
+    filename = f"Weekly_Report_{site.name}_{today}.pdf"
+    res: Dict[str, Any] = dict(site=site.name, job="report", day=today.isoformat(), bytes=len(pdf.getvalue()))
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        res["file"] = os.path.join(out_dir, filename)
+        with open(res["file"], "wb") as f:
+            f.write(pdf.getvalue())
+    if send:
+        from emailer import send_pdf
+        service = clients.gmail()
+        with limits.gmail:
+            res["message_id"] = send_pdf(service, pdf, filename, site.gmail["sender"], site.gmail["to"],
+                                         site.gmail.get("subject", "Weekly Smart Irrigation report"))
+    return res
+
+def run_site(site: SiteConfig, clients: Clients, limits: Limits, jobs: List[str], day: date,
+             send: bool, out_dir: Optional[str]) -> List[Dict[str, Any]]:
+    trace = perf.begin_trace(f"runner:{site.name}")
+    try:
+        backend = clients.backend(site, limits)
+        out = []
+        for job in jobs:
+            if job == "decide":
+                out.append(decide_site(site, backend, limits, day))
+            else:
+                out.append(report_site(site, backend, limits, clients, day, send, out_dir))
+        return out
+    finally:
+        perf.end_trace(trace)
+
+def run(sites: List[SiteConfig], clients: Clients, limits: Limits, jobs: List[str], day: date,
+        send: bool = False, out_dir: Optional[str] = None, workers: int = 4) -> List[Dict[str, Any]]:
+    # One failing site is reported and does not stop the others.
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sites))), thread_name_prefix="site") as pool:
+        futs = {pool.submit(run_site, s, clients, limits, jobs, day, send, out_dir): s for s in sites}
+        for fut in as_completed(futs):
+            site = futs[fut]
+            try:
+                results.extend(fut.result())
+            except Exception as e:
+                log.exception("site %s failed", site.name)
+                results.append(dict(site=site.name, job="+".join(jobs), error=f"{type(e).__name__}: {e}"))
+    return results
+
+# -- daemon ------------------------------------------------------------------
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+def parse_at(spec: str) -> Tuple[Optional[int], int, int]:
+    # "07:00" (daily) or "mon@08:00" (weekly) -> (weekday or None, hour, minute)
+    day, _, hm = spec.rpartition("@")
+    hour, minute = (int(x) for x in hm.split(":"))
+    return (WEEKDAYS.index(day.lower()[:3]) if day else None), hour, minute
+
+def next_due(now: datetime, at: Tuple[Optional[int], int, int]) -> datetime:
+    weekday, hour, minute = at
+    due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if weekday is not None:
+        due += timedelta(days=(weekday - now.weekday()) % 7)
+    while due <= now:
+        due += timedelta(days=7 if weekday is not None else 1)
+    return due
+
+def pop_overdue(due: Dict[str, datetime], schedule: Dict[str, Tuple[Optional[int], int, int]],
+                now: datetime) -> List[Tuple[str, datetime]]:
+    # Jobs whose due time has passed, oldest first; each one's next due time
+    # follows its last due time, not now, so a run that overlaps another
+    # job's slot delays that job instead of skipping it. Every missed slot is
+    # returned (each decide day, each weekly report).
+    out = []
+    for job in schedule:
+        while due[job] <= now:
+            out.append((job, due[job]))
+            due[job] = next_due(due[job], schedule[job])
+    return sorted(out, key=lambda x: x[1])
+
+def daemon(schedule: Dict[str, Tuple[Optional[int], int, int]], emit, **run_kwargs):
+    start = datetime.now()
+    due = {job: next_due(start, at) for job, at in schedule.items()}
+    while True:
+        overdue = pop_overdue(due, schedule, datetime.now())
+        if not overdue:
+            job = min(due, key=due.get)
+            log.info("next: %s at %s", job, due[job].isoformat(timespec="minutes"))
+            time.sleep(max(0.0, (due[job] - datetime.now()).total_seconds()))
+            continue
+        for job, at in overdue:
+            if datetime.now() - at > timedelta(minutes=1):
+                log.warning("%s due %s runs late", job, at.isoformat(timespec="minutes"))
+            for r in run(jobs=[job], day=at.date(), **run_kwargs):
+                emit(r)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run decisions and weekly reports for many sites without Streamlit.")
+    ap.add_argument("sites_file", help="TOML with [[sites]] tables (or a single-site secrets.toml)")
+    ap.add_argument("command", choices=["decide", "report", "all", "daemon"])
+    ap.add_argument("--date", type=date.fromisoformat, default=None, help="decision / report date (default today)")
+    ap.add_argument("--only", nargs="+", default=None, help="site names to run")
+    ap.add_argument("--send", action="store_true", help="email the weekly report")
+    ap.add_argument("--out", default=None, help="also write report PDFs to this directory")
+    ap.add_argument("--workers", type=int, default=4, help="sites processed at once")
+    ap.add_argument("--sheets-concurrency", type=int, default=4)
+    ap.add_argument("--render-concurrency", type=int, default=2)
+    ap.add_argument("--decide-at", default="07:00", help="daemon: daily decision time, HH:MM")
+    ap.add_argument("--report-at", default="mon@08:00", help="daemon: weekly report time, DAY@HH:MM")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    account, sites = load_sites(args.sites_file)
+    if args.only:
+        sites = [s for s in sites if s.name in args.only]
+    clients = Clients(account)
+    limits = Limits(args.sheets_concurrency, args.render_concurrency)
+    kwargs = dict(sites=sites, clients=clients, limits=limits, send=args.send, out_dir=args.out,
+                  workers=args.workers)
+
+    def emit(r):
+        print(json.dumps(r, default=str), flush=True)
+
+    if args.command == "daemon":
+        daemon({"decide": parse_at(args.decide_at), "report": parse_at(args.report_at)}, emit, **kwargs)
+        return 0
+    jobs = ["decide", "report"] if args.command == "all" else [args.command]
+    results = run(jobs=jobs, day=args.date or date.today(), **kwargs)
+    for r in results:
+        emit(r)
+    return 1 if any("error" in r for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
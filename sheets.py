@@ -0,0 +1,366 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from storage import StorageBackend, DateLike, parse_frame, coerce_dtypes, filter_frame, key_cell, keyed_rows
+from perf import bind, span, count
+
+# Google Sheets storage backend, independent of Streamlit: the caller supplies
+# how to open the workbook (data_io from st.secrets, runner.py per site).
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+def authorize(service_account_info: Dict[str, Any]):
+    # gspread and google-auth are only imported once the Sheets backend is used
+    import gspread
+    from google.oauth2.service_account import Credentials
+    creds = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+    with span("gspread.authorize"):
+        return gspread.authorize(creds)
+
+# Seconds a cached worksheet is served without asking the API for new rows,
+# and seconds before it is re-downloaded in full (picks up in-place edits).
+CACHE_TTL_S = 60.0
+CACHE_FULL_RELOAD_S = 900.0
+CACHE_MAX_SHEETS = 16
+CACHE_MAX_CELLS = 2_000_000
+# Threads for per-sheet reads when a batched read is not possible.
+READ_WORKERS = 4
+
+@dataclass
+class _CachedSheet:
+    header: List[str]
+    n_rows: int               # sheet rows below the header, blank ones included
+    frame: pd.DataFrame       # the non-blank rows
+    sheet_rows: np.ndarray    # sheet row number of each frame row
+    loaded: float
+    checked: float
+
+def _non_blank(rows: List[List[Any]], first: int) -> Tuple[List[List[Any]], np.ndarray]:
+    # -> (rows with any value, their sheet row numbers); rows[0] is sheet row first
+    keep = [i for i, r in enumerate(rows) if any(str(v) != "" for v in r)]
+    return [rows[i] for i in keep], np.asarray(keep, dtype=np.int64) + first
+
+def _cleared(row: List[Any]) -> List[Any]:
+    # The Sheets API skips null cells in a ValueRange, so an emptied cell
+    # written in place goes out as "" (and is cached as blank).
+    return ["" if v is None or v is pd.NA or (isinstance(v, float) and v != v) else v for v in row]
+
+class SheetCache:
+    def __init__(self, open_ws: Callable[[str], Any], open_workbook: Callable[[], Any],
+                 ttl_s: float = CACHE_TTL_S, full_reload_s: float = CACHE_FULL_RELOAD_S,
+                 max_sheets: int = CACHE_MAX_SHEETS, max_cells: int = CACHE_MAX_CELLS):
+        self._open_ws = open_ws
+        self._open_workbook = open_workbook
+        self.ttl_s = ttl_s
+        self.full_reload_s = full_reload_s
+        self.max_sheets = max_sheets
+        self.max_cells = max_cells
+        self._entries: "OrderedDict[str, _CachedSheet]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, ws_name: str, refresh: bool = False) -> pd.DataFrame:
+        return self.entry(ws_name, refresh).frame.copy()
+
+    def entry(self, ws_name: str, refresh: bool = False) -> _CachedSheet:
+        # The fresh cache entry itself; its frame is replaced, never mutated.
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(ws_name)
+            if entry is None or refresh or now - entry.loaded > self.full_reload_s:
+                entry = self._load(ws_name, now)
+            elif now - entry.checked > self.ttl_s:
+                self._fetch_tail(ws_name, entry, now)
+            self._entries[ws_name] = entry
+            self._entries.move_to_end(ws_name)
+            self._evict()
+            return entry
+
+    def get_many(self, ws_names: Iterable[str], refresh: bool = False) -> Dict[str, pd.DataFrame]:
+        # Like get() for several worksheets, with every stale one fetched in a
+        # single batched values request.
+        ws_names = list(dict.fromkeys(ws_names))
+        with self._lock:
+            now = time.monotonic()
+            loads, tails = [], []
+            for name in ws_names:
+                entry = self._entries.get(name)
+                if entry is None or refresh or now - entry.loaded > self.full_reload_s or not entry.header:
+                    loads.append(name)
+                elif now - entry.checked > self.ttl_s:
+                    tails.append(name)
+            if loads or tails:
+                self._fetch_batch(loads, tails, now)
+            out = {}
+            for name in ws_names:
+                self._entries.move_to_end(name)
+                out[name] = self._entries[name].frame.copy()
+            self._evict()
+            return out
+
+    def _fetch_batch(self, loads: List[str], tails: List[str], now: float):
+        from gspread.utils import absolute_range_name
+        ranges = [absolute_range_name(n) for n in loads] + \
+                 [absolute_range_name(n, self._tail_range(self._entries[n])) for n in tails]
+        try:
+            with span("gspread.values_batch_get", sheets=len(ranges)):
+                res = self._open_workbook().values_batch_get(ranges)
+            values = [vr.get("values", []) for vr in res.get("valueRanges", [])]
+            if len(values) != len(ranges):
+                raise ValueError("batch read returned %d ranges for %d requested" % (len(values), len(ranges)))
+        except Exception:
+            # e.g. a worksheet that does not exist yet: one call per sheet
+            # (creating missing ones), run concurrently
+            return self._fetch_each(loads, tails, now)
+        for name, vals in zip(loads, values):
+            self._entries[name] = self._from_values(vals, now)
+        for name, vals in zip(tails, values[len(loads):]):
+            self._add_tail(self._entries[name], vals, now)
+
+    def _fetch_each(self, loads: List[str], tails: List[str], now: float):
+        workers = max(1, min(READ_WORKERS, len(loads) + len(tails)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheet-read") as pool:
+            loaded = {n: pool.submit(bind(self._load), n, now) for n in loads}
+            tailed = [pool.submit(bind(self._fetch_tail), n, self._entries[n], now) for n in tails]
+            for n, fut in loaded.items():
+                self._entries[n] = fut.result()
+            for fut in tailed:
+                fut.result()
+
+    @staticmethod
+    def _from_values(vals: List[List[Any]], now: float) -> _CachedSheet:
+        count("gspread.rows_read", max(len(vals) - 1, 0))
+        header = vals[0] if vals else []
+        rows, sheet_rows = _non_blank(vals[1:], 2)
+        return _CachedSheet(header, len(vals[1:]), parse_frame(header, rows), sheet_rows, now, now)
+
+    @staticmethod
+    def _tail_range(entry: _CachedSheet) -> str:
+        # Rows appended after the last known row count (+1 for the header).
+        from gspread.utils import rowcol_to_a1
+        last_col = rowcol_to_a1(1, len(entry.header)).rstrip("0123456789")
+        return f"A{entry.n_rows + 2}:{last_col}"
+
+    @staticmethod
+    def _add_tail(entry: _CachedSheet, new: List[List[Any]], now: float):
+        # new starts at sheet row n_rows + 2; blank rows still count as rows
+        rows, sheet_rows = _non_blank(new, entry.n_rows + 2)
+        count("gspread.rows_read", len(rows))
+        if rows:
+            added = parse_frame(entry.header, rows)
+            entry.frame = coerce_dtypes(pd.concat([entry.frame, added], ignore_index=True))
+            entry.sheet_rows = np.concatenate([entry.sheet_rows, sheet_rows])
+        entry.n_rows += len(new)
+        entry.checked = now
+
+    def _load(self, ws_name: str, now: float) -> _CachedSheet:
+        ws = self._open_ws(ws_name)
+        with span("gspread.get_all_values", ws=ws_name):
+            vals = ws.get_all_values()
+        return self._from_values(vals, now)
+
+    def _fetch_tail(self, ws_name: str, entry: _CachedSheet, now: float):
+        if not entry.header:
+            self._entries[ws_name] = entry = self._load(ws_name, now)
+            return
+        ws = self._open_ws(ws_name)
+        with span("gspread.get_values", ws=ws_name):
+            new = ws.get_values(self._tail_range(entry))
+        self._add_tail(entry, new, now)
+
+    def _evict(self):
+        cells = sum(e.frame.size for e in self._entries.values())
+        while len(self._entries) > 1 and (len(self._entries) > self.max_sheets or cells > self.max_cells):
+            _, old = self._entries.popitem(last=False)
+            cells -= old.frame.size
+
+    def loaded(self, ws_name: str) -> Optional[float]:
+        # when the cached copy was last downloaded in full (None: not cached)
+        with self._lock:
+            entry = self._entries.get(ws_name)
+            return None if entry is None else entry.loaded
+
+    def patch(self, ws_name: str, rows_at: Dict[int, List[Any]]):
+        # Rows rewritten in place on the sheet, by sheet row number.
+        with self._lock:
+            entry = self._entries.get(ws_name)
+            if entry is None:
+                return
+            n = len(entry.frame)
+            at = np.asarray(list(rows_at), dtype=np.int64)
+            pos = np.searchsorted(entry.sheet_rows, at)
+            if not entry.header or (pos >= n).any() or (entry.sheet_rows[np.minimum(pos, n - 1)] != at).any():
+                self._entries.pop(ws_name, None)
+                return
+            take = np.arange(n)
+            take[pos] = n + np.arange(len(rows_at))
+            patched = pd.concat([entry.frame, parse_frame(entry.header, list(rows_at.values()))], ignore_index=True)
+            entry.frame = coerce_dtypes(patched.iloc[take].reset_index(drop=True))
+
+    def expire(self, ws_name: str):
+        with self._lock:
+            entry = self._entries.get(ws_name)
+            if entry is not None:
+                entry.checked = float("-inf")
+
+    def invalidate(self, ws_name: Optional[str] = None):
+        with self._lock:
+            if ws_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ws_name, None)
+
+@dataclass
+class _KeyIndex:
+    loaded: float
+    n_rows: int
+    rows: Dict[Tuple[str, ...], int]  # key -> sheet row number
+
+class GSheetsBackend(StorageBackend):
+    deferred_writes = True
+
+    def __init__(self, open_workbook: Callable[[], Any]):
+        # open_workbook() -> gspread Spreadsheet; called once, on first use
+        self._workbook = None
+        self._workbook_factory = open_workbook
+        self._worksheets: Dict[str, Any] = {}
+        self._ws_lock = threading.RLock()
+        self.cache = SheetCache(self._open_ws, self._open_workbook)
+        self._indexes: Dict[Tuple[str, Tuple[str, ...]], _KeyIndex] = {}
+        self._index_lock = threading.Lock()
+
+    def _open_workbook(self):
+        with self._ws_lock:
+            if self._workbook is None:
+                with span("gspread.open"):
+                    self._workbook = self._workbook_factory()
+            return self._workbook
+
+    def _open_ws(self, name: str):
+        with self._ws_lock:
+            ws = self._worksheets.get(name)
+            if ws is None:
+                wb = self._open_workbook()
+                with span("gspread.worksheet", ws=name):
+                    try:
+                        ws = wb.worksheet(name)
+                    except Exception:
+                        wb.add_worksheet(title=name, rows=1000, cols=50)
+                        ws = wb.worksheet(name)
+                self._worksheets[name] = ws
+            return ws
+
+    def _key_index(self, ws_name: str, key_cols: Tuple[str, ...],
+                   refresh: bool = False) -> Tuple[List[str], _KeyIndex]:
+        # Built from the cached frame and extended with appended rows only;
+        # rebuilt when the cache reloads the sheet in full.
+        entry = self.cache.entry(ws_name, refresh)
+        idx = self._indexes.get((ws_name, key_cols))
+        if idx is None or idx.loaded != entry.loaded or idx.n_rows > len(entry.frame):
+            idx = self._indexes[(ws_name, key_cols)] = _KeyIndex(entry.loaded, 0, {})
+        frame = entry.frame
+        if idx.n_rows < len(frame) and all(c in frame for c in key_cols):
+            tail = frame.iloc[idx.n_rows:]
+            keys = zip(*[map(key_cell, tail[c].tolist()) for c in key_cols])
+            idx.rows.update(zip(keys, entry.sheet_rows[idx.n_rows:].tolist()))
+        idx.n_rows = len(frame)
+        return entry.header, idx
+
+    def upsert_rows(self, ws_name: str, rows: List[List[Any]], key_cols: Sequence[str],
+                    on_conflict: str = "update") -> Tuple[int, int]:
+        key_cols = tuple(key_cols)
+        with self._index_lock:
+            for attempt in range(2):
+                # the second pass re-reads the sheet: rows moved since it was cached
+                header, idx = self._key_index(ws_name, key_cols, refresh=attempt > 0)
+                if not header:
+                    self.append_rows(ws_name, rows)
+                    return 0, len(rows)
+                keyed = keyed_rows(header, rows, key_cols)
+                found = {k: idx.rows[k] for k in keyed if k in idx.rows}
+                if on_conflict != "update" or not found or self._rows_hold(ws_name, header, key_cols, found):
+                    break
+            else:
+                raise RuntimeError(f"{ws_name}: rows changed while upserting; nothing was rewritten")
+            updates = {found[k]: _cleared(r) for k, r in keyed.items() if k in found}
+            new = [r for k, r in keyed.items() if k not in found]
+            if on_conflict == "update" and updates:
+                last_col = self._last_col(header)
+                ws = self._open_ws(ws_name)
+                with span("gspread.batch_update", ws=ws_name, rows=len(updates)):
+                    ws.batch_update([{"range": f"A{n}:{last_col}{n}", "values": [r]} for n, r in updates.items()],
+                                    value_input_option="USER_ENTERED")
+                count("gspread.rows_written", len(updates))
+                self.cache.patch(ws_name, updates)
+            if new:
+                # indexed from the cache tail on the next upsert
+                self.append_rows(ws_name, new)
+        return (len(updates) if on_conflict == "update" else 0), len(new)
+
+    def generation(self, ws_name: str) -> Any:
+        # A full reload may bring in-place edits made elsewhere.
+        return self.cache.loaded(ws_name)
+
+    @staticmethod
+    def _last_col(header: List[str]) -> str:
+        from gspread.utils import rowcol_to_a1
+        return rowcol_to_a1(1, len(header)).rstrip("0123456789")
+
+    def _rows_hold(self, ws_name: str, header: List[str], key_cols: Tuple[str, ...],
+                   found: Dict[Tuple[str, ...], int]) -> bool:
+        # True when every target sheet row still carries the key it is indexed
+        # under (one batched read), so an in-place write cannot land elsewhere.
+        last_col = self._last_col(header)
+        pos = [header.index(c) for c in key_cols]
+        ws = self._open_ws(ws_name)
+        with span("gspread.batch_get", ws=ws_name, rows=len(found)):
+            got = ws.batch_get([f"A{n}:{last_col}{n}" for n in found.values()])
+        for key, vr in zip(found, got):
+            row = (list(vr[0]) if len(vr) else []) + [""] * len(header)
+            if tuple(key_cell(row[i]) for i in pos) != key:
+                return False
+        return True
+
+    def headers(self, ws_name: str) -> List[str]:
+        ws = self._open_ws(ws_name)
+        with span("gspread.row_values", ws=ws_name):
+            return ws.row_values(1)
+
+    def ensure_headers(self, ws_name: str, headers: List[str]):
+        ws = self._open_ws(ws_name)
+        with span("gspread.row_values", ws=ws_name):
+            existing = ws.row_values(1)
+        if not existing:
+            with span("gspread.append_row", ws=ws_name):
+                ws.append_row(headers, value_input_option="USER_ENTERED")
+            self.cache.invalidate(ws_name)
+
+    def append_rows(self, ws_name: str, rows: List[List[Any]]):
+        ws = self._open_ws(ws_name)
+        with span("gspread.append_rows", ws=ws_name, rows=len(rows)):
+            ws.append_rows(rows, value_input_option="USER_ENTERED")
+        count("gspread.rows_written", len(rows))
+        self.cache.expire(ws_name)
+
+    def read(self, ws_name: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+             plots: Optional[Iterable[str]] = None, refresh: bool = False) -> pd.DataFrame:
+        # Sheets has no server-side query, so filters run on the cached frame.
+        df = self.cache.get(ws_name, refresh=refresh)
+        if start is None and end is None and plots is None:
+            return df
+        return filter_frame(df, start, end, plots)
+
+    def read_many(self, ws_names: Iterable[str], start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                  plots: Optional[Iterable[str]] = None, refresh: bool = False) -> Dict[str, pd.DataFrame]:
+        frames = self.cache.get_many(ws_names, refresh=refresh)
+        if start is None and end is None and plots is None:
+            return frames
+        return {n: filter_frame(df, start, end, plots) for n, df in frames.items()}
@@ -0,0 +1,248 @@
+from __future__ import annotations
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import pandas as pd
+
+DateLike = Union[date, str, pd.Timestamp]
+
+def parse_frame(header: List[str], rows: List[List[Any]]) -> pd.DataFrame:
+    width = len(header)
+    rows = [(list(r) + [""] * (width - len(r)))[:width] for r in rows]
+    return coerce_dtypes(pd.DataFrame(rows, columns=header))
+
+def coerce_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # Same spirit as gspread's get_all_records numericise: a column becomes
+    # numeric only if every non-empty cell parses (an all-blank column counts);
+    # blanks then become NaN.
+    for col in df.columns:
+        s = df[col]
+        if col == "date":
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                df[col] = pd.to_datetime(s.replace("", None), errors="coerce")
+            continue
+        if pd.api.types.is_numeric_dtype(s):
+            continue
+        filled = s.notna() & s.ne("")
+        num = pd.to_numeric(s.where(filled), errors="coerce")
+        if num[filled].notna().all():
+            df[col] = num
+    return df
+
+ON_CONFLICT = ("update", "skip")
+
+def key_cell(v: Any) -> str:
+    # One key component as text, the same whether it came from a sheet cell,
+    # a parsed frame (Timestamp, 1.0) or a row about to be written.
+    v = v.item() if hasattr(v, "item") else v
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    if isinstance(v, datetime):
+        v = v.date()
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+def keyed_rows(header: Sequence[str], rows: List[List[Any]],
+               key_cols: Sequence[str]) -> "Dict[Tuple[str, ...], List[Any]]":
+    # key -> row, the last row winning when a batch repeats a key
+    missing = [c for c in key_cols if c not in header]
+    if missing:
+        raise ValueError(f"key column(s) not in worksheet header: {', '.join(missing)}")
+    pos = [list(header).index(c) for c in key_cols]
+    width = len(header)
+    out: Dict[Tuple[str, ...], List[Any]] = {}
+    for r in rows:
+        r = (list(r) + [""] * (width - len(r)))[:width]
+        out[tuple(key_cell(r[i]) for i in pos)] = r
+    return out
+
+def _iso(d: Optional[DateLike]) -> Optional[str]:
+    return None if d is None else pd.Timestamp(d).date().isoformat()
+
+def filter_frame(df: pd.DataFrame, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                 plots: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    if df.empty:
+        return df
+    if "date" in df.columns:
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date"] <= pd.Timestamp(end)]
+    if plots is not None and "plot" in df.columns:
+        df = df[df["plot"].isin(list(plots))]
+    return df.reset_index(drop=True)
+
+# Every data path in data_io goes through one of these. A "worksheet" is a
+# named, append-only table whose first row (headers) defines its columns.
+class StorageBackend(ABC):
+    # True when appends are slow/remote and should go through the write-behind queue
+    deferred_writes = False
+
+    @abstractmethod
+    def headers(self, ws_name: str) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ensure_headers(self, ws_name: str, headers: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_rows(self, ws_name: str, rows: List[List[Any]]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def read(self, ws_name: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+             plots: Optional[Iterable[str]] = None, refresh: bool = False) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def read_many(self, ws_names: Iterable[str], start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                  plots: Optional[Iterable[str]] = None, refresh: bool = False) -> Dict[str, pd.DataFrame]:
+        return {n: self.read(n, start=start, end=end, plots=plots, refresh=refresh) for n in dict.fromkeys(ws_names)}
+
+    @abstractmethod
+    def upsert_rows(self, ws_name: str, rows: List[List[Any]], key_cols: Sequence[str],
+                    on_conflict: str = "update") -> Tuple[int, int]:
+        # Rows whose key already exists are rewritten in place ("update") or
+        # dropped ("skip"); the others are appended. Returns (updated, appended).
+        raise NotImplementedError
+
+    def generation(self, ws_name: str) -> Any:
+        # Changes whenever rows read from ws_name may have been rewritten in
+        # place by someone else (another process, a hand edit); readers that
+        # fold in appended rows only rebuild on a change. Never fetches.
+        return 0
+
+def _cell(v: Any) -> Any:
+    if v == "":
+        return None
+    if isinstance(v, date):
+        return v.isoformat()
+    return v.item() if hasattr(v, "item") else v
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+# bound parameters per statement, under SQLite's default limit (999 before 3.32)
+MAX_SQL_VARS = 500
+
+# Local embedded backend: one SQLite table per worksheet, rows kept in append
+# order by an integer rowid and indexed on (date, plot) when those columns exist.
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+
+    def headers(self, ws_name: str) -> List[str]:
+        with self._lock:
+            info = self._conn.execute(f"PRAGMA table_info({_q(ws_name)})").fetchall()
+        return [r[1] for r in info if r[1] != "_row"]
+
+    def ensure_headers(self, ws_name: str, headers: List[str]):
+        existing = self.headers(ws_name)
+        with self._lock, self._conn:
+            if not existing:
+                cols = ", ".join(_q(h) for h in headers)
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(ws_name)} (_row INTEGER PRIMARY KEY, {cols})")
+            else:
+                for h in headers:
+                    if h not in existing:
+                        self._conn.execute(f"ALTER TABLE {_q(ws_name)} ADD COLUMN {_q(h)}")
+            cols = set(existing) | set(headers)
+            if {"date", "plot"} <= cols:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + ws_name + '_date_plot')} "
+                                   f"ON {_q(ws_name)} (date, plot)")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + ws_name + '_plot_date')} "
+                                   f"ON {_q(ws_name)} (plot, date)")
+
+    def append_rows(self, ws_name: str, rows: List[List[Any]]):
+        if not rows:
+            return
+        headers = self.headers(ws_name)
+        if not headers:
+            self.ensure_headers(ws_name, [f"col{i + 1}" for i in range(max(len(r) for r in rows))])
+            headers = self.headers(ws_name)
+        width = len(headers)
+        rows = [[_cell(v) for v in (list(r) + [None] * (width - len(r)))[:width]] for r in rows]
+        marks = ", ".join("?" * width)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {_q(ws_name)} ({', '.join(_q(h) for h in headers)}) VALUES ({marks})", rows)
+
+    def upsert_rows(self, ws_name: str, rows: List[List[Any]], key_cols: Sequence[str],
+                    on_conflict: str = "update") -> Tuple[int, int]:
+        headers = self.headers(ws_name)
+        if not rows:
+            return 0, 0
+        if not headers:
+            self.append_rows(ws_name, rows)
+            return 0, len(rows)
+        keyed = keyed_rows(headers, rows, key_cols)
+        # Existing rows are looked up through the (date, plot) index: only the
+        # dates in this batch are read, MAX_SQL_VARS dates per query.
+        sql = f"SELECT _row, {', '.join(_q(c) for c in key_cols)} FROM {_q(ws_name)}"
+        if "date" in key_cols:
+            dates = sorted({k[list(key_cols).index("date")] for k in keyed})
+            chunks = [dates[i:i + MAX_SQL_VARS] for i in range(0, len(dates), MAX_SQL_VARS)]
+        else:
+            chunks = [None]
+        found: Dict[Tuple[str, ...], int] = {}
+        with self._lock:
+            for chunk in chunks:
+                q = sql if chunk is None else sql + f" WHERE date IN ({', '.join('?' * len(chunk))})"
+                # ORDER BY _row: the last row wins for a key the sheet repeats
+                for r in self._conn.execute(q + " ORDER BY _row", chunk or []):
+                    found[tuple(key_cell(v) for v in r[1:])] = r[0]
+        updates = [(found[k], r) for k, r in keyed.items() if k in found]
+        new = [r for k, r in keyed.items() if k not in found]
+        if on_conflict == "update" and updates:
+            sets = ", ".join(f"{_q(h)} = ?" for h in headers)
+            with self._lock, self._conn:
+                self._conn.executemany(f"UPDATE {_q(ws_name)} SET {sets} WHERE _row = ?",
+                                       [[_cell(v) for v in r] + [rid] for rid, r in updates])
+        self.append_rows(ws_name, new)
+        return (len(updates) if on_conflict == "update" else 0), len(new)
+
+    def generation(self, ws_name: str) -> Any:
+        # bumped by SQLite when another connection commits to the file
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def read(self, ws_name: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+             plots: Optional[Iterable[str]] = None, refresh: bool = False) -> pd.DataFrame:
+        headers = self.headers(ws_name)
+        if not headers:
+            return pd.DataFrame()
+        where, args = [], []
+        if "date" in headers:
+            if start is not None:
+                where.append("date >= ?")
+                args.append(_iso(start))
+            if end is not None:
+                where.append("date <= ?")
+                args.append(_iso(end))
+        many = False
+        if plots is not None and "plot" in headers:
+            plots = list(plots)
+            # too many to bind: filtered after reading instead
+            many = len(plots) > MAX_SQL_VARS
+            if not many:
+                where.append(f"plot IN ({', '.join('?' * len(plots))})")
+                args.extend(plots)
+        sql = f"SELECT {', '.join(_q(h) for h in headers)} FROM {_q(ws_name)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY _row"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        df = parse_frame(headers, [list(r) for r in rows])
+        return filter_frame(df, plots=plots) if many else df
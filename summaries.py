@@ -0,0 +1,144 @@
+from __future__ import annotations
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from perf import span
+
+# Per-(day, plot) and per-(week, plot) aggregates of the decisions, daily inputs
+# and plant-height sheets. update() folds in only the rows past the last seen
+# row count; a shorter sheet, a changed last-seen row or a new generation
+# (data_io.sheet_generation: rows upserted in place here, or a full re-read
+# of the sheet that may carry edits made elsewhere) rebuilds that source.
+
+DateLike = Optional[date]
+
+def _prepare(df: pd.DataFrame, cols: Iterable[str]) -> pd.DataFrame:
+    out = pd.DataFrame({"date": pd.to_datetime(df["date"], errors="coerce").dt.normalize(),
+                        "plot": df["plot"].astype(str).str.strip()})
+    for c in cols:
+        out[c] = pd.to_numeric(df[c], errors="coerce") if c in df else np.nan
+    return out[out["date"].notna() & out["plot"].ne("")]
+
+def _decision_part(df: pd.DataFrame) -> pd.DataFrame:
+    d = _prepare(df, ["irr_L", "irr_mm"])
+    return pd.DataFrame({"date": d["date"], "plot": d["plot"], "irr_L": d["irr_L"].fillna(0.0),
+                         "irr_mm": d["irr_mm"].fillna(0.0), "n_decisions": 1})
+
+def _input_part(df: pd.DataFrame) -> pd.DataFrame:
+    d = _prepare(df, ["ndvi", "theta_vwc"])
+    return pd.DataFrame({"date": d["date"], "plot": d["plot"],
+                         "ndvi_sum": d["ndvi"].fillna(0.0), "n_ndvi": d["ndvi"].notna().astype(np.int64),
+                         "theta_sum": d["theta_vwc"].fillna(0.0), "n_theta": d["theta_vwc"].notna().astype(np.int64)})
+
+def _height_part(df: pd.DataFrame) -> pd.DataFrame:
+    d = _prepare(df, ["height_cm"])
+    h = d["height_cm"]
+    return pd.DataFrame({"date": d["date"], "plot": d["plot"], "height_sum": h.fillna(0.0),
+                         "n_heights": h.notna().astype(np.int64), "height_min": h, "height_max": h})
+
+# source -> (row reducer, aggregation per column)
+SOURCES: Dict[str, Tuple[Callable[[pd.DataFrame], pd.DataFrame], Dict[str, str]]] = {
+    "decisions": (_decision_part, {"irr_L": "sum", "irr_mm": "sum", "n_decisions": "sum"}),
+    "inputs": (_input_part, {"ndvi_sum": "sum", "n_ndvi": "sum", "theta_sum": "sum", "n_theta": "sum"}),
+    "heights": (_height_part, {"height_sum": "sum", "n_heights": "sum", "height_min": "min", "height_max": "max"}),
+}
+SUM_COLUMNS = [c for _, agg in SOURCES.values() for c, how in agg.items() if how == "sum"]
+
+def week_start(dates: pd.Series) -> pd.Series:
+    # Monday of the week
+    return dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+
+def _fold(table: Optional[pd.DataFrame], part: pd.DataFrame, keys, agg: Dict[str, str]) -> pd.DataFrame:
+    part = part.groupby(keys, sort=False).agg(agg)
+    if table is None or table.empty:
+        return part
+    return pd.concat([table, part]).groupby(level=list(range(len(keys))), sort=False).agg(agg)
+
+def _means(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["ndvi_mean"] = df["ndvi_sum"] / df["n_ndvi"].where(df["n_ndvi"] > 0)
+    df["theta_mean"] = df["theta_sum"] / df["n_theta"].where(df["n_theta"] > 0)
+    df["height_mean"] = df["height_sum"] / df["n_heights"].where(df["n_heights"] > 0)
+    return df.drop(columns=["ndvi_sum", "theta_sum", "height_sum"])
+
+class SummaryStore:
+    def __init__(self):
+        self._seen: Dict[str, Tuple[int, int, Any]] = {}
+        self._daily: Dict[str, pd.DataFrame] = {}
+        self._weekly: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row_hash(df: pd.DataFrame, i: int) -> int:
+        return hash(tuple(map(str, df.iloc[i].tolist())))
+
+    def update(self, decisions: Optional[pd.DataFrame] = None, inputs: Optional[pd.DataFrame] = None,
+               heights: Optional[pd.DataFrame] = None,
+               generations: Optional[Dict[str, Any]] = None) -> "SummaryStore":
+        # Each frame is the whole sheet as returned by read_sheet(ws).
+        generations = generations or {}
+        with self._lock:
+            for name, df in (("decisions", decisions), ("inputs", inputs), ("heights", heights)):
+                if df is not None:
+                    self._update_source(name, df, generations.get(name, 0))
+        return self
+
+    def _update_source(self, name: str, df: pd.DataFrame, generation: Any):
+        n, tail, gen = self._seen.get(name, (0, 0, 0))
+        if df.empty or "date" not in df or "plot" not in df:
+            if n:
+                self._reset(name)
+            return
+        if len(df) < n or gen != generation or (n and self._row_hash(df, n - 1) != tail):
+            self._reset(name)
+            n = 0
+        if len(df) == n:
+            return
+        reduce, agg = SOURCES[name]
+        with span("summaries.fold", source=name, rows=len(df) - n):
+            part = reduce(df.iloc[n:])
+            if not part.empty:
+                self._daily[name] = _fold(self._daily.get(name), part, ["date", "plot"], agg)
+                part = part.assign(date=week_start(part["date"])).rename(columns={"date": "week"})
+                self._weekly[name] = _fold(self._weekly.get(name), part, ["week", "plot"], agg)
+        self._seen[name] = (len(df), self._row_hash(df, len(df) - 1), generation)
+
+    def _reset(self, name: str):
+        self._seen.pop(name, None)
+        self._daily.pop(name, None)
+        self._weekly.pop(name, None)
+
+    def _table(self, tables: Dict[str, pd.DataFrame], key: str, start: DateLike, end: DateLike,
+               plots: Optional[Iterable[str]]) -> pd.DataFrame:
+        cols = [key, "plot"] + [c for _, agg in SOURCES.values() for c in agg]
+        with self._lock:
+            parts = [t for t in tables.values() if not t.empty]
+            df = pd.concat(parts, axis=1).reset_index() if parts else pd.DataFrame(columns=cols)
+        df = df.reindex(columns=cols).astype({c: float for c in cols[2:]})
+        if start is not None:
+            df = df[df[key] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[key] <= pd.Timestamp(end)]
+        if plots is not None:
+            df = df[df["plot"].isin(list(plots))]
+        for col in SUM_COLUMNS:
+            df[col] = df[col].fillna(0).astype(np.int64) if col.startswith("n_") else df[col].fillna(0.0)
+        return df.sort_values([key, "plot"]).reset_index(drop=True)
+
+    def daily(self, start: DateLike = None, end: DateLike = None,
+              plots: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        return _means(self._table(self._daily, "date", start, end, plots))
+
+    def weekly(self, start: DateLike = None, end: DateLike = None,
+               plots: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        # start/end compare against the Monday that labels each week
+        return _means(self._table(self._weekly, "week", start, end, plots))
+
+    def plot_totals(self, start: DateLike = None, end: DateLike = None,
+                    plots: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        # One row per plot over [start, end], rolled up from the daily table.
+        d = self._table(self._daily, "date", start, end, plots)
+        agg = {c: how for _, a in SOURCES.values() for c, how in a.items()}
+        return _means(d.groupby("plot", as_index=False).agg(agg))
@@ -0,0 +1,49 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import downsample, lttb
+
+def naive_lttb(x, y, n_out):
+    # Steinarsson's reference loop
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    out, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1
+        nlo, nhi = hi, min(int(math.floor((i + 2) * every)) + 1, n)
+        ax, ay = sum(x[nlo:nhi]) / (nhi - nlo), sum(y[nlo:nhi]) / (nhi - nlo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - ax) * (y[j] - y[a]) - (x[a] - x[j]) * (ay - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    return out + [n - 1]
+
+@pytest.mark.parametrize("n,n_out", [(1000, 50), (997, 600), (100, 3), (5000, 120)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = rng.normal(size=n).cumsum()
+    idx = lttb(x, y, n_out)
+    assert len(idx) == n_out and idx[0] == 0 and idx[-1] == n - 1
+    assert np.all(np.diff(idx) > 0)
+    assert idx.tolist() == naive_lttb(x.tolist(), y.tolist(), n_out)
+
+def test_lttb_short_series_unchanged():
+    x = np.arange(10.0)
+    assert lttb(x, x, 20).tolist() == list(range(10))
+
+def test_downsample_keeps_range_and_rows():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"date": pd.date_range("2025-11-06", periods=3000, freq="h"),
+                       "v": rng.normal(size=3000).cumsum()})
+    out = downsample(df, "v", 200)
+    assert len(out) == 200
+    assert out["date"].iloc[0] == df["date"].iloc[0] and out["date"].iloc[-1] == df["date"].iloc[-1]
+    assert out["date"].is_monotonic_increasing
+    assert out.equals(df.loc[out.index])
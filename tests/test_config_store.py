@@ -0,0 +1,71 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from config_store import ConfigHistory, METADATA_HEADERS
+from logic import Config
+
+BASE = Config(transplant_date=date(2025, 11, 6))
+
+def sheet(*rows):
+    return pd.DataFrame([list(r) for r in rows], columns=METADATA_HEADERS)
+
+@pytest.fixture
+def history():
+    return ConfigHistory.from_frame(sheet(
+        ("eta", 0.8, "2025-11-01"), ("alpha", 0.5, "2025-11-01"),
+        ("eta", 0.9, "2025-11-10"),
+        ("note", "ignored", "2025-11-15"),
+    ), BASE)
+
+def test_as_of_bisects_version_dates(history):
+    assert history.as_of(date(2025, 10, 31)) is BASE
+    assert history.as_of(date(2025, 11, 1)).efficiency == 0.8
+    assert history.as_of(date(2025, 11, 9)).soil.alpha == 0.5
+    c = history.as_of(date(2025, 11, 10))
+    assert (c.efficiency, c.soil.alpha) == (0.9, 0.5)
+    assert history.as_of(date(2026, 1, 1)) is c is history.latest()
+    assert len(history) == 2
+
+def test_same_day_saves_collapse_and_no_op_saves_drop(history):
+    df = sheet(("eta", 0.8, "2025-11-01"), ("alpha", 0.5, "2025-11-01"), ("eta", 0.9, "2025-11-10"),
+               ("note", "ignored", "2025-11-15"),
+               ("eta", 0.7, "2025-11-20 09:00"), ("eta", 0.75, "2025-11-20 17:00"),
+               ("alpha", 0.5, "2025-11-25"))
+    history.sync(df)
+    assert [d for d, _ in history.versions()] == [date(2025, 11, 1), date(2025, 11, 10), date(2025, 11, 20)]
+    assert history.as_of(date(2025, 11, 30)).efficiency == 0.75
+
+def test_backdated_save_rebuilds_in_date_order(history):
+    history.sync(sheet(("eta", 0.8, "2025-11-01"), ("alpha", 0.5, "2025-11-01"), ("eta", 0.9, "2025-11-10"),
+                       ("note", "ignored", "2025-11-15"),
+                       ("alpha", 0.7, "2025-11-05")))
+    assert [d for d, _ in history.versions()] == [date(2025, 11, 1), date(2025, 11, 5), date(2025, 11, 10)]
+    assert history.as_of(date(2025, 11, 5)).soil.alpha == 0.7
+    # the 11-10 save only set eta: alpha from the backdated save carries on
+    c = history.as_of(date(2025, 11, 10))
+    assert (c.efficiency, c.soil.alpha) == (0.9, 0.7)
+
+def test_backdated_save_over_a_dropped_no_op(history):
+    # 11-10 re-sets alpha to what it already was; a backdated 11-05 change
+    # makes that save meaningful again
+    df = sheet(("eta", 0.8, "2025-11-01"), ("alpha", 0.5, "2025-11-01"),
+               ("eta", 0.9, "2025-11-10"), ("alpha", 0.5, "2025-11-10"))
+    h = ConfigHistory.from_frame(df, BASE)
+    h.sync(pd.concat([df, sheet(("alpha", 0.7, "2025-11-05"))], ignore_index=True))
+    assert h.as_of(date(2025, 11, 5)).soil.alpha == 0.7
+    assert h.as_of(date(2025, 11, 10)).soil.alpha == 0.5
+
+def test_sync_only_indexes_new_rows(history, monkeypatch):
+    df = sheet(("eta", 0.8, "2025-11-01"), ("alpha", 0.5, "2025-11-01"), ("eta", 0.9, "2025-11-10"),
+               ("note", "ignored", "2025-11-15"))
+    assert history.n_rows == 4
+    seen = []
+    extend = ConfigHistory.extend
+    monkeypatch.setattr(ConfigHistory, "extend", lambda self, rows: (seen.append(len(rows)), extend(self, rows)))
+    history.sync(df)
+    assert seen == []
+    history.sync(pd.concat([df, sheet(("rain_skip", 5, "2025-12-01"))], ignore_index=True))
+    assert seen == [1] and history.n_rows == 5
+    assert history.latest().rain_skip_mm == 5.0
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import pytest
+
+from dr_store import DrLedger
+
+D0 = date(2025, 12, 1)
+
+def day(i: int) -> date:
+    return D0 + timedelta(days=i)
+
+def balance(etc):
+    # step for a plain water balance: Dr grows by the day's ETc, None where no inputs are stored
+    def step(d, Dr_start):
+        e = etc.get(d)
+        return None if e is None else Dr_start + e
+    return step
+
+@pytest.fixture
+def ledger():
+    # days 0..3 recorded with 2 mm/day; day 2 had no stored inputs and gained 5 mm
+    led = DrLedger()
+    for i, (start, end) in enumerate([(0.0, 2.0), (2.0, 4.0), (4.0, 9.0), (9.0, 11.0)]):
+        led.set("P1", day(i), start, end)
+    led._pending = []
+    return led
+
+def test_recompute_carries_new_start_across_day_without_inputs(ledger):
+    # day 1 re-run from a new start: day 2 (no inputs) keeps its +5 mm change,
+    # day 3 is re-run from there
+    ledger.set("P1", day(0), 0.0, 0.0)
+    n = ledger.recompute("P1", day(1), balance({day(1): 2.0, day(3): 2.0}))
+    assert n == 3
+    assert [ledger.get("P1", day(i)) for i in range(4)] == [(0.0, 0.0), (0.0, 2.0), (2.0, 7.0), (7.0, 9.0)]
+    # every stored day starts where the previous one ended
+    for i in range(1, 4):
+        assert ledger.get("P1", day(i))[0] == ledger.get("P1", day(i - 1))[1]
+    assert [r[1] for r in ledger.pending_rows()] == [day(i).isoformat() for i in range(4)]
+
+def test_recompute_day_without_inputs_never_goes_negative(ledger):
+    ledger.set("P1", day(1), 0.0, 0.0)     # irrigated: Dr back to 0
+    ledger._vals[("P1", day(2))] = (4.0, 0.0)  # stored day 2 also irrigated
+    ledger.recompute("P1", day(2), balance({day(3): 2.0}))
+    assert ledger.get("P1", day(2)) == (0.0, 0.0)
+    assert ledger.get("P1", day(3)) == (0.0, 2.0)
+
+def test_recompute_stops_at_first_unchanged_day(ledger):
+    calls = []
+
+    def step(d, Dr_start):
+        calls.append(d)
+        return balance({day(0): 2.0, day(1): 2.0, day(3): 2.0})(d, Dr_start)
+
+    # day 0 comes out as stored: nothing after it can change
+    assert ledger.recompute("P1", day(0), step) == 1
+    assert calls == [day(0)]
+    assert ledger.pending_rows() == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eto import EToCache, Site, daily_eto, fao56_daily, record_interval, station_frame
+
+SITE = Site(lat_deg=36.55, elev_m=119.0, lon_deg=139.87, utc_offset_h=9.0)
+
+def test_fao56_daily_example_18():
+    # FAO-56 example 18: Brussels, 6 July, 50°48'N, 100 m; wind 10 km/h at 10 m -> 3.9 mm/day
+    df = station_frame(pd.DataFrame({"date": ["2026-07-06"], "t_max": [21.5], "t_min": [12.3],
+                                     "rh_max": [84.0], "rh_min": [63.0], "wind_ms": [10 / 3.6],
+                                     "sunshine_h": [9.25]}))
+    eto = fao56_daily(df, Site(lat_deg=50.8, elev_m=100.0, wind_height_m=10.0))
+    assert eto.iloc[0] == pytest.approx(3.9, abs=0.05)
+
+def station(freq: str, days: int = 3) -> pd.DataFrame:
+    # smooth synthetic summer days, the same weather whatever the logging interval
+    ts = pd.date_range("2026-07-01", periods=days * pd.Timedelta("1D") // pd.Timedelta(freq), freq=freq)
+    h = (ts.hour + ts.minute / 60).to_numpy()
+    sun = np.clip(np.sin((h - 6) / 12 * np.pi), 0, None)
+    return pd.DataFrame({"timestamp": ts, "t_air": 22 + 6 * np.sin((h - 9) / 24 * 2 * np.pi),
+                         "rh": 70.0, "wind_ms": 2.0, "rs_wm2": 800 * sun})
+
+def test_record_interval():
+    assert record_interval(station("10min")["timestamp"]) == pd.Timedelta("10min")
+    assert record_interval(station("1D")["timestamp"]) == pd.Timedelta("1D")
+    assert record_interval(station("1D", 1)["timestamp"]) is None
+
+@pytest.mark.parametrize("freq", ["30min", "10min"])
+def test_sub_hourly_records_match_hourly(freq):
+    hourly = daily_eto(station("1h"), SITE)
+    sub = daily_eto(station(freq), SITE)
+    assert list(sub.index) == list(hourly.index)
+    np.testing.assert_allclose(sub.to_numpy(), hourly.to_numpy(), rtol=0.02)
+
+def test_hours_with_too_few_records_leave_the_day_out():
+    df = station("10min")
+    df = df[~((df["timestamp"].dt.day == 2) & (df["timestamp"].dt.hour == 3))]
+    assert [d.day for d in daily_eto(df, SITE).index] == [1, 3]
+
+def test_intervals_between_hour_and_day_rejected():
+    with pytest.raises(ValueError):
+        daily_eto(station("3h"), SITE)
+
+def test_repeated_timestamps_count_once():
+    df = station("1h")
+    once = daily_eto(df, SITE)
+    # the same export uploaded twice, and an overlapping one with corrected values
+    assert daily_eto(pd.concat([df, df]), SITE).equals(once)
+    fixed = df[df["timestamp"].dt.day == 2].assign(t_air=30.0)
+    twice = daily_eto(pd.concat([df, fixed]), SITE)
+    assert twice.iloc[0] == once.iloc[0] and twice.iloc[2] == once.iloc[2]
+    assert twice.iloc[1] == daily_eto(pd.concat([df[df["timestamp"].dt.day != 2], fixed]), SITE).iloc[1]
+
+def test_cache_sees_overlapping_upload():
+    df = station("1h")
+    cache = EToCache(SITE).update(df)
+    assert cache.update(pd.concat([df, df])).series().equals(daily_eto(df, SITE))
+    fixed = df[df["timestamp"].dt.day == 2].assign(t_air=30.0)
+    assert cache.update(pd.concat([df, fixed])).series().equals(daily_eto(pd.concat([df, fixed]), SITE))
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+import data_io
+from ingest import DailyAggregator, aggregate_files, ingest
+from replay import DAILY_INPUT_HEADERS
+
+def logger_frame():
+    # every 6 h for three days, two plots; readings drift so each day differs
+    ts = pd.date_range("2025-12-01", periods=12, freq="6h")
+    rows = []
+    for i, t in enumerate(ts):
+        for j, plot in enumerate(["P1", "P2"]):
+            rows.append(dict(timestamp=t.isoformat(), plot=plot, vwc=0.20 + 0.01 * i + 0.05 * j,
+                             ndvi=0.30 + 0.02 * i))
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "logger.csv"
+    logger_frame().to_csv(path, index=False)
+    return path
+
+def test_chunk_boundaries_do_not_change_daily_means(csv):
+    whole = aggregate_files([csv]).result()
+    for chunk_rows in (1, 5, 7):
+        pd.testing.assert_frame_equal(aggregate_files([csv], chunk_rows=chunk_rows).result(), whole)
+    df = logger_frame()
+    expect = df.assign(date=pd.to_datetime(df["timestamp"]).dt.normalize()) \
+               .groupby(["date", "plot"], as_index=False).agg(theta_vwc=("vwc", "mean"), ndvi=("ndvi", "mean"))
+    assert whole["theta_vwc"].tolist() == expect["theta_vwc"].round(3).tolist()
+    assert whole["ndvi"].tolist() == expect["ndvi"].round(2).tolist()
+    assert (whole["n_theta_vwc"] == 4).all()
+
+def test_out_of_range_readings_are_rejected():
+    agg = DailyAggregator()
+    agg.add(pd.DataFrame(dict(timestamp=["2025-12-01 06:00", "2025-12-01 12:00", "2025-12-01 18:00"],
+                              plot=["P1", "P1", "P1"], theta=[0.25, 0.75, "bad"], ndvi=[0.5, 1.5, -0.2])))
+    out = agg.result()
+    assert (agg.readings, agg.rejected) == (3, 2)
+    assert out[["theta_vwc", "n_theta_vwc", "ndvi", "n_ndvi"]].values.tolist() == [[0.25, 1, 0.15, 2]]
+
+def test_unknown_plots_are_counted_not_aggregated():
+    agg = DailyAggregator(plots=["P1"])
+    agg.add(pd.DataFrame(dict(time=["2025-12-01 06:00"] * 2, plot_id=["P1", "X9"], ndvi=[0.5, 0.6])))
+    assert agg.unknown_plots == {"X9"} and agg.result()["plot"].tolist() == ["P1"]
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("IRRIGATION_STORAGE", f"sqlite:{tmp_path / 'store.db'}")
+    data_io._backend.clear()
+    data_io.ensure_headers("daily_inputs", DAILY_INPUT_HEADERS)
+    yield
+    data_io._backend.clear()
+
+def test_reingesting_a_file_writes_nothing(csv, local_store):
+    first = ingest([csv], "daily_inputs", chunk_rows=5)
+    assert (first["plot_days"], first["written"], first["skipped_existing"]) == (6, 6, 0)
+    second = ingest([csv], "daily_inputs", chunk_rows=5)
+    assert (second["written"], second["skipped_existing"]) == (0, 6)
+    assert len(data_io.read_sheet("daily_inputs")) == 6
@@ -0,0 +1,55 @@
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from logic import Config, decide, decide_batch
+
+CFG = Config(transplant_date=date(2025, 11, 6))
+# stage and RAW-factor boundaries fall between these days after transplant
+EDGE_DAT = (20, 21, 45, 46)
+
+# -- decide_batch == decide_T2 / decide_T3 / decide_T4_strict ----------------
+def random_rows(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dat = np.where(rng.random(n) < 0.3, rng.choice(EDGE_DAT, n), rng.integers(-3, 90, n))
+    return pd.DataFrame({
+        "date": [CFG.transplant_date + timedelta(days=int(d)) for d in dat],
+        "ETo": rng.uniform(0, 8, n),
+        "rain_obs": np.where(rng.random(n) < 0.5, 0.0, rng.uniform(0, 10, n)),
+        "rain_fcst": rng.choice([0.0, 1.0, 2.0, 5.0], n),
+        "theta": np.where(rng.random(n) < 0.25, np.nan, rng.uniform(0.05, 0.35, n)),
+        "ndvi": np.where(rng.random(n) < 0.25, np.nan, rng.uniform(0, 1, n)),
+        "Dr_start": rng.uniform(0, 60, n),
+        "treatment": rng.choice(["T1", "T2", "T3", "T4"], n),
+    })
+
+def _opt(v):
+    return None if pd.isna(v) else float(v)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_decide_batch_matches_scalar(seed):
+    rows = random_rows(2000, seed)
+    out = decide_batch(rows, CFG)
+    assert len(out) == len(rows)
+    for r, o in zip(rows.to_dict("records"), out.to_dict("records")):
+        s = decide(r["treatment"], r["date"], r["ETo"], r["rain_obs"], r["rain_fcst"],
+                   _opt(r["theta"]), _opt(r["ndvi"]), r["Dr_start"], CFG)
+        if s is None:
+            assert o["decision"] == "Manual"
+            continue
+        for k, v in s.items():
+            if k == "gates":
+                assert {g: bool(o["gate_" + g]) for g in v} == v
+            elif v is None:
+                assert pd.isna(o[k]), (r["treatment"], k, o[k])
+            elif isinstance(v, str):
+                assert o[k] == v, (r["treatment"], k, o[k], v)
+            else:
+                assert math.isclose(o[k], v, rel_tol=1e-12, abs_tol=1e-12), (r["treatment"], k, o[k], v)
+
+def test_edge_days_covered():
+    dat = (pd.to_datetime(random_rows(2000, 0)["date"]) - pd.Timestamp(CFG.transplant_date)).dt.days
+    assert set(EDGE_DAT) <= set(dat)
@@ -0,0 +1,13 @@
+from datetime import date
+
+from logic import Config
+from plot_registry import PlotRegistry, PlotSpec
+
+def test_config_for_applies_overrides():
+    cfg = Config(transplant_date=date(2025, 11, 6))
+    reg = PlotRegistry([PlotSpec("P1", "T2", area_m2=4.0, theta_fc=0.35, alpha=0.5), PlotSpec("P2", "T3")])
+    c1 = reg.config_for("P1", cfg)
+    assert (c1.area_m2, c1.soil.theta_fc, c1.soil.alpha) == (4.0, 0.35, 0.5)
+    assert c1.soil.theta_wp == cfg.soil.theta_wp and c1.ndvi2kc == cfg.ndvi2kc
+    assert reg.config_for("P2", cfg) is cfg
+    assert reg.config_for("P1", cfg) is c1   # memoised per (cfg, overrides)
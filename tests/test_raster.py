@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from raster import HIST_BINS, LabelZones, PolygonZones, zonal_ndvi
+
+ROWS, COLS = 40, 30
+NODATA = 0
+
+@pytest.fixture
+def bands():
+    rng = np.random.default_rng(7)
+    red = rng.integers(200, 3000, size=(ROWS, COLS)).astype(np.uint16)
+    nir = rng.integers(200, 6000, size=(ROWS, COLS)).astype(np.uint16)
+    red[5, 5] = NODATA      # inside P1, dropped as nodata
+    return red, nir
+
+def masks():
+    r, c = np.mgrid[0:ROWS, 0:COLS]
+    # pixel centres (c + 0.5, r + 0.5) strictly inside each polygon
+    triangle = (c >= 2) & (r >= 2) & (c + r + 1 < 24)
+    frame = (c >= 20) & (c < 28) & (r >= 10) & (r < 35) & ~((c >= 22) & (c < 26) & (r >= 20) & (r < 25))
+    return dict(P1=triangle, P2=frame)
+
+POLYGONS = {
+    "P1": [[(2, 2), (22, 2), (2, 22)]],
+    # a ring with a hole: rings combine even-odd
+    "P2": [[(20, 10), (28, 10), (28, 35), (20, 35)], [(22, 20), (26, 20), (26, 25), (22, 25)]],
+    "P3": [[(100, 100), (110, 100), (110, 110)]],   # off the image
+}
+
+def direct(red, nir, mask):
+    r, v = red[mask].astype(float), nir[mask].astype(float)
+    ok = (r + v > 0) & (r != NODATA) & (v != NODATA)
+    return np.clip((v[ok] - r[ok]) / (v[ok] + r[ok]), -1, 1), int(mask.sum())
+
+def check(stats, red, nir):
+    tol = 2.0 / HIST_BINS   # percentiles to one histogram bin
+    for plot, mask in masks().items():
+        row = stats.set_index("plot").loc[plot]
+        ndvi, n = direct(red, nir, mask)
+        assert row["n_pixels"] == n and row["valid_frac"] == pytest.approx(len(ndvi) / n)
+        assert row["ndvi"] == pytest.approx(ndvi.mean(), abs=1e-6)
+        for q in (10, 50, 90):
+            assert row[f"ndvi_p{q}"] == pytest.approx(np.percentile(ndvi, q, method="inverted_cdf"), abs=tol)
+
+def test_polygon_zonal_stats_match_numpy(bands):
+    red, nir = bands
+    # small blocks: polygons span several row blocks
+    stats = zonal_ndvi(red, nir, PolygonZones(POLYGONS), nodata=NODATA, block_pixels=7 * COLS)
+    check(stats, red, nir)
+    p3 = stats.set_index("plot").loc["P3"]
+    assert p3["n_pixels"] == 0 and np.isnan(p3["ndvi"])
+
+def test_map_coordinates_with_geotransform(bands):
+    red, nir = bands
+    x0, y0, px = 500.0, 80.0, 0.5
+    to_map = {p: [[(x0 + x * px, y0 - y * px) for x, y in ring] for ring in rings] for p, rings in POLYGONS.items()}
+    stats = zonal_ndvi(red, nir, PolygonZones(to_map, (x0, px, 0.0, y0, 0.0, -px)), nodata=NODATA)
+    check(stats, red, nir)
+
+def test_label_zones_agree_with_polygons(bands):
+    red, nir = bands
+    labels = np.zeros((ROWS, COLS), dtype=np.int32)
+    for i, mask in enumerate(masks().values(), start=1):
+        labels[mask] = i
+    stats = zonal_ndvi(red, nir, LabelZones(labels, {1: "P1", 2: "P2"}), nodata=NODATA, block_pixels=100)
+    check(stats, red, nir)
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+import pytest
+
+from runner import Clients, Limits, SiteConfig, decide_site
+
+D0 = date(2025, 12, 1)
+GSHEETS = dict(daily_inputs_ws="daily_inputs", decisions_ws="decisions", plant_ws="plant_heights",
+               metadata_ws="metadata")
+
+def day(i):
+    return D0 + timedelta(days=i)
+
+def inputs(i, theta=0.30, eto=4.0):
+    return [day(i).isoformat(), "P1", theta, 0.0, 0.0, 0.6, eto, ""]
+
+@pytest.fixture
+def site(tmp_path):
+    s = SiteConfig("test", GSHEETS, storage=f"sqlite:{tmp_path / 'site.db'}")
+    backend = Clients(None).backend(s)
+    backend.append_rows("plots", [["P1", "T2", "", "", "", "", 1, "2025-11-01"]])
+    backend.append_rows("daily_inputs", [inputs(i) for i in range(4)])
+    return s, backend
+
+def decisions(backend):
+    df = backend.read("decisions").sort_values("date")
+    return {d.date(): dr for d, dr in zip(df["date"], df["Dr"])}
+
+def test_decide_carries_changed_dr_through_decided_days_only(site):
+    s, backend = site
+    for i in range(3):
+        decide_site(s, backend, Limits(), day(i))
+    before = decisions(backend)
+    assert sorted(before) == [day(0), day(1), day(2)]
+    # day 0's inputs change: days 1 and 2 are re-run, day 3 (never decided) is not written
+    backend.upsert_rows("daily_inputs", [inputs(0, eto=8.0)], ("date", "plot"))
+    res = decide_site(s, backend, Limits(), day(0))
+    assert (res["decisions"], res["recomputed"]) == (1, 2)
+    after = decisions(backend)
+    assert sorted(after) == [day(0), day(1), day(2)]
+    assert after[day(1)] > before[day(1)] and after[day(2)] > before[day(2)]
+    # same as deciding the days again in order
+    for i in range(1, 3):
+        decide_site(s, backend, Limits(), day(i))
+    assert decisions(backend) == after
+
+def test_decide_unchanged_day_rewrites_nothing_later(site):
+    s, backend = site
+    for i in range(3):
+        decide_site(s, backend, Limits(), day(i))
+    res = decide_site(s, backend, Limits(), day(0))
+    assert res["recomputed"] == 0
@@ -0,0 +1,100 @@
+import re
+
+import pytest
+
+from sheets import GSheetsBackend
+
+def _row_number(a1: str) -> int:
+    return int(re.match(r"[A-Z]+(\d+)", a1).group(1))
+
+class FakeWorksheet:
+    # the gspread calls GSheetsBackend makes, over a list of rows (row 1 = headers)
+    def __init__(self):
+        self.grid = []
+
+    @staticmethod
+    def _trim(rows):
+        while rows and not any(str(v) for v in rows[-1]):
+            rows = rows[:-1]
+        return [list(r) for r in rows]
+
+    def row_values(self, i):
+        return list(self.grid[i - 1]) if len(self.grid) >= i else []
+
+    def append_row(self, row, **kw):
+        self.append_rows([row])
+
+    def append_rows(self, rows, **kw):
+        self.grid = self._trim(self.grid) + [list(r) for r in rows]
+
+    def get_all_values(self):
+        return self._trim(self.grid)
+
+    def get_values(self, rng):
+        return self._trim(self.grid[_row_number(rng) - 1:])
+
+    def batch_update(self, updates, **kw):
+        # like the API: a null cell in a ValueRange leaves the cell as it was
+        for u in updates:
+            n = _row_number(u["range"])
+            self.grid.extend([] for _ in range(n - len(self.grid)))
+            old = self.grid[n - 1] + [""] * len(u["values"][0])
+            self.grid[n - 1] = [o if v is None else v for o, v in zip(old, u["values"][0])]
+
+    def batch_get(self, ranges):
+        return [[self.grid[_row_number(r) - 1]] if len(self.grid) >= _row_number(r) and self.grid[_row_number(r) - 1]
+                else [] for r in ranges]
+
+class FakeWorkbook:
+    def __init__(self):
+        self.sheets = {}
+
+    def worksheet(self, name):
+        return self.sheets[name]
+
+    def add_worksheet(self, title, **kw):
+        self.sheets[title] = FakeWorksheet()
+
+    def values_batch_get(self, ranges):
+        raise RuntimeError("not supported by the fake")
+
+KEY = ("date", "plot")
+
+@pytest.fixture
+def sheet():
+    wb = FakeWorkbook()
+    backend = GSheetsBackend(lambda: wb)
+    backend.ensure_headers("x", ["date", "plot", "v"])
+    backend.append_rows("x", [["2025-12-01", "T1", 1], ["2025-12-01", "T2", 2]])
+    return backend, wb.sheets["x"]
+
+def test_upsert_updates_in_place_and_appends(sheet):
+    backend, ws = sheet
+    assert backend.upsert_rows("x", [["2025-12-01", "T2", 20], ["2025-12-02", "T1", 3]], KEY) == (1, 1)
+    assert ws.grid[1:] == [["2025-12-01", "T1", 1], ["2025-12-01", "T2", 20], ["2025-12-02", "T1", 3]]
+    assert backend.upsert_rows("x", [["2025-12-01", "T1", 10]], KEY, on_conflict="skip") == (0, 0)
+    assert ws.grid[1] == ["2025-12-01", "T1", 1]
+
+def test_upsert_skips_blank_rows(sheet):
+    backend, ws = sheet
+    ws.grid += [["", "", ""], ["2025-12-02", "T1", 3]]   # hand-edited gap
+    backend.read("x", refresh=True)
+    assert backend.upsert_rows("x", [["2025-12-02", "T1", 30]], KEY) == (1, 0)
+    assert ws.grid[3:] == [["", "", ""], ["2025-12-02", "T1", 30]]
+
+def test_upsert_after_row_inserted_above(sheet):
+    backend, ws = sheet
+    backend.read("x")
+    ws.grid.insert(1, ["", "", ""])   # cached row numbers are now off by one
+    assert backend.upsert_rows("x", [["2025-12-01", "T2", 20]], KEY) == (1, 0)
+    assert ws.grid[1:] == [["", "", ""], ["2025-12-01", "T1", 1], ["2025-12-01", "T2", 20]]
+    assert backend.read("x")["v"].tolist() == [1, 20]
+
+def test_upsert_clears_emptied_cells(sheet):
+    backend, ws = sheet
+    backend.read("x")
+    assert backend.upsert_rows("x", [["2025-12-01", "T2", None], ["2025-12-01", "T1", float("nan")]], KEY) == (2, 0)
+    assert ws.grid[1:] == [["2025-12-01", "T1", ""], ["2025-12-01", "T2", ""]]
+    # the cache holds what the sheet holds
+    assert backend.read("x")["v"].isna().all()
+    assert backend.read("x", refresh=True)["v"].isna().all()
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from storage import MAX_SQL_VARS, SQLiteBackend
+
+HEADERS = ["date", "plot", "value", "note"]
+
+@pytest.fixture
+def db():
+    b = SQLiteBackend(":memory:")
+    b.ensure_headers("t", HEADERS)
+    b.append_rows("t", [["2025-12-01", "P1", 1.0, "a"], ["2025-12-01", "P2", 2.0, "b"],
+                        ["2025-12-02", "P1", 3.0, "c"]])
+    return b
+
+def values(df):
+    return [(d.date().isoformat(), p, v) for d, p, v in zip(df["date"], df["plot"], df["value"])]
+
+# -- upsert_rows ------------------------------------------------------------
+def test_upsert_updates_in_place_and_appends(db):
+    rows = [[date(2025, 12, 1), "P2", 20.0, "B"], ["2025-12-03", "P1", 5.0, "e"]]
+    assert db.upsert_rows("t", rows, ("date", "plot")) == (1, 1)
+    assert values(db.read("t")) == [("2025-12-01", "P1", 1.0), ("2025-12-01", "P2", 20.0),
+                                    ("2025-12-02", "P1", 3.0), ("2025-12-03", "P1", 5.0)]
+    assert db.read("t")["note"].tolist() == ["a", "B", "c", "e"]
+
+def test_upsert_skip_leaves_existing_rows(db):
+    rows = [["2025-12-01", "P2", 20.0, "B"], ["2025-12-03", "P1", 5.0, "e"]]
+    assert db.upsert_rows("t", rows, ("date", "plot"), on_conflict="skip") == (0, 1)
+    assert values(db.read("t"))[1] == ("2025-12-01", "P2", 2.0)
+    assert len(db.read("t")) == 4
+
+def test_upsert_key_without_date(db):
+    assert db.upsert_rows("t", [["2025-12-09", "P1", 9.0, "c"]], ("note",)) == (1, 0)
+    assert values(db.read("t"))[2] == ("2025-12-09", "P1", 9.0)
+
+def test_upsert_more_dates_than_sql_variables(db):
+    days = [date(2020, 1, 1) + timedelta(days=i) for i in range(2 * MAX_SQL_VARS + 100)]
+    rows = [[d, "P1", float(i), ""] for i, d in enumerate(days)]
+    assert db.upsert_rows("t", rows, ("date", "plot")) == (0, len(days))
+    rows = [[d, "P1", -float(i), ""] for i, d in enumerate(days)]
+    assert db.upsert_rows("t", rows, ("date", "plot")) == (len(days), 0)
+    df = db.read("t", end="2024-12-31")
+    assert len(df) == len(days) and (df["value"] <= 0).all()
+
+# -- read -------------------------------------------------------------------
+def test_read_filters(db):
+    assert values(db.read("t", start="2025-12-02")) == [("2025-12-02", "P1", 3.0)]
+    assert values(db.read("t", end=date(2025, 12, 1), plots=["P2"])) == [("2025-12-01", "P2", 2.0)]
+    assert len(db.read("t", plots=[])) == 0
+    assert db.read("missing").empty
+
+def test_read_more_plots_than_sql_variables(db):
+    plots = ["P2"] + [f"X{i}" for i in range(MAX_SQL_VARS + 1)]
+    assert values(db.read("t", plots=plots)) == [("2025-12-01", "P2", 2.0)]
+
+def test_read_coerces_dtypes():
+    b = SQLiteBackend(":memory:")
+    b.ensure_headers("t", ["date", "plot", "n", "blank", "mixed"])
+    b.append_rows("t", [["2025-12-01", "P1", "1.5", "", "x"], ["", "P2", 2, "", "3"]])
+    df = b.read("t")
+    assert pd.api.types.is_datetime64_any_dtype(df["date"]) and pd.isna(df["date"][1])
+    assert df["n"].tolist() == [1.5, 2.0]
+    assert df["blank"].isna().all()
+    assert df["mixed"].tolist() == ["x", "3"]
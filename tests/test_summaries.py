@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+
+import summaries
+from summaries import SummaryStore
+
+def decisions(*rows):
+    return pd.DataFrame([list(r) for r in rows], columns=["date", "plot", "irr_L", "irr_mm"])
+
+DAYS = [("2025-12-01", "P1", 10.0, 1.0), ("2025-12-01", "P2", 0.0, 0.0),
+        ("2025-12-02", "P1", 5.0, 0.5), ("2025-12-08", "P1", 2.0, 0.2)]
+
+@pytest.fixture
+def folds(monkeypatch):
+    # rows folded per update, from the summaries.fold span
+    seen = []
+
+    @contextmanager
+    def span(name, **kw):
+        seen.append(kw["rows"])
+        yield
+
+    monkeypatch.setattr(summaries, "span", span)
+    return seen
+
+def fresh(df, generation=0):
+    return SummaryStore().update(decisions=df, generations=dict(decisions=generation))
+
+def same(a: SummaryStore, b: SummaryStore):
+    pd.testing.assert_frame_equal(a.daily(), b.daily())
+    pd.testing.assert_frame_equal(a.weekly(), b.weekly())
+
+def test_appended_day_folds_incrementally(folds):
+    store = SummaryStore().update(decisions=decisions(*DAYS[:3]))
+    store.update(decisions=decisions(*DAYS[:3]))       # nothing new
+    store.update(decisions=decisions(*DAYS))
+    assert folds == [3, 1]
+    same(store, fresh(decisions(*DAYS)))
+    assert store.weekly()["irr_L"].tolist() == [15.0, 0.0, 2.0]
+
+def test_edited_last_seen_row_rebuilds(folds):
+    store = SummaryStore().update(decisions=decisions(*DAYS[:3]))
+    edited = decisions(*DAYS[:2], ("2025-12-02", "P1", 7.0, 0.7), DAYS[3])
+    store.update(decisions=edited)
+    assert folds == [3, 4]
+    same(store, fresh(edited))
+
+def test_generation_bump_rebuilds_after_earlier_row_edit(folds):
+    store = SummaryStore().update(decisions=decisions(*DAYS), generations=dict(decisions=1))
+    edited = decisions(("2025-12-01", "P1", 30.0, 3.0), *DAYS[1:])
+    # same length and last row: only the generation tells the sheet changed
+    store.update(decisions=edited, generations=dict(decisions=1))
+    assert folds == [4]
+    store.update(decisions=edited, generations=dict(decisions=2))
+    assert folds == [4, 4]
+    same(store, fresh(edited, 2))
+    assert store.daily(plots=["P1"])["irr_L"].tolist() == [30.0, 5.0, 2.0]
+
+def test_shorter_sheet_rebuilds(folds):
+    store = SummaryStore().update(decisions=decisions(*DAYS))
+    store.update(decisions=decisions(*DAYS[1:]))
+    assert folds == [4, 3]
+    same(store, fresh(decisions(*DAYS[1:])))
@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+from write_queue import WriteBehindQueue
+
+class Unavailable(Exception):
+    # what gspread raises for a 503: an APIError with the HTTP response attached
+    class response:
+        status_code = 503
+
+class Recorder:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, ws, rows, upsert):
+        self.gate.wait(5)
+        self.calls.append((ws, [list(r) for r in rows], upsert))
+        if ws in self.failing:
+            raise Unavailable(f"{ws} unavailable")
+
+def spool_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def make(writer, path, **kw):
+    kw = dict(dict(linger_s=0.01, backoff_s=0.05, max_backoff_s=0.2), **kw)
+    return WriteBehindQueue(writer, str(path), **kw)
+
+def test_coalesces_runs_of_same_kind_writes(tmp_path):
+    w = Recorder()
+    w.gate.clear()   # hold the worker until everything is queued
+    q = make(w, tmp_path / "spool.jsonl")
+    q.enqueue("blocker", [[0]])
+    time.sleep(0.05)
+    q.enqueue("a", [[1]])
+    q.enqueue("a", [[2], [3]])
+    q.enqueue("a", [[4]], (("date", "plot"), "update"))
+    q.enqueue("a", [[5]], (("date", "plot"), "update"))
+    q.enqueue("a", [[6]])
+    w.gate.set()
+    assert q.flush(5)
+    assert [c for c in w.calls if c[0] == "a"] == [
+        ("a", [[1], [2], [3]], None),
+        ("a", [[4], [5]], (("date", "plot"), "update")),
+        ("a", [[6]], None),
+    ]
+    q.close()
+
+def test_recovers_unfinished_batches_from_spool(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    with open(path, "w") as f:
+        for rec in [dict(id=1, ws="a", rows=[[1]]), dict(id=2, ws="a", rows=[[2]], key=["date"], on_conflict="skip"),
+                    dict(done=[1]), dict(id=3, ws="b", rows=[[3]])]:
+            f.write(json.dumps(rec) + "\n")
+        f.write('{"id": 4, "ws": "a", "ro')   # torn last line
+    w = Recorder()
+    w.gate.clear()
+    q = make(w, path)
+    # compacted to what is still pending before anything is written
+    assert [r["id"] for r in spool_lines(path)] == [2, 3]
+    w.gate.set()
+    assert q.flush(5)
+    assert sorted(w.calls) == [("a", [[2]], (("date",), "skip")), ("b", [[3]], None)]
+    assert q.enqueue("a", [[5]]) == 4
+    q.close()
+
+def test_spool_compacted_once_drained(tmp_path):
+    path = tmp_path / "spool.jsonl"
+    q = make(Recorder(), path)
+    for i in range(5):
+        q.enqueue("a", [[i]])
+    assert q.flush(5)
+    assert spool_lines(path) == []
+    q.close()
+
+def test_dead_letters_after_max_failures(tmp_path):
+    class Broken(Exception):
+        pass
+
+    def writer(ws, rows, upsert):
+        raise Broken("bad request")
+
+    path = tmp_path / "spool.jsonl"
+    q = make(writer, path, max_failures=3)
+    q.enqueue("a", [[1], [2]])
+    assert q.flush(5)
+    assert q.stats()["dead_rows"] == 2 and q.stats()["retries"] == 3
+    assert spool_lines(str(path) + ".dead") == [dict(id=1, ws="a", rows=[[1], [2]])]
+    q.close()
+    # nothing comes back after a restart
+    w = Recorder()
+    make(w, path).close()
+    assert w.calls == []
+
+def test_dead_letters_retryable_errors_after_max_retry_s(tmp_path):
+    w = Recorder(failing={"a"})
+    q = make(w, tmp_path / "spool.jsonl", max_failures=2, max_retry_s=0.3)
+    bid = q.enqueue("a", [[1]])
+    assert not q.flush(0.1, batch=bid)
+    assert q.pending() == {"a": 1}
+    assert q.flush(5)
+    assert q.stats()["dead_rows"] == 1
+    assert len(w.calls) > 2   # retryable: kept going past max_failures until max_retry_s
+    q.close()
+
+def test_failing_worksheet_does_not_block_others(tmp_path):
+    w = Recorder(failing={"bad"})
+    q = make(w, tmp_path / "spool.jsonl", backoff_s=1.0, max_backoff_s=1.0)
+    q.enqueue("bad", [[1]])
+    time.sleep(0.1)   # "bad" has failed once and is backing off
+    ids = [q.enqueue("good", [[i]]) for i in range(3)]
+    t0 = time.monotonic()
+    assert all(q.flush(0.5, batch=b) for b in ids)
+    assert time.monotonic() - t0 < 0.5
+    assert q.pending() == {"bad": 1}
+    assert q.stats()["backing_off"] == ["bad"]
+    q.close(timeout=0.1)
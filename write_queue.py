@@ -0,0 +1,265 @@
+from __future__ import annotations
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# writer(ws_name, rows, upsert) performs one synchronous write for a worksheet:
+# an append when upsert is None, else an upsert by (key columns, on_conflict)
+Upsert = Optional[Tuple[Tuple[str, ...], str]]
+Writer = Callable[[str, List[List[Any]], Upsert], None]
+Item = Tuple[int, float, List[List[Any]], Upsert]
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+def _status_of(exc: Exception) -> Optional[int]:
+    resp = getattr(exc, "response", None)
+    return getattr(resp, "status_code", None)
+
+def is_retryable(exc: Exception) -> bool:
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # no HTTP status: connection reset, timeout, DNS ...
+    return isinstance(exc, (ConnectionError, TimeoutError, OSError))
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)
+
+def _record(bid: int, ws_name: str, rows: List[List[Any]], upsert: Upsert) -> Dict[str, Any]:
+    rec = dict(id=bid, ws=ws_name, rows=rows)
+    if upsert is not None:
+        rec["key"], rec["on_conflict"] = list(upsert[0]), upsert[1]
+    return rec
+
+def _upsert_of(rec: Dict[str, Any]) -> Upsert:
+    return (tuple(rec["key"]), rec.get("on_conflict", "update")) if "key" in rec else None
+
+# Write-behind queue for worksheet appends. Rows are spooled to a local
+# JSON-lines file before enqueue returns, so a crash loses nothing: on start
+# the spool is replayed and anything not marked done is written again. A
+# background thread coalesces everything pending for a worksheet into one
+# writer call per run of same-kind writes, in order, and retries with
+# exponential backoff per worksheet: one sheet returning 429/5xx does not
+# hold up writes to the others. A batch still failing after max_retry_s
+# (retryable errors) or max_failures attempts (other errors) goes to the
+# .dead spool.
+class WriteBehindQueue:
+    def __init__(self, writer: Writer, spool_path: str, linger_s: float = 0.5,
+                 backoff_s: float = 1.0, max_backoff_s: float = 64.0, max_failures: int = 5,
+                 max_retry_s: float = 900.0):
+        self.writer = writer
+        self.spool_path = spool_path
+        self.linger_s = linger_s
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.max_failures = max_failures
+        self.max_retry_s = max_retry_s
+        self._pending: "OrderedDict[str, List[Item]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._next_id = 1
+        self._inflight = 0
+        self._inflight_ids: List[int] = []
+        self._inflight_ws: Optional[str] = None
+        # worksheet -> (failures, first failure, next attempt), time.monotonic()
+        self._retry: Dict[str, Tuple[int, float, float]] = {}
+        self._stats: Dict[str, Any] = dict(enqueued_rows=0, flushed_rows=0, flushes=0, retries=0,
+                                           dead_rows=0, last_flush_s=None, last_error=None)
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(spool_path)), exist_ok=True)
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -- spool -------------------------------------------------------------
+    def _spool(self, record: Dict[str, Any], path: Optional[str] = None):
+        with open(path or self.spool_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _recover(self):
+        if not os.path.exists(self.spool_path):
+            return
+        batches: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+                if "done" in rec:
+                    for i in rec["done"]:
+                        batches.pop(i, None)
+                else:
+                    batches[rec["id"]] = rec
+        now = time.time()
+        for rec in batches.values():
+            self._pending.setdefault(rec["ws"], []).append((rec["id"], now, rec["rows"], _upsert_of(rec)))
+            self._next_id = max(self._next_id, rec["id"] + 1)
+        self._compact()
+
+    def _compact(self):
+        # rewrite the spool with only what is still pending
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for ws_name, items in self._pending.items():
+                for bid, _, rows, upsert in items:
+                    f.write(json.dumps(_record(bid, ws_name, rows, upsert), default=_json_default) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.spool_path)
+
+    # -- public API --------------------------------------------------------
+    def enqueue(self, ws_name: str, rows: List[List[Any]], upsert: Upsert = None) -> int:
+        if not rows:
+            return 0
+        if upsert is not None:
+            upsert = (tuple(upsert[0]), upsert[1])
+        with self._cond:
+            bid = self._next_id
+            self._next_id += 1
+            self._spool(_record(bid, ws_name, rows, upsert))
+            self._pending.setdefault(ws_name, []).append((bid, time.time(), rows, upsert))
+            self._stats["enqueued_rows"] += len(rows)
+            self._cond.notify()
+            return bid
+
+    def depth(self) -> int:
+        with self._cond:
+            return sum(len(item[2]) for items in self._pending.values() for item in items) + self._inflight
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            oldest = min((item[1] for items in self._pending.values() for item in items), default=None)
+            out = dict(self._stats)
+            out["backing_off"] = sorted(self._retry)
+        out["depth_rows"] = self.depth()
+        out["oldest_pending_s"] = None if oldest is None else time.time() - oldest
+        return out
+
+    def pending(self) -> Dict[str, int]:
+        # worksheet -> rows not written yet (queued or being written)
+        with self._cond:
+            out = {ws: sum(len(item[2]) for item in items) for ws, items in self._pending.items()}
+            if self._inflight_ws is not None:
+                out[self._inflight_ws] = out.get(self._inflight_ws, 0) + self._inflight
+            return out
+
+    def _waiting(self, batch: Optional[int]) -> bool:
+        if batch is None:
+            return bool(self._pending or self._inflight)
+        return batch in self._inflight_ids or \
+            any(item[0] == batch for items in self._pending.values() for item in items)
+
+    def flush(self, timeout: Optional[float] = None, batch: Optional[int] = None) -> bool:
+        # Waits until everything (or the batch id enqueue returned, and so all
+        # before it for the same worksheet) is written or dead-lettered; False
+        # if the timeout ran out first. Other worksheets backing off do not count.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._waiting(batch):
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left if left is not None else 0.5)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # -- worker ------------------------------------------------------------
+    def _ready(self, now: float) -> Tuple[Optional[str], Optional[float]]:
+        # -> (first worksheet not backing off, None) or (None, seconds to the next retry)
+        wait = None
+        for ws_name in self._pending:
+            at = self._retry.get(ws_name, (0, 0.0, 0.0))[2]
+            if at <= now:
+                return ws_name, None
+            wait = at - now if wait is None else min(wait, at - now)
+        return None, wait
+
+    def _take(self) -> Optional[Tuple[str, List[Item]]]:
+        with self._cond:
+            while True:
+                ws_name, wait = self._ready(time.monotonic())
+                if ws_name is not None:
+                    break
+                if self._closed:
+                    return None  # what is left stays spooled for the next start
+                self._cond.wait(wait)
+        time.sleep(self.linger_s)  # let a burst of clicks coalesce
+        with self._cond:
+            items = self._pending.pop(ws_name)
+            # the leading run of same-kind writes; the rest goes back in front
+            run = next((i for i, it in enumerate(items) if it[3] != items[0][3]), len(items))
+            if run < len(items):
+                self._pending[ws_name] = items[run:]
+                self._pending.move_to_end(ws_name, last=False)
+                items = items[:run]
+            self._inflight = sum(len(item[2]) for item in items)
+            self._inflight_ids = [item[0] for item in items]
+            self._inflight_ws = ws_name
+            return ws_name, items
+
+    def _run(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            ws_name, items = taken
+            rows = [r for item in items for r in item[2]]
+            t0 = time.monotonic()
+            try:
+                self.writer(ws_name, rows, items[0][3])
+            except Exception as exc:
+                with self._cond:
+                    failures, failing_since, _ = self._retry.get(ws_name, (0, t0, 0.0))
+                    failures += 1
+                    self._stats["retries"] += 1
+                    self._stats["last_error"] = f"{ws_name}: {type(exc).__name__}: {exc}"
+                    gave_up = (time.monotonic() - failing_since >= self.max_retry_s if is_retryable(exc)
+                               else failures >= self.max_failures)
+                    if gave_up:
+                        self._dead_letter(ws_name, items)
+                        self._retry.pop(ws_name, None)
+                    else:
+                        # order within the worksheet kept; other worksheets go first
+                        self._pending[ws_name] = items + self._pending.get(ws_name, [])
+                        self._pending.move_to_end(ws_name)
+                        delay = min(self.max_backoff_s, self.backoff_s * 2 ** (failures - 1))
+                        self._retry[ws_name] = (failures, failing_since, time.monotonic() + delay)
+                    self._clear_inflight()
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                self._retry.pop(ws_name, None)
+                self._spool(dict(done=[item[0] for item in items]))
+                self._stats["flushed_rows"] += len(rows)
+                self._stats["flushes"] += 1
+                self._stats["last_flush_s"] = time.monotonic() - t0
+                self._clear_inflight()
+                if not self._pending:
+                    self._compact()
+                self._cond.notify_all()
+
+    def _clear_inflight(self):
+        self._inflight = 0
+        self._inflight_ids = []
+        self._inflight_ws = None
+
+    def _dead_letter(self, ws_name: str, items):
+        for bid, _, rows, upsert in items:
+            self._spool(_record(bid, ws_name, rows, upsert), self.spool_path + ".dead")
+        self._spool(dict(done=[item[0] for item in items]))
+        self._stats["dead_rows"] += sum(len(item[2]) for item in items)